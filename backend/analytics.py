@@ -0,0 +1,131 @@
+"""Vectorized patient statistics (pandas/NumPy).
+
+Loads the projected patient columns for a date range into one DataFrame,
+reading the cursor in chunks, and computes the MonthlyStats breakdowns for
+every month in the range with group-bys instead of per-patient Python loops.
+Imported lazily by server.py so pandas is not loaded on cold start.
+"""
+import pandas as pd
+
+
+COLUMNS = ["visit_date", "doctor_id", "doctor", "visit_type", "status", "accepted", "is_revisit",
+           "family_group", "profession_group"]
+VISIT_TYPE_FIELDS = {"implant": "implant_count", "kontrol": "checkup_count", "muayene": "examination_count"}
+
+
+def month_range(year: int, month: int, months: int = 1):
+    """[start, end) ISO date bounds covering `months` months from year-month"""
+    end_year, end_month = divmod(month - 1 + months, 12)
+    return f"{year}-{month:02d}-01", f"{year + end_year}-{end_month + 1:02d}-01"
+
+
+async def load_patient_frame(collection, start_date: str, end_date: str, visit_types, chunk_size: int = 5000):
+    """Projected patients with start_date <= visit_date < end_date as a DataFrame"""
+    cursor = collection.find(
+        {"visit_date": {"$gte": start_date, "$lt": end_date}, "visit_type": {"$in": list(visit_types)}},
+        {"_id": 0, **{c: 1 for c in COLUMNS}},
+    ).batch_size(chunk_size)
+
+    chunks, rows = [], []
+    async for doc in cursor:
+        rows.append(doc)
+        if len(rows) >= chunk_size:
+            chunks.append(pd.DataFrame.from_records(rows, columns=COLUMNS))
+            rows = []
+    if rows or not chunks:
+        chunks.append(pd.DataFrame.from_records(rows, columns=COLUMNS))
+    frame = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+    frame["accepted"] = frame["accepted"].fillna(False).astype(bool)
+    frame["is_revisit"] = frame["is_revisit"].fillna(False).astype(bool)
+    # Legacy documents have no status; derive it from accepted like the API handlers do
+    frame["status"] = frame["status"].mask(
+        frame["status"].isna(), frame["accepted"].map({True: "kabul etti", False: "kabul etmedi"}))
+    for column in ("doctor_id", "doctor", "visit_type", "status", "family_group", "profession_group"):
+        frame[column] = frame[column].fillna("").astype(str)
+    frame["month"] = frame["visit_date"].astype(str).str.slice(0, 7)
+    return frame
+
+
+def _rate(accepted, total):
+    return round(float(accepted) / float(total) * 100, 1) if total > 0 else 0
+
+
+def _group_counts(frame: pd.DataFrame, column: str):
+    """{month: [(group, total, accepted), ...]} for non-empty groups, first-seen order"""
+    grouped = (
+        frame.loc[frame[column] != "", ["month", column, "accepted"]]
+        .groupby(["month", column], sort=False)["accepted"]
+        .agg(["size", "sum"])
+    )
+    result = {}
+    for (month, group), total, accepted in zip(grouped.index, grouped["size"].to_numpy(), grouped["sum"].to_numpy()):
+        result.setdefault(month, []).append((group, int(total), int(accepted)))
+    return result
+
+
+def monthly_stats(frame: pd.DataFrame, year: int, month: int, months: int, doctors):
+    """MonthlyStats-shaped dicts for `months` consecutive months starting at year-month.
+
+    `doctors` is the [{"id", "name"}] list of doctors to report, in order.
+    """
+    keys = []
+    for offset in range(months):
+        y, m = divmod(month - 1 + offset, 12)
+        keys.append((year + y, m + 1, f"{year + y}-{m + 1:02d}"))
+    month_keys = [k for _, _, k in keys]
+
+    type_counts = pd.crosstab(frame["month"], frame["visit_type"]).reindex(
+        index=month_keys, columns=list(VISIT_TYPE_FIELDS), fill_value=0)
+    status_counts = pd.crosstab(frame["month"], frame["status"]).reindex(index=month_keys, fill_value=0)
+    revisits = frame.groupby("month")["is_revisit"].sum().reindex(month_keys, fill_value=0)
+
+    doctor_ids = [d["id"] for d in doctors]
+    # Patients whose doctor name never resolved to an id count for the doctor of that name
+    ids_by_name = {d["name"]: d["id"] for d in doctors}
+    frame_doctor_ids = frame["doctor_id"].mask(frame["doctor_id"] == "", frame["doctor"].map(ids_by_name)).fillna("")
+    per_doctor = (
+        frame.assign(doctor_id=frame_doctor_ids).loc[frame_doctor_ids.isin(doctor_ids)]
+        .groupby(["month", "doctor_id"])["accepted"].agg(["size", "sum"])
+    )
+    doctor_index = pd.MultiIndex.from_product([month_keys, doctor_ids], names=["month", "doctor_id"])
+    per_doctor = per_doctor.reindex(doctor_index, fill_value=0)
+    doctor_totals = per_doctor["size"].to_numpy().reshape(len(month_keys), len(doctor_ids))
+    doctor_accepted = per_doctor["sum"].to_numpy().reshape(len(month_keys), len(doctor_ids))
+
+    families = _group_counts(frame, "family_group")
+    professions = _group_counts(frame, "profession_group")
+
+    results = []
+    for i, (y, m, key) in enumerate(keys):
+        counts = {field: int(type_counts.at[key, visit_type]) for visit_type, field in VISIT_TYPE_FIELDS.items()}
+        month_families = families.get(key, [])
+        results.append({
+            "total_patients": sum(counts.values()),
+            **counts,
+            "revisit_count": int(revisits.at[key]),
+            "status_counts": {status: int(n) for status, n in status_counts.loc[key].items() if n},
+            "doctor_stats": [
+                {
+                    "doctor": doctor["name"],
+                    "total_examinations": int(doctor_totals[i, j]),
+                    "accepted_count": int(doctor_accepted[i, j]),
+                    "acceptance_rate": _rate(doctor_accepted[i, j], doctor_totals[i, j]),
+                }
+                for j, doctor in enumerate(doctors)
+            ],
+            "family_stats": [
+                {"family_group": group, "patient_count": total, "accepted_count": accepted,
+                 "acceptance_rate": _rate(accepted, total)}
+                for group, total, accepted in month_families
+            ],
+            "profession_stats": [
+                {"profession_group": group, "patient_count": total, "accepted_count": accepted,
+                 "acceptance_rate": _rate(accepted, total)}
+                for group, total, accepted in professions.get(key, [])
+            ],
+            "total_families": len(month_families),
+            "month": m,
+            "year": y,
+        })
+    return results
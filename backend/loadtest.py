@@ -0,0 +1,289 @@
+"""Screen-level load test for the Esdent Gold backend.
+
+Replays the request sequences the frontend screens issue on mount (and after
+edits) with N concurrent simulated receptionists, then reports per-screen
+latency, error rates and throughput for each uvicorn worker count.
+
+Usage:
+    python loadtest.py --users 10 --duration 60 --workers 1,2,4
+    python loadtest.py --base-url https://esdent-gold-backend.onrender.com --users 5
+
+When --base-url is given the harness runs against that server only; otherwise
+it starts `uvicorn server:app --workers N` locally for every N in --workers,
+using the MONGO_URL / DB_NAME from the environment (or backend/.env).
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+
+ROOT_DIR = Path(__file__).parent
+
+# Screens and the requests they fire concurrently on mount. Each entry is
+# (method, path, params-factory, headers-factory); factories receive the
+# session context and may be None.
+def _dashboard_params(ctx):
+    # HomeModules.js fetchDashboard in its default "day" view: totals only
+    day = ctx['date'].isoformat()
+    return {"start_date": day, "end_date": day, "year": ctx['date'].year, "month": ctx['date'].month,
+            "sections": "accepted,not_accepted,thinking,overdue",
+            "accepted_fields": "total", "not_accepted_fields": "total",
+            "thinking_fields": "total", "overdue_fields": "total"}
+
+
+def _bootstrap_headers(ctx):
+    # DailyView.js revalidates its picklists with the last ETag it saw
+    etag = ctx.get('bootstrap_etag')
+    return {"If-None-Match": etag} if etag else None
+
+
+DASHBOARD = ("GET", "/api/dashboard", _dashboard_params, None)
+COUNTS = ("GET", "/api/counts", None, None)
+BOOTSTRAP = ("GET", "/api/daily-bootstrap", lambda ctx: {"date": ctx['date'].isoformat()}, _bootstrap_headers)
+
+SCREENS = {
+    # First load: Dashboard.js tab badge counts plus the home tab
+    "app": [COUNTS, DASHBOARD],
+    # HomeModules.js remounting when the home tab is reopened
+    "home": [DASHBOARD],
+    # DailyView.js: fetchBootstrap (day's patients plus picklists)
+    "daily": [BOOTSTRAP],
+    # MonthlyStatistics.js: one stats call per month switch
+    "monthly": [
+        ("GET", "/api/statistics/monthly",
+         lambda ctx: {"year": ctx['date'].year, "month": ctx['date'].month}, None),
+    ],
+    # FollowUpManager.js
+    "followups": [
+        ("GET", "/api/followups", None, None),
+    ],
+    # After a save, DailyView.js refetches directly and again through the
+    # refreshTrigger it bumps, which also refetches Dashboard.js counts
+    "daily_refresh": [BOOTSTRAP, BOOTSTRAP, COUNTS],
+}
+
+# A receptionist's session: the screens visited in order. "daily_edit" is
+# handled specially (PUT one of the daily screen's patients, then the refetches).
+SESSION = ["app", "daily", "daily_edit", "monthly", "followups", "home"]
+
+
+class Recorder:
+    """Thread-safe collector of screen and request timings."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.screens = {}
+        self.requests = 0
+        self.errors = 0
+
+    def add_request(self, ok):
+        with self.lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+
+    def add_screen(self, name, elapsed, ok):
+        with self.lock:
+            entry = self.screens.setdefault(name, {"latencies": [], "errors": 0})
+            entry["latencies"].append(elapsed)
+            if not ok:
+                entry["errors"] += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _send(http, base_url, method, path, params=None, body=None, headers=None, timeout=30):
+    try:
+        response = http.request(method, base_url + path, params=params, json=body, headers=headers,
+                                timeout=timeout)
+        return response.status_code < 400, response
+    except requests.RequestException:
+        return False, None
+
+
+def _fire(name, base_url, ctx, pool, recorder):
+    """Send all requests of a screen concurrently, like the component's useEffect."""
+    http = ctx['http']
+    futures = [pool.submit(_send, http, base_url, method, path, params(ctx) if params else None,
+                           None, headers(ctx) if headers else None)
+               for method, path, params, headers in SCREENS[name]]
+    results = [f.result() for f in futures]
+    for (_, path, _, _), (ok, response) in zip(SCREENS[name], results):
+        recorder.add_request(ok)
+        if ok and path == BOOTSTRAP[1]:
+            ctx['bootstrap_etag'] = response.headers.get("ETag")
+            ctx['daily_patients'] = response.json().get("patients", [])
+    return all(ok for ok, _ in results)
+
+
+def run_screen(name, base_url, ctx, pool, recorder):
+    """Time a screen mount until its last request finishes."""
+    started = time.perf_counter()
+    ok = _fire(name, base_url, ctx, pool, recorder)
+    recorder.add_screen(name, time.perf_counter() - started, ok)
+
+
+def run_daily_edit(base_url, ctx, pool, recorder):
+    """Re-save one of the daily screen's patients unchanged, then refetch like DailyView.js."""
+    http = ctx['http']
+    started = time.perf_counter()
+    ok = True
+    patients = ctx.get('daily_patients') or []
+    if patients:
+        patient = random.choice(patients)
+        fields = ["visit_date", "patient_name", "phone_number", "doctor", "visit_type", "status",
+                  "family_group", "profession_group", "is_revisit", "revisit_date", "notes"]
+        body = {k: patient.get(k) if patient.get(k) is not None else "" for k in fields}
+        body["is_revisit"] = bool(patient.get("is_revisit", False))
+        ok, _ = _send(http, base_url, "PUT", f"/api/patients/{patient['id']}", body=body)
+        recorder.add_request(ok)
+    ok = _fire("daily_refresh", base_url, ctx, pool, recorder) and ok
+    recorder.add_screen("daily_edit", time.perf_counter() - started, ok)
+
+
+def receptionist(base_url, deadline, think_time, recorder, days_back):
+    ctx = {
+        'http': requests.Session(),
+        'date': (datetime.now() - timedelta(days=random.randint(0, days_back))).date(),
+    }
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        while time.monotonic() < deadline:
+            for screen in SESSION:
+                if time.monotonic() >= deadline:
+                    break
+                if screen == "daily_edit":
+                    run_daily_edit(base_url, ctx, pool, recorder)
+                else:
+                    run_screen(screen, base_url, ctx, pool, recorder)
+                if think_time:
+                    time.sleep(random.uniform(0, think_time))
+
+
+def run_load(base_url, users, duration, think_time, days_back):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=receptionist, args=(base_url, deadline, think_time, recorder, days_back))
+        for _ in range(users)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    screens = {}
+    for name, entry in recorder.screens.items():
+        latencies = entry["latencies"]
+        screens[name] = {
+            "count": len(latencies),
+            "errors": entry["errors"],
+            "error_rate": round(entry["errors"] / len(latencies), 4) if latencies else 0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1) if latencies else 0,
+        }
+    total_screens = sum(s["count"] for s in screens.values())
+    return {
+        "users": users,
+        "duration_s": round(elapsed, 1),
+        "requests": recorder.requests,
+        "errors": recorder.errors,
+        "error_rate": round(recorder.errors / recorder.requests, 4) if recorder.requests else 0,
+        "requests_per_s": round(recorder.requests / elapsed, 1),
+        "screens_per_s": round(total_screens / elapsed, 2),
+        "screens": screens,
+    }
+
+
+def wait_until_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(base_url + "/api/", timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def start_server(workers, port):
+    cmd = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=ROOT_DIR, env=os.environ.copy())
+
+
+def print_report(label, report):
+    print(f"\n=== {label}: {report['users']} users, {report['duration_s']}s ===")
+    print(f"requests: {report['requests']}  errors: {report['errors']} ({report['error_rate']:.2%})  "
+          f"req/s: {report['requests_per_s']}  screens/s: {report['screens_per_s']}")
+    print(f"{'screen':<12}{'count':>8}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, s in sorted(report["screens"].items()):
+        print(f"{name:<12}{s['count']:>8}{s['error_rate']:>8.1%}{s['p50_ms']:>10}{s['p95_ms']:>10}"
+              f"{s['p99_ms']:>10}{s['max_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esdent Gold screen replay load test")
+    parser.add_argument("--base-url", help="Run against an existing server instead of starting uvicorn")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated uvicorn worker counts")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated receptionists")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per run")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Max pause between screens (s)")
+    parser.add_argument("--days-back", type=int, default=30, help="Pick each user's working date within this window")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    reports = {}
+    if args.base_url:
+        base_url = args.base_url.rstrip("/")
+        reports[base_url] = run_load(base_url, args.users, args.duration, args.think_time, args.days_back)
+        print_report(base_url, reports[base_url])
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            server = start_server(workers, args.port)
+            try:
+                if not wait_until_ready(base_url):
+                    print(f"Server with {workers} worker(s) did not start", file=sys.stderr)
+                    continue
+                label = f"{workers} worker(s)"
+                reports[label] = run_load(base_url, args.users, args.duration, args.think_time, args.days_back)
+                print_report(label, reports[label])
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+
+    if len(reports) > 1:
+        print("\nThroughput ceiling per worker count:")
+        for label, report in reports.items():
+            print(f"  {label:<14} {report['screens_per_s']:>8} screens/s  {report['requests_per_s']:>8} req/s  "
+                  f"errors {report['error_rate']:.2%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
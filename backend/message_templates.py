@@ -0,0 +1,118 @@
+"""WhatsApp message templates.
+
+Every message type is a set of named parts written as str.format templates.
+A part is validated and compiled once per distinct text and then reused, so
+rendering a batch of messages is one format_map call per row. Clinics
+override parts through versioned documents in the message_templates
+collection (see server.py); parts they don't override use DEFAULT_TEMPLATES.
+"""
+import string
+from functools import lru_cache
+
+
+DEFAULT_TEMPLATES = {
+    "followup_reminder": {
+        "text": (
+            "Merhaba {patient_name}, geçen hafta görüştüğümüz tedavi planı hakkında nazik bir hatırlatma "
+            "yapmak istedik. Karar verebildiniz mi? İsterseniz tekrar bilgi verebiliriz."
+        ),
+    },
+    "daily_summary": {
+        "text": (
+            "Günlük Özet - {date}\n\n"
+            "Sayın {doctor},\n\n"
+            "Bugünkü hasta özetiniz:\n\n"
+            "📊 Toplam Hasta: {total_patients}\n"
+            "• İmplant: {implants}\n"
+            "• Kontrol: {checkups}\n"
+            "• Muayene: {examinations}\n"
+            "• Tekrar Görüşme: {revisits}\n\n"
+            "✅ Kabul Edilen: {accepted_count}\n"
+            "❌ Düşünen/Ret: {not_accepted_count}\n\n"
+            "📅 Yeni Takipler: {new_followups}\n\n"
+            "{accepted_section}{not_accepted_section}"
+        ),
+        # Sections are left out entirely when they have no patients
+        "accepted_section": "Kabul Edilen Hastalar:\n{lines}",
+        "not_accepted_section": "\nDüşünen/Ret Hastalar:\n{lines}",
+        "patient_line": "• {patient_name} - {visit_type}\n",
+    },
+}
+
+# Fields each part may reference
+TEMPLATE_FIELDS = {
+    "followup_reminder": {
+        "text": {"patient_name", "doctor", "date"},
+    },
+    "daily_summary": {
+        "text": {"date", "doctor", "total_patients", "implants", "checkups", "examinations", "revisits",
+                 "accepted_count", "not_accepted_count", "new_followups",
+                 "accepted_section", "not_accepted_section"},
+        "accepted_section": {"lines", "count"},
+        "not_accepted_section": {"lines", "count"},
+        "patient_line": {"patient_name", "visit_type"},
+    },
+}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+@lru_cache(maxsize=256)
+def compile_part(text: str, allowed: frozenset):
+    """Validate a part once and return its renderer (a mapping -> str callable)"""
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise TemplateError(f"Geçersiz şablon: {e}")
+    for _, field, format_spec, conversion in parsed:
+        if field is None:
+            continue
+        # Bare names only: attribute/index access and format specs are not for clinic staff
+        if field not in allowed:
+            raise TemplateError(f"Bilinmeyen şablon alanı: {{{field}}}")
+        if format_spec or conversion:
+            raise TemplateError(f"Şablon alanında biçimlendirme kullanılamaz: {{{field}}}")
+    return text.format_map
+
+
+def compile_templates(message_type: str, overrides: dict = None):
+    """{part: renderer} for a message type with the given part overrides applied"""
+    if message_type not in DEFAULT_TEMPLATES:
+        raise TemplateError(f"Bilinmeyen mesaj türü: {message_type}")
+    fields = TEMPLATE_FIELDS[message_type]
+    unknown = set(overrides or {}) - set(fields)
+    if unknown:
+        raise TemplateError(f"Bilinmeyen şablon bölümü: {', '.join(sorted(unknown))}")
+    parts = {**DEFAULT_TEMPLATES[message_type], **(overrides or {})}
+    return {name: compile_part(text, frozenset(fields[name])) for name, text in parts.items()}
+
+
+def render_batch(templates: dict, part: str, rows):
+    """Render one part for many rows"""
+    return list(map(templates[part], rows))
+
+
+def render_daily_summaries(templates: dict, summaries):
+    """Summary texts for many doctors in one pass.
+
+    Each summary holds the counters of the "text" part plus `accepted` and
+    `not_accepted` lists of patient rows for the "patient_line" part.
+    """
+    line = templates["patient_line"]
+    rows = []
+    for summary in summaries:
+        sections = {}
+        for key in ("accepted", "not_accepted"):
+            patients = summary[key]
+            sections[f"{key}_section"] = templates[f"{key}_section"](
+                {"lines": "".join(map(line, patients)), "count": len(patients)}
+            ) if patients else ""
+        rows.append({
+            **{k: v for k, v in summary.items() if k not in ("accepted", "not_accepted")},
+            "accepted_count": len(summary["accepted"]),
+            "not_accepted_count": len(summary["not_accepted"]),
+            **sections,
+        })
+    return render_batch(templates, "text", rows)
@@ -0,0 +1,211 @@
+"""PDF report builders (ReportLab).
+
+Kept out of server.py so ReportLab is only imported when an export route is
+first used, not on every cold start.
+"""
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER
+
+if TYPE_CHECKING:
+    from server import MonthlyStats
+
+
+def create_turkish_paragraph(text, style):
+    """Create paragraph with Turkish characters support"""
+    return Paragraph(text, style)
+
+
+def create_monthly_stats_pdf(stats: "MonthlyStats", month_name: str):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Title
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    title = create_turkish_paragraph(f"Aylık İstatistik Raporu<br/>{month_name} {stats.year}", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Summary statistics
+    summary_data = [
+        ['Metrik', 'Sayı'],
+        ['Toplam Hasta', str(stats.total_patients)],
+        ['İmplant', str(stats.implant_count)],
+        ['Kontrol', str(stats.checkup_count)],
+        ['Muayene', str(stats.examination_count)],
+        ['Tekrar Görüşme', str(stats.revisit_count)],
+        ['Aile Sayısı', str(stats.total_families)]
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.5*inch))
+    
+    # Doctor performance
+    elements.append(create_turkish_paragraph("Doktor Performansı", styles['Heading2']))
+    elements.append(Spacer(1, 0.2*inch))
+    
+    doctor_data = [['Doktor', 'Muayene', 'Kabul', 'Oran']]
+    for ds in stats.doctor_stats:
+        doctor_data.append([
+            ds.doctor,
+            str(ds.total_examinations),
+            str(ds.accepted_count),
+            f"{ds.acceptance_rate}%"
+        ])
+    
+    doctor_table = Table(doctor_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
+    doctor_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    
+    elements.append(doctor_table)
+    
+    # Family statistics if available
+    if stats.family_stats:
+        elements.append(Spacer(1, 0.5*inch))
+        elements.append(create_turkish_paragraph("Aile İstatistikleri", styles['Heading2']))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        family_data = [['Aile Grubu', 'Hasta Sayısı', 'Kabul', 'Oran']]
+        for fs in stats.family_stats:
+            family_data.append([
+                fs.family_group,
+                str(fs.patient_count),
+                str(fs.accepted_count),
+                f"{fs.acceptance_rate}%"
+            ])
+        
+        family_table = Table(family_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
+        family_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f59e0b')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.Color(1, 0.95, 0.8)),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        
+        elements.append(family_table)
+    
+    # Profession statistics if available
+    if stats.profession_stats:
+        elements.append(Spacer(1, 0.5*inch))
+        elements.append(create_turkish_paragraph("Meslek İstatistikleri", styles['Heading2']))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        profession_data = [['Meslek Grubu', 'Hasta Sayısı', 'Kabul', 'Oran']]
+        for ps in stats.profession_stats:
+            profession_data.append([
+                ps.profession_group,
+                str(ps.patient_count),
+                str(ps.accepted_count),
+                f"{ps.acceptance_rate}%"
+            ])
+        
+        profession_table = Table(profession_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
+        profession_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b5cf6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.Color(0.9, 0.85, 1)),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        
+        elements.append(profession_table)
+    
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
+
+
+def create_daily_report_pdf(date: str, patients: list):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Title
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    
+    title = create_turkish_paragraph(f"Günlük Hasta Raporu<br/>{date}", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Patient list
+    if not patients:
+        elements.append(create_turkish_paragraph("Bu tarih için hasta bulunamadı.", styles['Normal']))
+    else:
+        patient_data = [['Hasta Adı', 'Doktor', 'Ziyaret Tipi', 'Durum']]
+        for p in patients:
+            status = 'Kabul Edildi' if p['accepted'] else 'Kabul Edilmedi'
+            patient_data.append([
+                p['patient_name'],
+                p['doctor'],
+                p['visit_type'],
+                status
+            ])
+        
+        patient_table = Table(patient_data, colWidths=[2*inch, 2*inch, 1.5*inch, 1.5*inch])
+        patient_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        
+        elements.append(patient_table)
+    
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,263 @@
+"""Query-plan regression check for the route handlers.
+
+Seeds a throwaway database on a local mongod, turns on the profiler, calls
+every route handler with the filter combinations the frontend uses, and fails
+if any query a handler issued
+  * ran as a COLLSCAN (unfiltered reads such as `find({})` are exempt), or
+  * examined more than --max-ratio documents per document returned.
+
+Usage:
+    MONGO_URL=mongodb://localhost:27017 python query_plan_check.py [--max-ratio 10]
+
+Exits with status 1 and prints the offending handler, parameters, collection
+and filter when a plan regresses, so it can run as a CI step.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+
+CHECK_DB = os.environ.get("DB_NAME", "esdent_gold") + "_plan_check"
+os.environ["DB_NAME"] = CHECK_DB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+import server  # noqa: E402  (needs DB_NAME set first)
+
+
+FAMILIES = [f"Aile {i}" for i in range(40)]
+PROFESSIONS = ["Öğretmen", "Mühendis", "Doktor", "Esnaf", "Memur", "Öğrenci", "Emekli"]
+
+
+async def seed(db, patients_count):
+    """Insert a realistic spread of patients, follow-ups and messages."""
+    today = datetime.now(timezone.utc).date()
+    doctors = list((await server.load_doctor_directory()).items())
+    patients, followups, messages = [], [], []
+    for i in range(patients_count):
+        visit_date = (today - timedelta(days=random.randint(0, 720))).isoformat()
+        status = random.choice(server.PATIENT_STATUS)
+        doctor_id, doctor = random.choice(doctors)
+        patient = server.Patient(
+            visit_date=visit_date,
+            patient_name=f"Hasta {i}",
+            phone_number=f"0555{i:07d}",
+            doctor=doctor,
+            doctor_id=doctor_id,
+            visit_type=random.choice(server.VISIT_TYPES),
+            status=status,
+            accepted=status == "kabul etti",
+            family_group=random.choice(FAMILIES) if random.random() < 0.3 else "",
+            profession_group=random.choice(PROFESSIONS) if random.random() < 0.5 else "",
+        ).model_dump()
+        patient['created_at'] = patient['created_at'].isoformat()
+        patients.append(patient)
+        if status == "düşünüyor":
+            followup = server.FollowUp(
+                patient_id=patient['id'],
+                patient_name=patient['patient_name'],
+                phone_number=patient['phone_number'],
+                doctor=patient['doctor'],
+                doctor_id=patient['doctor_id'],
+                followup_date=(datetime.fromisoformat(visit_date) + timedelta(days=7)).strftime("%Y-%m-%d"),
+                patient_status=status,
+                followup_status=random.choice(["beklemede", "gecikmiş", "tamamlandı"]),
+            ).model_dump()
+            followup['created_at'] = followup['created_at'].isoformat()
+            if followup['followup_status'] != "tamamlandı":
+                followup['open'] = True
+            followups.append(followup)
+            message = server.WhatsAppMessage(
+                message_type="followup_reminder",
+                recipient_name=patient['patient_name'],
+                recipient_phone=patient['phone_number'],
+                message_text="...",
+                scheduled_date=followup['followup_date'],
+                status=random.choice(["onay_bekliyor", "gönderildi"]),
+            ).model_dump()
+            message['created_at'] = message['created_at'].isoformat()
+            messages.append(message)
+    await db.patients.insert_many(patients)
+    await db.followups.insert_many(followups)
+    await db.whatsapp_messages.insert_many(messages)
+    return patients, followups, messages
+
+
+def scenarios(patients, followups, messages):
+    """(handler, kwargs) pairs covering each endpoint's filter combinations."""
+    today = datetime.now(timezone.utc).date()
+    sample = random.choice(patients)
+    thinking = next(p for p in patients if p['status'] == "düşünüyor")
+    month_start = today.replace(day=1).isoformat()
+    month_end = today.isoformat()
+    doctor = server.INITIAL_DOCTORS[0]
+    family = next(p['family_group'] for p in patients if p['family_group'])
+    profession = next(p['profession_group'] for p in patients if p['profession_group'])
+    patient_input = server.PatientCreate(**{k: sample[k] for k in server.PatientCreate.model_fields})
+    new_patient = server.PatientCreate(**{**patient_input.model_dump(), "patient_name": "Yeni Hasta",
+                                          "status": "düşünüyor", "is_revisit": False})
+    dashboard_fields = {f"{s}_fields": "total" for s in ("accepted", "not_accepted", "thinking", "overdue")}
+    return [
+        (server.get_doctors, {}),
+        (server.get_doctors, {"active_only": False}),
+        (server.get_all_doctors_with_details, {}),
+        (server.get_overdue_patients, {}),
+        (server.get_counts, {}),
+        (server.get_doctor_info, {}),
+        (server.get_patients, {}),
+        (server.get_patients, {"start_date": month_start, "end_date": month_end}),
+        (server.get_patients, {"doctor": doctor}),
+        (server.get_patients, {"doctor": doctor, "start_date": month_start, "end_date": month_end}),
+        (server.get_patients, {"family_group": family}),
+        (server.get_patients, {"profession_group": profession}),
+        (server.get_daily_patients, {"date": sample['visit_date']}),
+        (server.get_accepted_patients, {"start_date": month_start, "end_date": month_end}),
+        (server.get_accepted_patients, {"month": today.month, "year": today.year}),
+        (server.get_not_accepted_patients, {"start_date": month_start, "end_date": month_end}),
+        (server.get_thinking_patients, {"start_date": month_start, "end_date": month_end}),
+        (server.get_thinking_patients, {}),
+        (server.get_family_groups, {}),
+        (server.get_profession_groups, {}),
+        (server.get_family_group_detail, {"family_group": family}),
+        (server.get_followups, {}),
+        (server.get_followups, {"status": "beklemede"}),
+        (server.get_followups, {"doctor": doctor}),
+        (server.get_followups, {"start_date": month_start, "end_date": month_end}),
+        (server.get_whatsapp_messages, {}),
+        (server.get_whatsapp_messages, {"status": "onay_bekliyor"}),
+        (server.get_whatsapp_messages, {"message_type": "followup_reminder"}),
+        (server.get_whatsapp_messages, {"date": messages[0]['scheduled_date']}),
+        (server.get_weekly_trend, {"year": today.year, "month": today.month}),
+        (server.get_monthly_statistics, {"year": today.year, "month": today.month}),
+        (server.get_yearly_statistics, {"year": today.year - 1}),
+        (server.get_statistics_cube, {"dims": "doctor,month", "measures": "count,accepted,acceptance_rate",
+                                      "date_from": None, "date_to": None, "top": None}),
+        (server.get_statistics_cube, {"dims": "family_group", "measures": "count", "date_from": month_start,
+                                      "date_to": month_end, "top": 5}),
+        (server.get_dashboard, {"start_date": month_end, "end_date": month_end, "year": today.year,
+                                "month": today.month, "sections": "accepted,not_accepted,thinking,overdue",
+                                **dashboard_fields}),
+        (server.get_dashboard, {"start_date": month_start, "end_date": month_end, "year": today.year,
+                                "month": today.month}),
+        (server.get_daily_bootstrap, {"response": server.Response(), "date": sample['visit_date'],
+                                      "if_none_match": None}),
+        # The first call claims the Idempotency-Key, the second replays it
+        (server.create_patient, {"input": new_patient, "idempotency_key": "plan-check"}),
+        (server.create_patient, {"input": new_patient, "idempotency_key": "plan-check"}),
+        (server.relay_side_effect_outbox, {}),
+        (server.claim_side_effect, {}),
+        (server.get_patient_side_effects, {"patient_id": sample['id']}),
+        (server.generate_daily_summaries, {"date": sample['visit_date']}),
+        (server.update_patient, {"patient_id": sample['id'], "input": patient_input}),
+        (server.mark_as_revisit, {"patient_id": sample['id'], "revisit_date": month_end}),
+        (server.send_reminder_to_patient, {"patient_id": thinking['id']}),
+        (server.send_bulk_reminders, {"date_from": month_start, "date_to": month_end, "window_days": 7}),
+        (server.send_bulk_reminders, {"date_from": month_start, "date_to": month_end, "doctor": doctor, "window_days": 7}),
+        (server.update_followup_status, {"followup_id": followups[0]['id'], "followup_status": "tamamlandı"}),
+        (server.run_followup_cadence, {}),
+        (server.approve_and_send_message, {"message_id": messages[0]['id']}),
+        (server.update_message_status, {"message_id": messages[1]['id'], "status": "gönderildi"}),
+        (server.bulk_update_messages, {"input": server.WhatsAppBulkUpdate(
+            message_type="followup_reminder", scheduled_date=messages[2]['scheduled_date'], approve=True)}),
+        (server.bulk_update_messages, {"input": server.WhatsAppBulkUpdate(
+            ids=[m['id'] for m in messages[3:6]], status="başarısız")}),
+        (server.delete_patient, {"patient_id": sample['id']}),
+    ]
+
+
+def operation_filter(entry):
+    """Pull the filter/pipeline out of a system.profile entry."""
+    command = entry.get("command", {})
+    for key in ("filter", "q", "query", "pipeline"):
+        if key in command:
+            return command[key]
+    return {}
+
+
+def operation_returned(entry):
+    for key in ("nreturned", "nMatched", "ndeleted"):
+        if key in entry:
+            return entry[key]
+    return 0
+
+
+def is_unfiltered(filter_):
+    if isinstance(filter_, list):
+        return not any(stage.get("$match") for stage in filter_)
+    return not filter_
+
+
+async def collect(db, handler, kwargs, max_ratio):
+    """Run one handler with the profiler on and return its plan violations."""
+    await db.system.profile.drop()
+    await db.command("profile", 2)
+    try:
+        await handler(**kwargs)
+    finally:
+        await db.command("profile", 0)
+
+    violations = []
+    async for entry in db.system.profile.find({"ns": {"$not": {"$regex": r"\.system\."}}}):
+        if "planSummary" not in entry:
+            continue
+        filter_ = operation_filter(entry)
+        examined = entry.get("docsExamined", 0)
+        returned = operation_returned(entry)
+        problem = None
+        if "COLLSCAN" in entry["planSummary"] and not is_unfiltered(filter_):
+            problem = "COLLSCAN"
+        elif examined > max_ratio * max(returned, 1):
+            problem = f"examined/returned {examined}/{returned} > {max_ratio}"
+        if problem:
+            violations.append({
+                "handler": handler.__name__,
+                "params": {k: v for k, v in kwargs.items() if not hasattr(v, "model_dump")},
+                "collection": entry["ns"].split(".", 1)[1],
+                "op": entry.get("op"),
+                "filter": filter_,
+                "plan": entry["planSummary"],
+                "problem": problem,
+            })
+    return violations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fail on route handler queries that miss an index")
+    parser.add_argument("--patients", type=int, default=5000, help="Seeded patient count")
+    parser.add_argument("--max-ratio", type=float, default=10, help="Max docs examined per doc returned")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database afterwards")
+    args = parser.parse_args()
+
+    random.seed(1)
+    db = server.db
+    await server.client.drop_database(CHECK_DB)
+    await server.initialize_doctors()
+    await server.ensure_indexes()
+    patients, followups, messages = await seed(db, args.patients)
+    await server.rebuild_group_registries()
+
+    violations = []
+    try:
+        for handler, kwargs in scenarios(patients, followups, messages):
+            violations.extend(await collect(db, handler, kwargs, args.max_ratio))
+    finally:
+        if not args.keep:
+            await server.client.drop_database(CHECK_DB)
+
+    if violations:
+        print(f"{len(violations)} query plan regression(s):")
+        for v in violations:
+            print(f"\n  {v['handler']}({json.dumps(v['params'], ensure_ascii=False)})")
+            print(f"    {v['op']} on {v['collection']}: {v['problem']}")
+            print(f"    filter: {json.dumps(v['filter'], ensure_ascii=False, default=str)}")
+            print(f"    plan:   {v['plan']}")
+        return 1
+    print("All handler queries use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
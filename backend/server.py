@@ -1,31 +1,147 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Header, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import monitoring, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
+from pymongo.read_preferences import SecondaryPreferred
+from python_multipart.multipart import MultipartParser, parse_options_header
 import os
+import asyncio
+import codecs
+import contextvars
+import csv
+import gzip
+import hashlib
+import io
+import json
 import logging
+import math
+import time
+import inspect
+from functools import lru_cache, wraps
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, date, timedelta
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+import message_templates
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counts connection pool events for one client (exposed via /api/metrics)"""
+
+    def __init__(self):
+        self.counts = {
+            "created": 0, "closed": 0, "checked_out": 0, "checked_in": 0,
+            "check_out_failed": 0, "pool_cleared": 0,
+        }
+
+    def snapshot(self):
+        return {
+            **self.counts,
+            "open": self.counts["created"] - self.counts["closed"],
+            "in_use": self.counts["checked_out"] - self.counts["checked_in"],
+        }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.counts["pool_cleared"] += 1
+
+    def connection_created(self, event):
+        self.counts["created"] += 1
+
+    def connection_closed(self, event):
+        self.counts["closed"] += 1
+
+    def connection_check_out_failed(self, event):
+        self.counts["check_out_failed"] += 1
+
+    def connection_checked_out(self, event):
+        self.counts["checked_out"] += 1
+
+    def connection_checked_in(self, event):
+        self.counts["checked_in"] += 1
+
+
+# Name (after the MONGO_ / MONGO_ANALYTICS_ prefix), client option, default
+MONGO_CLIENT_SETTINGS = [
+    ("MAX_POOL_SIZE", "maxPoolSize", 50),
+    ("MIN_POOL_SIZE", "minPoolSize", 0),
+    ("MAX_IDLE_TIME_MS", "maxIdleTimeMS", 300000),
+    ("SERVER_SELECTION_TIMEOUT_MS", "serverSelectionTimeoutMS", 10000),
+    ("CONNECT_TIMEOUT_MS", "connectTimeoutMS", 10000),
+    ("SOCKET_TIMEOUT_MS", "socketTimeoutMS", 60000),
+    ("WAIT_QUEUE_TIMEOUT_MS", "waitQueueTimeoutMS", 10000),
+]
+
+
+def mongo_client_options(prefix='MONGO', defaults=None):
+    """Client options from the environment, e.g. MONGO_MAX_POOL_SIZE=20"""
+    defaults = defaults or {}
+    options = {}
+    for name, option, default in MONGO_CLIENT_SETTINGS:
+        options[option] = int(os.environ.get(f"{prefix}_{name}", defaults.get(option, default)))
+    options["appname"] = os.environ.get(f"{prefix}_APP_NAME", defaults.get("appname", "esdent-gold-backend"))
+    # Comma-separated, e.g. "zstd,snappy,zlib"; zlib needs no extra package
+    compressors = os.environ.get(f"{prefix}_COMPRESSORS", defaults.get("compressors", "" if defaults else "zlib"))
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client_options = mongo_client_options()
+client_pool_metrics = PoolMetrics()
+client = AsyncIOMotorClient(mongo_url, event_listeners=[client_pool_metrics], **client_options)
 db = client[os.environ['DB_NAME']]
+# Finished reports (PDF, zip, CSV) with kind/period/data-hash metadata
+reports_fs = AsyncIOMotorGridFSBucket(db, bucket_name="reports")
+
+# Heavy reads (statistics, exports) go through analytics_db. With
+# MONGO_ANALYTICS_URL set they get their own client and pool (options read from
+# MONGO_ANALYTICS_*); otherwise they share the main pool. Either way they prefer
+# secondaries, accepting data up to MONGO_ANALYTICS_MAX_STALENESS_S old (min 90).
+analytics_url = os.environ.get('MONGO_ANALYTICS_URL')
+if analytics_url:
+    analytics_client_options = mongo_client_options(
+        'MONGO_ANALYTICS', {**client_options, "appname": f"{client_options['appname']}-analytics"}
+    )
+    analytics_pool_metrics = PoolMetrics()
+    analytics_client = AsyncIOMotorClient(analytics_url, event_listeners=[analytics_pool_metrics], **analytics_client_options)
+else:
+    analytics_client_options = client_options
+    analytics_pool_metrics = client_pool_metrics
+    analytics_client = client
+analytics_read_preference = SecondaryPreferred(
+    max_staleness=max(90, int(os.environ.get('MONGO_ANALYTICS_MAX_STALENESS_S', 120)))
+)
+analytics_db = analytics_client.get_database(os.environ['DB_NAME'], read_preference=analytics_read_preference)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -43,6 +159,384 @@ INITIAL_DOCTORS = [
 
 VISIT_TYPES = ["implant", "kontrol", "muayene"]
 PATIENT_STATUS = ["kabul etti", "kabul etmedi", "düşünüyor"]
+MESSAGE_STATUS = ["onay_bekliyor", "gönderildi", "başarısız"]
+
+
+class ReferenceCache:
+    """Per-process TTL cache for reference data and computed results.
+
+    Writes in this process invalidate the affected keys; the TTL bounds how long
+    other workers can serve a stale copy. Entries restored from a snapshot are
+    served immediately and revalidated against Mongo in the background.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self.entries = {}  # key -> (stored_at epoch seconds, value, verified)
+        self.refreshing = {}
+        self.stats = {"hits": 0, "misses": 0, "snapshot_hits": 0}
+
+    async def get(self, key: str, loader):
+        entry = self.entries.get(key)
+        if entry and not entry[2]:
+            self.stats["snapshot_hits"] += 1
+            self._revalidate(key, entry, loader)
+            return entry[1]
+        if entry and time.time() - entry[0] < self.ttl:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        value = await loader()
+        self.entries[key] = (time.time(), value, True)
+        return value
+
+    def _revalidate(self, key, entry, loader):
+        if key in self.refreshing:
+            return
+
+        async def refresh():
+            try:
+                value = await loader()
+                # Skip if a write invalidated or replaced the entry meanwhile
+                if self.entries.get(key) is entry:
+                    self.entries[key] = (time.time(), value, True)
+            except Exception as e:
+                logger.warning(f"Önbellek girdisi {key} yenilenemedi: {e}")
+            finally:
+                self.refreshing.pop(key, None)
+
+        self.refreshing[key] = asyncio.create_task(refresh())
+
+    def invalidate(self, *keys: str):
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def peek(self, key: str):
+        """Fresh cached value or None, without loading"""
+        entry = self.entries.get(key)
+        if entry and entry[2] and time.time() - entry[0] < self.ttl:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value):
+        self.entries[key] = (time.time(), value, True)
+
+    def add_member(self, key: str, value):
+        """Insert value into a cached sorted list in place instead of reloading it"""
+        entry = self.entries.get(key)
+        if value and entry and value not in entry[1]:
+            # Keeps stored_at, so the TTL still bounds staleness across workers
+            self.entries[key] = (entry[0], sorted([*entry[1], value]), entry[2])
+
+    def dump(self):
+        return {key: [stored_at, value] for key, (stored_at, value, _) in self.entries.items()}
+
+    def load(self, entries: dict, max_age: float):
+        now = time.time()
+        for key, (stored_at, value) in entries.items():
+            if now - stored_at < max_age and key not in self.entries:
+                self.entries[key] = (stored_at, value, False)
+
+
+reference_cache = ReferenceCache(float(os.environ.get('REFERENCE_CACHE_TTL_S', 60)))
+
+# In-process front for the monthly_stats_cache collection, keyed "YYYY-MM".
+# Writes in this process drop entries at once; the TTL bounds other workers.
+stats_cache = ReferenceCache(float(os.environ.get('STATS_CACHE_TTL_S', 300)))
+
+# Cube cells keyed "dims|from|to"; dropped by writes inside the date range
+cube_cache = ReferenceCache(float(os.environ.get('CUBE_CACHE_TTL_S', 300)))
+
+# Navigation badge counts keyed by date; short TTL instead of invalidation
+counts_cache = ReferenceCache(float(os.environ.get('COUNTS_CACHE_TTL_S', 10)))
+
+class SingleFlight:
+    """Coalesces concurrent identical calls of idempotent GET handlers.
+
+    Callers with the same route and normalized parameters share one in-flight
+    computation and its result. Routes listed in COALESCE_DISABLED (comma
+    separated) always execute.
+    """
+
+    def __init__(self, disabled):
+        self.disabled = set(disabled)
+        self.in_flight = {}
+        self.stats = {}
+
+    def __call__(self, name: str):
+        def decorator(handler):
+            signature = inspect.signature(handler)
+            self.stats[name] = {"executed": 0, "coalesced": 0}
+
+            @wraps(handler)
+            async def wrapper(*args, **kwargs):
+                if name in self.disabled:
+                    self.stats[name]["executed"] += 1
+                    return await handler(*args, **kwargs)
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = (name, tuple(sorted((k, repr(v)) for k, v in bound.arguments.items())))
+                task = self.in_flight.get(key)
+                if task is None:
+                    self.stats[name]["executed"] += 1
+                    task = asyncio.create_task(handler(*args, **kwargs))
+                    self.in_flight[key] = task
+                    task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+                else:
+                    self.stats[name]["coalesced"] += 1
+                # Shielded so one caller disconnecting doesn't cancel the others
+                return await asyncio.shield(task)
+
+            return wrapper
+        return decorator
+
+
+coalesce = SingleFlight(d.strip() for d in os.environ.get('COALESCE_DISABLED', '').split(',') if d.strip())
+
+
+class ConcurrencyLimiter:
+    """Declarative per-route concurrency limits with bounded wait queues.
+
+    A limited route runs at most `concurrency` calls at once and lets `queue`
+    more wait up to `timeout` seconds; beyond that callers get a fast 503 with
+    Retry-After. Admitted calls also hold back (up to PRIORITY_YIELD_S) while a
+    priority route is running, so front-desk patient writes stay fast under
+    report load. Calls made from inside a limited call are not limited again.
+    """
+
+    def __init__(self, limits: dict, priority_yield_s: float):
+        self.limits = limits  # name -> (concurrency, queue, timeout seconds)
+        self.priority_yield_s = priority_yield_s
+        self.semaphores = {}
+        self.priority_active = 0
+        self.priority_idle = None
+        self.exempt = contextvars.ContextVar("concurrency_exempt", default=False)
+        self.stats = {}
+
+    def _idle(self):
+        # Created lazily so it binds to the server's event loop
+        if self.priority_idle is None:
+            self.priority_idle = asyncio.Event()
+            self.priority_idle.set()
+        return self.priority_idle
+
+    async def yield_to_priority(self):
+        idle = self._idle()
+        if not idle.is_set():
+            try:
+                await asyncio.wait_for(idle.wait(), self.priority_yield_s)
+            except asyncio.TimeoutError:
+                pass
+
+    def priority(self, handler):
+        @wraps(handler)
+        async def wrapper(*args, **kwargs):
+            idle = self._idle()
+            self.priority_active += 1
+            idle.clear()
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                self.priority_active -= 1
+                if not self.priority_active:
+                    idle.set()
+
+        return wrapper
+
+    def limit(self, name: str):
+        concurrency, queue, timeout = self.limits[name]
+        stats = self.stats.setdefault(
+            name, {"limit": concurrency, "queue": queue, "active": 0, "waiting": 0, "rejected": 0}
+        )
+
+        def busy():
+            # A fresh exception per rejection; a shared one would keep growing its traceback
+            return HTTPException(
+                status_code=503,
+                detail="Sunucu yoğun, lütfen biraz sonra tekrar deneyin",
+                headers={"Retry-After": str(math.ceil(timeout))}
+            )
+
+        def decorator(handler):
+            @wraps(handler)
+            async def wrapper(*args, **kwargs):
+                if self.exempt.get():
+                    return await handler(*args, **kwargs)
+                semaphore = self.semaphores.get(name)
+                if semaphore is None:
+                    semaphore = self.semaphores[name] = asyncio.Semaphore(concurrency)
+                if stats["active"] + stats["waiting"] >= concurrency + queue:
+                    stats["rejected"] += 1
+                    raise busy()
+                stats["waiting"] += 1
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), timeout)
+                except asyncio.TimeoutError:
+                    stats["rejected"] += 1
+                    raise busy()
+                finally:
+                    stats["waiting"] -= 1
+                stats["active"] += 1
+                token = self.exempt.set(True)
+                try:
+                    await self.yield_to_priority()
+                    return await handler(*args, **kwargs)
+                finally:
+                    self.exempt.reset(token)
+                    stats["active"] -= 1
+                    semaphore.release()
+
+            return wrapper
+        return decorator
+
+
+# name -> (concurrent calls, waiting callers, max wait seconds)
+ROUTE_CONCURRENCY_LIMITS = {
+    "monthly_stats": (2, 8, 10),
+    "yearly_stats": (1, 4, 15),
+    "stats_cube": (2, 8, 10),
+    "exports": (1, 4, 20),
+    "daily_summaries": (1, 2, 10),
+    "imports": (1, 2, 30),
+}
+
+
+def concurrency_limits(defaults: dict):
+    """Defaults overridden by CONCURRENCY_LIMITS, e.g. monthly_stats=1/4,exports=2"""
+    limits = dict(defaults)
+    for item in os.environ.get('CONCURRENCY_LIMITS', '').split(','):
+        if '=' not in item:
+            continue
+        name, value = (part.strip() for part in item.split('=', 1))
+        if name not in limits:
+            continue
+        concurrency, _, queue = value.partition('/')
+        _, default_queue, timeout = limits[name]
+        limits[name] = (int(concurrency), int(queue) if queue else default_queue, timeout)
+    return limits
+
+
+concurrency = ConcurrencyLimiter(
+    concurrency_limits(ROUTE_CONCURRENCY_LIMITS), float(os.environ.get('PRIORITY_YIELD_S', 2))
+)
+
+IDEMPOTENCY_TTL_S = float(os.environ.get('IDEMPOTENCY_TTL_S', 86400))
+# A key still marked in progress after this long is assumed abandoned
+IDEMPOTENCY_LOCK_S = float(os.environ.get('IDEMPOTENCY_LOCK_S', 60))
+
+
+# The Idempotency-Key record of the call in progress: {"key", "written", "saved"}
+idempotency_state = contextvars.ContextVar("idempotency_state", default=None)
+
+
+def idempotent_write():
+    """Mark that the handler is about to write; from here on a failure no longer releases the key"""
+    state = idempotency_state.get()
+    if state is not None:
+        state['written'] = True
+
+
+async def idempotent_response(result):
+    """Store the handler's response as soon as its write has committed, before any follow-up work"""
+    state = idempotency_state.get()
+    if state is None or state['saved']:
+        return
+    await db.idempotency_keys.update_one(
+        {"_id": state['key']},
+        {"$set": {"state": "tamamlandı", "response": jsonable_encoder(result),
+                  "completed_at": datetime.now(timezone.utc)}}
+    )
+    state['saved'] = True
+
+
+def idempotent(name: str):
+    """Idempotency-Key support for non-idempotent POST handlers.
+
+    The first request with a key claims it in idempotency_keys and stores its
+    response; retries with the same key and body get that response back from a
+    single _id lookup, a concurrent duplicate gets 409, and the same key with a
+    different body gets 422. Handlers call idempotent_write() before their
+    write and idempotent_response() once it has committed: a call failing
+    before the write releases the key, one failing after it keeps the stored
+    response, or else the error, for retries to replay. Records expire after
+    IDEMPOTENCY_TTL_S through a TTL index.
+    """
+    def decorator(handler):
+        signature = inspect.signature(handler)
+        header = inspect.Parameter(
+            "idempotency_key", inspect.Parameter.KEYWORD_ONLY,
+            default=Header(None, alias="Idempotency-Key"), annotation=Optional[str]
+        )
+
+        @wraps(handler)
+        async def wrapper(*args, idempotency_key: Optional[str] = None, **kwargs):
+            if not idempotency_key:
+                return await handler(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            payload = json.dumps(jsonable_encoder(bound.arguments), sort_keys=True)
+            request_hash = hashlib.sha256(payload.encode()).hexdigest()
+            key = f"{name}:{idempotency_key}"
+            now = datetime.now(timezone.utc)
+            try:
+                await db.idempotency_keys.insert_one({
+                    "_id": key,
+                    "request_hash": request_hash,
+                    "state": "işleniyor",
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_S),
+                })
+            except DuplicateKeyError:
+                existing = await db.idempotency_keys.find_one({"_id": key}) or {}
+                if existing.get('request_hash', request_hash) != request_hash:
+                    raise HTTPException(status_code=422, detail="Idempotency-Key farklı bir istek için kullanılmış")
+                if existing.get('state') == "tamamlandı":
+                    return JSONResponse(content=existing['response'], headers={"Idempotent-Replayed": "true"})
+                if existing.get('state') == "başarısız":
+                    return JSONResponse(status_code=existing['status_code'], content={"detail": existing['detail']},
+                                        headers={"Idempotent-Replayed": "true"})
+                taken = await db.idempotency_keys.update_one(
+                    {"_id": key, "state": "işleniyor", "created_at": {"$lt": now - timedelta(seconds=IDEMPOTENCY_LOCK_S)}},
+                    {"$set": {"created_at": now, "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_S)}}
+                )
+                if not taken.modified_count:
+                    raise HTTPException(status_code=409, detail="Aynı istek hâlâ işleniyor", headers={"Retry-After": "1"})
+
+            state = {"key": key, "written": False, "saved": False}
+            token = idempotency_state.set(state)
+            try:
+                result = await handler(*args, **kwargs)
+                await idempotent_response(result)
+                return result
+            except Exception as e:
+                if state['saved']:
+                    raise
+                if not state['written']:
+                    await db.idempotency_keys.delete_one({"_id": key})
+                    raise
+                # The write may have been applied; retries must not redo it
+                status_code = e.status_code if isinstance(e, HTTPException) else 500
+                detail = e.detail if isinstance(e, HTTPException) else "İstek kısmen uygulanmış olabilir"
+                await db.idempotency_keys.update_one(
+                    {"_id": key},
+                    {"$set": {"state": "başarısız", "status_code": status_code, "detail": detail,
+                              "completed_at": datetime.now(timezone.utc)}}
+                )
+                raise
+            finally:
+                idempotency_state.reset(token)
+
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), header])
+        return wrapper
+    return decorator
+
+# Seconds spent in each background warm-up phase (see warm_up)
+startup_phases = {}
 
 
 # Define Models
@@ -64,6 +558,7 @@ class Patient(BaseModel):
     patient_name: str
     phone_number: Optional[str] = ""
     doctor: str
+    doctor_id: Optional[str] = None  # doctors.id; `doctor` is rendered from it
     visit_type: str
     status: str  # "kabul etti", "kabul etmedi", "düşünüyor"
     accepted: bool  # Derived from status for backward compatibility
@@ -97,9 +592,11 @@ class FollowUp(BaseModel):
     patient_name: str
     phone_number: Optional[str] = ""
     doctor: str
+    doctor_id: Optional[str] = None
     followup_date: str  # ISO date string YYYY-MM-DD
     patient_status: str  # "kabul etti", "kabul etmedi", "düşünüyor"
     followup_status: str = "beklemede"  # "beklemede", "gecikmiş", "tamamlandı"
+    stage: int = 1  # position in FOLLOWUP_CADENCE_DAYS, 1-based
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
@@ -124,9 +621,26 @@ class WhatsAppMessage(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class MessageTemplateUpdate(BaseModel):
+    # Overridden parts; parts left out use the built-in defaults
+    parts: Dict[str, str] = {}
+
+
+class WhatsAppBulkUpdate(BaseModel):
+    # Target messages: explicit ids, or a filter on the fields below
+    ids: Optional[List[str]] = None
+    message_type: Optional[str] = None
+    scheduled_date: Optional[str] = None
+    current_status: Optional[str] = None
+    # Change: approve (as the single approve route) or set `status`
+    approve: bool = False
+    status: Optional[str] = None
+
+
 class DoctorInfo(BaseModel):
     doctor_name: str
     phone_number: str
+    doctor_id: Optional[str] = None
 
 
 class DoctorStats(BaseModel):
@@ -156,6 +670,7 @@ class MonthlyStats(BaseModel):
     checkup_count: int
     examination_count: int
     revisit_count: int  # Tekrar görüşmeler
+    status_counts: Dict[str, int] = {}  # Hasta durumuna göre
     doctor_stats: List[DoctorStats]
     family_stats: List[FamilyStats]
     profession_stats: List[ProfessionStats]
@@ -170,7 +685,6 @@ async def root():
     return {"message": "Esdent Gold Diş Kliniği Yönetim Sistemi"}
 
 
-@api_router.on_event("startup")
 async def initialize_doctors():
     """Initialize doctors collection if empty"""
     count = await db.doctors.count_documents({})
@@ -180,13 +694,489 @@ async def initialize_doctors():
             doc_dict = doc.model_dump()
             doc_dict['created_at'] = doc_dict['created_at'].isoformat()
             await db.doctors.insert_one(doc_dict)
+        reference_cache.invalidate("active_doctors", "doctor_directory")
+
+
+# Every filter and sort used by the route handlers must be covered by one of
+# these; query_plan_check.py fails on COLLSCANs and poor examined/returned ratios.
+INDEXES = {
+    "patients": [
+        ([("id", 1)], {"unique": True}),
+        ([("visit_date", -1), ("created_at", 1)], {}),
+        ([("status", 1), ("visit_date", -1)], {}),
+        ([("doctor_id", 1), ("visit_date", -1)], {}),
+        ([("family_group", 1), ("visit_date", -1)], {}),
+        ([("profession_group", 1), ("visit_date", -1)], {}),
+        # Thinking patients whose next cadence follow-up is still to be created
+        ([("next_followup_date", 1)], {"sparse": True}),
+        # Patients whose creation tasks are not relayed to side_effects yet
+        ([("outbox._id", 1)], {"sparse": True}),
+    ],
+    "followups": [
+        ([("id", 1)], {"unique": True}),
+        ([("patient_id", 1)], {}),
+        ([("followup_date", 1)], {}),
+        ([("followup_status", 1), ("followup_date", 1)], {}),
+        ([("doctor_id", 1), ("followup_date", 1)], {}),
+        # At most one open (not completed) follow-up per patient
+        ([("patient_id", 1), ("open", 1)], {"unique": True, "partialFilterExpression": {"open": True}}),
+    ],
+    "whatsapp_messages": [
+        ([("id", 1)], {"unique": True}),
+        ([("scheduled_date", 1)], {}),
+        ([("status", 1), ("scheduled_date", 1)], {}),
+        ([("message_type", 1), ("scheduled_date", 1)], {}),
+        ([("recipient_phone", 1), ("scheduled_date", -1)], {}),
+        ([("recipient_name", 1)], {}),
+    ],
+    "doctors": [
+        ([("id", 1)], {"unique": True}),
+        ([("name", 1)], {}),
+        ([("active", 1), ("name", 1)], {}),
+    ],
+    "doctor_info": [
+        ([("doctor_name", 1)], {"unique": True}),
+    ],
+    "reports.files": [
+        ([("metadata.kind", 1), ("metadata.period", -1), ("metadata.data_hash", 1)], {}),
+        ([("metadata.period", -1), ("metadata.created_at", -1)], {}),
+        ([("metadata.expires_at", 1)], {}),
+    ],
+    "side_effects": [
+        ([("status", 1), ("next_attempt_at", 1)], {}),
+        ([("patient_id", 1), ("created_at", 1)], {}),
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "message_templates": [
+        ([("clinic", 1), ("message_type", 1), ("version", -1)], {"unique": True}),
+    ],
+    "import_jobs": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "idempotency_keys": [
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "report_jobs": [
+        ([("dedupe_key", 1)], {"unique": True, "partialFilterExpression": {"active": True}}),
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+
+async def ensure_indexes():
+    """Create the indexes the route handlers rely on (no-op if they exist)"""
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                await db[collection].create_index(keys, **options)
+            except Exception as e:
+                logger.warning(f"Index {collection}{keys} oluşturulamadı: {e}")
+
+
+async def load_active_doctors():
+    return await db.doctors.find({"active": True}, {"_id": 0, "id": 1, "name": 1}).sort("name", 1).to_list(100)
+
+
+async def load_doctor_directory():
+    doctors = await db.doctors.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    return {d['id']: d['name'] for d in doctors}
+
+
+async def load_family_groups():
+    families = await db.family_groups.find({}, {"_id": 1}).sort("_id", 1).to_list(None)
+    return [f['_id'] for f in families]
+
+
+async def load_profession_groups():
+    professions = await db.profession_groups.find({}, {"_id": 1}).sort("_id", 1).to_list(None)
+    return [p['_id'] for p in professions]
+
+
+# Overrides in message_templates are per clinic; each save is a new version
+CLINIC_ID = os.environ.get('CLINIC_ID', 'default')
+
+
+async def load_message_templates():
+    """{message_type: {"version", "parts"}} of this clinic's latest overrides"""
+    latest = await db.message_templates.aggregate([
+        {"$match": {"clinic": CLINIC_ID}},
+        {"$sort": {"message_type": 1, "version": -1}},
+        {"$group": {"_id": "$message_type", "version": {"$first": "$version"}, "parts": {"$first": "$parts"}}},
+    ]).to_list(None)
+    return {t['_id']: {"version": t['version'], "parts": t['parts']} for t in latest}
+
+
+async def get_message_templates(message_type: str):
+    """Compiled {part: renderer} for a message type, clinic overrides applied"""
+    override = (await reference_cache.get("message_templates", load_message_templates)).get(message_type)
+    try:
+        return message_templates.compile_templates(message_type, override['parts'] if override else None)
+    except message_templates.TemplateError as e:
+        logger.warning(f"{message_type} şablonu derlenemedi, varsayılan kullanılıyor: {e}")
+        return message_templates.compile_templates(message_type)
+
+
+async def get_active_doctors():
+    """[{"id", "name"}] of active doctors, sorted by name"""
+    return await reference_cache.get("active_doctors", load_active_doctors)
+
+
+async def get_active_doctor_names():
+    return [d['name'] for d in await get_active_doctors()]
+
+
+async def get_doctor_directory():
+    """Process-wide doctors.id -> current name map, including inactive doctors"""
+    return await reference_cache.get("doctor_directory", load_doctor_directory)
+
+
+async def resolve_doctor_id(name: str):
+    """doctors.id for a display name, or None if no doctor has that name"""
+    directory = await get_doctor_directory()
+    return next((doctor_id for doctor_id, doctor_name in directory.items() if doctor_name == name), None)
+
+
+async def doctor_filter(name: str):
+    """Query clause for one doctor's records; records without a doctor_id match by name"""
+    doctor_id = await resolve_doctor_id(name)
+    if not doctor_id:
+        return {"doctor": name}
+    return {"$or": [{"doctor_id": doctor_id}, {"doctor_id": None, "doctor": name}]}
+
+
+def doctors_filter(doctors: list):
+    """doctor_filter for a list of {"id", "name"} doctors"""
+    return {"$or": [
+        {"doctor_id": {"$in": [d['id'] for d in doctors]}},
+        {"doctor_id": None, "doctor": {"$in": [d['name'] for d in doctors]}},
+    ]}
+
+
+async def render_doctor_names(docs: list):
+    """Fill `doctor` from doctor_id so renamed doctors show their current name"""
+    directory = await get_doctor_directory()
+    for doc in docs:
+        if doc.get('doctor_id') in directory:
+            doc['doctor'] = directory[doc['doctor_id']]
+    return docs
+
+
+async def migrate_doctor_ids():
+    """One-off backfill of doctor_id on patients, follow-ups and doctor_info by name"""
+    if await db.migrations.find_one({"_id": "doctor_ids"}):
+        return
+    for doctor_id, name in (await load_doctor_directory()).items():
+        for collection, field in (("patients", "doctor"), ("followups", "doctor"), ("doctor_info", "doctor_name")):
+            await db[collection].update_many(
+                {field: name, "doctor_id": {"$exists": False}}, {"$set": {"doctor_id": doctor_id}}
+            )
+    await db.migrations.insert_one({"_id": "doctor_ids", "completed_at": datetime.now(timezone.utc).isoformat()})
+
+
+async def dedupe_open_followups():
+    """One-off cleanup before the open follow-up unique index is built.
+
+    Keeps each patient's earliest open follow-up, deletes the other open ones
+    and sets the `open` flag the partial unique index is defined on.
+    """
+    if await db.migrations.find_one({"_id": "open_followups"}):
+        return
+    duplicates = db.followups.aggregate([
+        {"$match": {"followup_status": {"$ne": "tamamlandı"}}},
+        {"$sort": {"followup_date": 1, "created_at": 1}},
+        {"$group": {"_id": "$patient_id", "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    removed = 0
+    async for group in duplicates:
+        result = await db.followups.delete_many({"id": {"$in": group['ids'][1:]}})
+        removed += result.deleted_count
+    await db.followups.update_many({"followup_status": {"$ne": "tamamlandı"}}, {"$set": {"open": True}})
+    await db.followups.update_many({"followup_status": "tamamlandı"}, {"$unset": {"open": ""}})
+    logger.info(f"Yinelenen {removed} açık takip silindi")
+    await db.migrations.insert_one({"_id": "open_followups", "completed_at": datetime.now(timezone.utc).isoformat()})
+
+
+async def upsert_open_followup(doc: dict) -> dict:
+    """Insert a follow-up unless the patient already has an open one.
+
+    Returns the stored open follow-up (the new one or the existing one) in a
+    single round trip; the partial unique index makes concurrent callers
+    converge on the same document.
+    """
+    if doc['followup_status'] == "tamamlandı":
+        await db.followups.insert_one({**doc})
+        return doc
+    for _ in range(2):
+        try:
+            return await db.followups.find_one_and_update(
+                {"patient_id": doc['patient_id'], "open": True},
+                {"$setOnInsert": {**doc, "open": True}},
+                upsert=True,
+                projection={"_id": 0, "open": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Lost the insert race; the next attempt matches the winner
+            continue
+    raise HTTPException(status_code=409, detail="Takip oluşturulamadı, lütfen tekrar deneyin")
+
+
+# Registries of family/profession groups, maintained on every patient write so
+# picklists and per-group totals never scan the patients collection
+GROUP_REGISTRIES = {"family_group": "family_groups", "profession_group": "profession_groups"}
+
+
+async def refresh_group_bounds(field: str, group: str):
+    """Recompute a group's first/last seen dates through the (group, visit_date) index"""
+    projection = {"_id": 0, "visit_date": 1}
+    first = await db.patients.find_one({field: group}, projection, sort=[("visit_date", 1)])
+    last = await db.patients.find_one({field: group}, projection, sort=[("visit_date", -1)])
+    if first and last:
+        await db[GROUP_REGISTRIES[field]].update_one(
+            {"_id": group}, {"$set": {"first_seen": first['visit_date'], "last_seen": last['visit_date']}}
+        )
+
+
+async def record_group_membership(new: dict, old: Optional[dict] = None):
+    """Apply a patient write to the group registries and the cached picklists.
+
+    `old` is the patient before the write (None for inserts), `new` the patient
+    after it ({} for deletes).
+    """
+    old = old or {}
+    old_accepted, new_accepted = int(bool(old.get('accepted'))), int(bool(new.get('accepted')))
+    for field, collection in GROUP_REGISTRIES.items():
+        registry = db[collection]
+        old_group, new_group = old.get(field) or "", new.get(field) or ""
+        if old_group == new_group:
+            if not new_group:
+                continue
+            if old_accepted != new_accepted:
+                await registry.update_one({"_id": new_group}, {"$inc": {"accepted_count": new_accepted - old_accepted}})
+            if old.get('visit_date') != new.get('visit_date'):
+                await refresh_group_bounds(field, new_group)
+            continue
+        if old_group:
+            await registry.update_one({"_id": old_group}, {"$inc": {"member_count": -1, "accepted_count": -old_accepted}})
+            emptied = await registry.delete_one({"_id": old_group, "member_count": {"$lte": 0}})
+            if emptied.deleted_count:
+                reference_cache.invalidate(collection)
+            else:
+                await refresh_group_bounds(field, old_group)
+        if new_group:
+            await registry.update_one(
+                {"_id": new_group},
+                {"$inc": {"member_count": 1, "accepted_count": new_accepted},
+                 "$min": {"first_seen": new['visit_date']}, "$max": {"last_seen": new['visit_date']}},
+                upsert=True
+            )
+            reference_cache.add_member(collection, new_group)
+
+
+async def rebuild_group_registries(*fields: str):
+    """Recreate group registries from the patients collection (all of them by default)"""
+    for field in fields or GROUP_REGISTRIES:
+        await db.patients.aggregate([
+            {"$match": {field: {"$nin": ["", None]}}},
+            {"$group": {
+                "_id": f"${field}",
+                "member_count": {"$sum": 1},
+                "accepted_count": {"$sum": {"$cond": [{"$eq": ["$accepted", True]}, 1, 0]}},
+                "first_seen": {"$min": "$visit_date"},
+                "last_seen": {"$max": "$visit_date"},
+            }},
+            {"$out": GROUP_REGISTRIES[field]},
+        ]).to_list(None)
+        reference_cache.invalidate(GROUP_REGISTRIES[field])
+
+
+async def ensure_group_registries():
+    """One-off backfill of registries that have never been built"""
+    missing = []
+    for field, collection in GROUP_REGISTRIES.items():
+        if await db[collection].find_one({}, {"_id": 1}) is None and \
+                await db.patients.find_one({field: {"$nin": ["", None]}}, {"_id": 1}) is not None:
+            missing.append(field)
+    if missing:
+        logger.info(f"Grup kayıtları oluşturuluyor: {missing}")
+        await rebuild_group_registries(*missing)
+
+
+async def invalidate_all_month_stats():
+    stats_cache.clear()
+    await db.monthly_stats_cache.update_many(
+        {}, {"$inc": {"generation": 1}, "$set": {"invalidated_at": time.time()}, "$unset": {"stats": ""}}
+    )
+
+
+async def invalidate_month_stats(*visit_dates):
+    """Drop cached statistics covering the given YYYY-MM-DD dates"""
+    visit_dates = [d for d in visit_dates if d]
+    months = sorted({d[:7] for d in visit_dates})
+    stats_cache.invalidate(*months)
+    for month in months:
+        # Bumping the generation also rejects results computed before this write
+        await db.monthly_stats_cache.update_one(
+            {"_id": month},
+            {"$inc": {"generation": 1}, "$set": {"invalidated_at": time.time()}, "$unset": {"stats": ""}},
+            upsert=True
+        )
+    stale_cubes = []
+    for key in cube_cache.entries:
+        _, date_from, date_to = key.split("|")
+        if any((not date_from or d >= date_from) and (not date_to or d <= date_to) for d in visit_dates):
+            stale_cubes.append(key)
+    cube_cache.invalidate(*stale_cubes)
+
+
+REFERENCE_LOADERS = {
+    "active_doctors": load_active_doctors,
+    "doctor_directory": load_doctor_directory,
+    "family_groups": load_family_groups,
+    "profession_groups": load_profession_groups,
+    "message_templates": load_message_templates,
+}
+
+
+async def warm_reference_cache():
+    for key, loader in REFERENCE_LOADERS.items():
+        await reference_cache.get(key, loader)
+
+
+# Cache snapshot: restores computed caches across restarts and redeploys
+CACHE_SNAPSHOT_PATH = Path(os.environ.get('CACHE_SNAPSHOT_PATH', ROOT_DIR / 'cache_snapshot.json.gz'))
+CACHE_SNAPSHOT_INTERVAL_S = float(os.environ.get('CACHE_SNAPSHOT_INTERVAL_S', 300))
+CACHE_SNAPSHOT_MAX_AGE_S = float(os.environ.get('CACHE_SNAPSHOT_MAX_AGE_S', 7 * 86400))
+CACHE_SNAPSHOT_FORMAT = 2
+# Bump when stored stats were computed wrongly, so cached months are recomputed
+STATS_FORMAT = 3
+SNAPSHOT_CACHES = {"reference": reference_cache}
+
+
+@lru_cache(maxsize=1)
+def cache_snapshot_schema():
+    """Fingerprint of the cached shapes; caches written by other code are ignored"""
+    schema = {"reference": sorted(REFERENCE_LOADERS), "stats": MonthlyStats.model_json_schema(),
+              "stats_format": STATS_FORMAT}
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_cache_snapshot():
+    return {
+        "format": CACHE_SNAPSHOT_FORMAT,
+        "schema": cache_snapshot_schema(),
+        "db": os.environ['DB_NAME'],
+        "written_at": time.time(),
+        "caches": {name: cache.dump() for name, cache in SNAPSHOT_CACHES.items()},
+    }
+
+
+def write_cache_snapshot(snapshot: dict):
+    tmp_path = CACHE_SNAPSHOT_PATH.with_name(CACHE_SNAPSHOT_PATH.name + '.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'), default=str)
+    os.replace(tmp_path, CACHE_SNAPSHOT_PATH)
+
+
+def load_cache_snapshot():
+    """Restore cache entries from the snapshot file; returns the number restored"""
+    if not CACHE_SNAPSHOT_PATH.exists():
+        return 0
+    try:
+        with gzip.open(CACHE_SNAPSHOT_PATH, 'rt', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except Exception as e:
+        logger.warning(f"Önbellek anlık görüntüsü okunamadı: {e}")
+        return 0
+    if (snapshot.get("format") != CACHE_SNAPSHOT_FORMAT
+            or snapshot.get("schema") != cache_snapshot_schema()
+            or snapshot.get("db") != os.environ['DB_NAME']):
+        logger.info("Önbellek anlık görüntüsü farklı bir sürüme ait, yok sayıldı")
+        return 0
+    restored = 0
+    for name, cache in SNAPSHOT_CACHES.items():
+        entries = snapshot["caches"].get(name, {})
+        cache.load(entries, CACHE_SNAPSHOT_MAX_AGE_S)
+        restored += len(entries)
+    return restored
+
+
+async def save_cache_snapshot():
+    snapshot = build_cache_snapshot()
+    if any(snapshot["caches"].values()):
+        await asyncio.to_thread(write_cache_snapshot, snapshot)
+
+
+async def snapshot_caches_periodically():
+    while True:
+        await asyncio.sleep(CACHE_SNAPSHOT_INTERVAL_S)
+        try:
+            await save_cache_snapshot()
+        except Exception as e:
+            logger.warning(f"Önbellek anlık görüntüsü yazılamadı: {e}")
+
+
+async def warm_up():
+    """Seed data, create indexes and fill caches once the server is accepting requests"""
+    for phase, step in [
+        ("initialize_doctors", initialize_doctors),
+        ("migrate_doctor_ids", migrate_doctor_ids),
+        ("dedupe_open_followups", dedupe_open_followups),
+        ("migrate_followup_cadence", migrate_followup_cadence),
+        ("ensure_indexes", ensure_indexes),
+        ("ensure_group_registries", ensure_group_registries),
+        ("warm_reference_cache", warm_reference_cache),
+    ]:
+        started = time.perf_counter()
+        try:
+            await step()
+        except Exception as e:
+            logger.warning(f"Başlangıç adımı {phase} başarısız: {e}")
+        startup_phases[phase] = round(time.perf_counter() - started, 4)
+    logger.info(f"Başlangıç ısınması tamamlandı: {startup_phases}")
+
+
+@app.on_event("startup")
+async def schedule_warm_up():
+    started = time.perf_counter()
+    restored = load_cache_snapshot()
+    startup_phases["load_cache_snapshot"] = round(time.perf_counter() - started, 4)
+    logger.info(f"Önbellek anlık görüntüsünden {restored} girdi yüklendi")
+    # Not awaited: uvicorn starts accepting connections as soon as startup
+    # handlers return, so the first request doesn't wait for Mongo round trips.
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+    app.state.snapshot_task = asyncio.create_task(snapshot_caches_periodically())
+    app.state.report_prune_task = asyncio.create_task(prune_report_archive_periodically())
+    app.state.report_queue = asyncio.Queue(maxsize=REPORT_QUEUE_SIZE)
+    app.state.report_workers = [
+        asyncio.create_task(run_report_worker(app.state.report_queue)) for _ in range(REPORT_WORKERS)
+    ]
+    app.state.side_effect_workers = [
+        asyncio.create_task(run_side_effect_worker()) for _ in range(SIDE_EFFECT_WORKERS)
+    ]
+    app.state.cadence_task = asyncio.create_task(run_followup_cadence_periodically())
+
+
+@app.on_event("shutdown")
+async def persist_caches():
+    app.state.snapshot_task.cancel()
+    app.state.report_prune_task.cancel()
+    app.state.cadence_task.cancel()
+    for worker in app.state.report_workers + app.state.side_effect_workers:
+        worker.cancel()
+    try:
+        await save_cache_snapshot()
+    except Exception as e:
+        logger.warning(f"Önbellek anlık görüntüsü yazılamadı: {e}")
 
 
 @api_router.get("/doctors")
 async def get_doctors(active_only: bool = True):
     """Get all doctors"""
-    query = {"active": True} if active_only else {}
-    doctors = await db.doctors.find(query, {"_id": 0}).sort("name", 1).to_list(100)
+    if active_only:
+        return {"doctors": await get_active_doctor_names()}
+    doctors = await db.doctors.find({}, {"_id": 0}).sort("name", 1).to_list(100)
     return {"doctors": [d['name'] for d in doctors]}
 
 
@@ -202,6 +1192,8 @@ async def create_doctor(name: str, phone_number: str = ""):
     doc = doctor.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.doctors.insert_one(doc)
+    reference_cache.invalidate("active_doctors", "doctor_directory")
+    await invalidate_all_month_stats()  # doctor_stats lists active doctors only
     
     return {"message": "Doktor eklendi", "doctor": doctor}
 
@@ -216,6 +1208,9 @@ async def update_doctor(doctor_id: str, name: str, phone_number: str = ""):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Doktor bulunamadı")
+    # Patients and follow-ups reference the doctor by id, so only the name map changes
+    reference_cache.invalidate("active_doctors", "doctor_directory")
+    await invalidate_all_month_stats()
     
     return {"message": "Doktor güncellendi"}
 
@@ -230,6 +1225,8 @@ async def delete_doctor(doctor_id: str):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Doktor bulunamadı")
+    reference_cache.invalidate("active_doctors")
+    await invalidate_all_month_stats()
     
     return {"message": "Doktor silindi"}
 
@@ -251,6 +1248,8 @@ async def activate_doctor(doctor_id: str):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Doktor bulunamadı")
+    reference_cache.invalidate("active_doctors")
+    await invalidate_all_month_stats()
     
     return {"message": "Doktor aktif hale getirildi"}
 
@@ -262,6 +1261,37 @@ async def get_all_doctors_with_details():
     return {"doctors": doctors}
 
 
+@api_router.get("/metrics")
+async def get_metrics():
+    """Process-level metrics: startup phases, Mongo client configuration and pool usage"""
+    return {
+        "startup_phases": startup_phases,
+        "caches": {
+            "reference": {**reference_cache.stats, "entries": len(reference_cache.entries)},
+            "stats": {**stats_cache.stats, "entries": len(stats_cache.entries)},
+            "cube": {**cube_cache.stats, "entries": len(cube_cache.entries)},
+            "counts": {**counts_cache.stats, "entries": len(counts_cache.entries)},
+        },
+        "coalescing": coalesce.stats,
+        "concurrency": {**concurrency.stats, "priority_active": concurrency.priority_active},
+        "reports": {"workers": REPORT_WORKERS, "queued": app.state.report_queue.qsize()},
+        "side_effects": {"workers": SIDE_EFFECT_WORKERS},
+        "mongo": {
+            "primary": {
+                "options": client_options,
+                "read_preference": db.read_preference.document,
+                "pool": client_pool_metrics.snapshot(),
+            },
+            "analytics": {
+                "separate_client": analytics_client is not client,
+                "options": analytics_client_options,
+                "read_preference": analytics_db.read_preference.document,
+                "pool": analytics_pool_metrics.snapshot(),
+            },
+        }
+    }
+
+
 @api_router.get("/visit-types")
 async def get_visit_types():
     return {"visit_types": VISIT_TYPES}
@@ -272,7 +1302,35 @@ async def get_patient_status_options():
     return {"status_options": PATIENT_STATUS}
 
 
+async def load_counts(today: str):
+    # Every filter is a prefix of an index and the counts read no fields, so
+    # each runs as an index-only scan without fetching documents
+    overdue, pending_messages, todays_visits, thinking = await asyncio.gather(
+        db.followups.count_documents(
+            {"followup_status": {"$in": ["beklemede", "gecikmiş"]}, "followup_date": {"$lt": today}}
+        ),
+        db.whatsapp_messages.count_documents({"status": "onay_bekliyor"}),
+        db.patients.count_documents({"visit_date": today}),
+        db.patients.count_documents({"status": "düşünüyor"}),
+    )
+    return {
+        "overdue_followups": overdue,
+        "pending_messages": pending_messages,
+        "todays_visits": todays_visits,
+        "thinking_patients": thinking,
+    }
+
+
+@api_router.get("/counts")
+@coalesce("counts")
+async def get_counts():
+    """Badge counts for the navigation tabs, cached for COUNTS_CACHE_TTL_S"""
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return {"date": today, **await counts_cache.get(today, lambda: load_counts(today))}
+
+
 @api_router.get("/patients/overdue")
+@coalesce("overdue")
 async def get_overdue_patients():
     """Get all overdue patients (gecikmiş hastalar)"""
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -283,8 +1341,9 @@ async def get_overdue_patients():
             "followup_status": {"$in": ["beklemede", "gecikmiş"]},
             "followup_date": {"$lt": today}
         },
-        {"_id": 0}
+        {"_id": 0, "open": 0}
     ).to_list(1000)
+    await render_doctor_names(followups)
     
     # Update status to "gecikmiş" automatically
     for followup in followups:
@@ -305,8 +1364,9 @@ async def get_overdue_patients():
 @api_router.post("/doctor-info")
 async def save_doctor_info(doctor_info: DoctorInfo):
     doc = doctor_info.model_dump()
+    doc['doctor_id'] = await resolve_doctor_id(doctor_info.doctor_name)
     await db.doctor_info.update_one(
-        {"doctor_name": doctor_info.doctor_name},
+        {"doctor_id": doc['doctor_id']} if doc['doctor_id'] else {"doctor_name": doctor_info.doctor_name},
         {"$set": doc},
         upsert=True
     )
@@ -316,11 +1376,438 @@ async def save_doctor_info(doctor_info: DoctorInfo):
 @api_router.get("/doctor-info")
 async def get_doctor_info():
     doctors_info = await db.doctor_info.find({}, {"_id": 0}).to_list(100)
+    directory = await get_doctor_directory()
+    for info in doctors_info:
+        info['doctor_name'] = directory.get(info.get('doctor_id'), info['doctor_name'])
     return doctors_info
 
 
+# Follow-up cadence: thinking patients get a follow-up (and a reminder draft)
+# FOLLOWUP_CADENCE_DAYS[i] days after their visit, one stage at a time. The
+# patient doc tracks the next stage (followup_stage, next_followup_date); a
+# scheduled job materializes due stages in batches. A stage waits while the
+# previous follow-up is still open, and the cadence ends when the patient
+# leaves "düşünüyor".
+FOLLOWUP_CADENCE_DAYS = [int(d) for d in os.environ.get('FOLLOWUP_CADENCE_DAYS', '7,14,30').split(',') if d.strip()]
+# Stages due within this many days are created ahead of time
+CADENCE_LOOKAHEAD_DAYS = int(os.environ.get('CADENCE_LOOKAHEAD_DAYS', 3))
+CADENCE_INTERVAL_S = float(os.environ.get('CADENCE_INTERVAL_S', 3600))
+CADENCE_BATCH_SIZE = int(os.environ.get('CADENCE_BATCH_SIZE', 500))
+CADENCE_LOCK_S = float(os.environ.get('CADENCE_LOCK_S', 300))
+
+cadence_wakeup = asyncio.Event()
+
+
+def cadence_date(visit_date: str, stage: int):
+    """Date of the follow-up at 0-based `stage`, or None past the last stage"""
+    if stage >= len(FOLLOWUP_CADENCE_DAYS):
+        return None
+    return (datetime.fromisoformat(visit_date) + timedelta(days=FOLLOWUP_CADENCE_DAYS[stage])).strftime("%Y-%m-%d")
+
+
+def cadence_next_stage(visit_date: str, stage: int, today: str):
+    """First stage from `stage` on that is not already past `today`"""
+    while True:
+        due_date = cadence_date(visit_date, stage)
+        if due_date is None or due_date >= today:
+            return stage
+        stage += 1
+
+
+def cadence_state(visit_date: str, stage: int):
+    """Patient fields for a cadence with `stage` follow-ups created so far"""
+    next_date = cadence_date(visit_date, stage)
+    return {"followup_stage": stage, **({"next_followup_date": next_date} if next_date else {})}
+
+
+def cadence_update(visit_date: str, stage: int, update: dict = None):
+    """Mongo update (merged into `update`) setting the cadence state"""
+    update = {**(update or {})}
+    state = cadence_state(visit_date, stage)
+    update["$set"] = {**update.get("$set", {}), **state}
+    if "next_followup_date" not in state:
+        update["$unset"] = {**update.get("$unset", {}), "next_followup_date": ""}
+    return update
+
+
+async def materialize_cadence_batch(patients: list, today: str, horizon: str):
+    """Create the due follow-ups and reminder drafts for a batch of patients"""
+    open_followups = await db.followups.find(
+        {"patient_id": {"$in": [p['id'] for p in patients]}, "open": True},
+        {"_id": 0, "patient_id": 1}
+    ).to_list(None)
+    waiting = {f['patient_id'] for f in open_followups}
+    
+    # Stages that went past while the patient waited are skipped, not moved to today
+    due, rescheduled = [], []
+    for p in patients:
+        if p['id'] in waiting:
+            continue
+        stage = cadence_next_stage(p['visit_date'], p.get('followup_stage', 0), today)
+        due_date = cadence_date(p['visit_date'], stage)
+        if due_date is not None and due_date <= horizon:
+            due.append({**p, 'followup_stage': stage, 'next_followup_date': due_date})
+        else:
+            rescheduled.append(UpdateOne({"id": p['id']}, cadence_update(p['visit_date'], stage)))
+    if rescheduled:
+        await db.patients.bulk_write(rescheduled, ordered=False)
+    if not due:
+        return 0
+    await render_doctor_names(due)
+    
+    followup_docs = []
+    for p in due:
+        stage = p.get('followup_stage', 0)
+        followup = FollowUp(
+            patient_id=p['id'],
+            patient_name=p['patient_name'],
+            phone_number=p.get('phone_number') or "",
+            doctor=p['doctor'],
+            doctor_id=p.get('doctor_id'),
+            followup_date=p['next_followup_date'],
+            patient_status="düşünüyor",
+            followup_status="beklemede",
+            stage=stage + 1,
+        )
+        doc = followup.model_dump()
+        doc['created_at'] = doc['created_at'].isoformat()
+        doc['open'] = True
+        followup_docs.append(doc)
+    
+    # The open follow-up index rejects a patient another process just served
+    failed = set()
+    try:
+        await db.followups.insert_many(followup_docs, ordered=False)
+    except BulkWriteError as e:
+        failed = {error['index'] for error in e.details.get('writeErrors', [])}
+    created = [(p, doc) for i, (p, doc) in enumerate(zip(due, followup_docs)) if i not in failed]
+    if not created:
+        return 0
+    
+    reminders = [(p, doc['followup_date']) for p, doc in created if p.get('phone_number')]
+    if reminders:
+        templates = await get_message_templates("followup_reminder")
+        texts = message_templates.render_batch(templates, "text", [reminder_fields(p, due_date) for p, due_date in reminders])
+        msg_docs = []
+        for (p, due_date), text in zip(reminders, texts):
+            msg_doc = build_reminder_message(p, due_date, message_text=text).model_dump()
+            msg_doc['created_at'] = msg_doc['created_at'].isoformat()
+            msg_docs.append(msg_doc)
+        await db.whatsapp_messages.insert_many(msg_docs)
+    
+    await db.patients.bulk_write([
+        UpdateOne({"id": p['id']}, cadence_update(p['visit_date'], p.get('followup_stage', 0) + 1))
+        for p, _ in created
+    ], ordered=False)
+    return len(created)
+
+
+async def run_followup_cadence():
+    """Materialize every cadence stage due within CADENCE_LOOKAHEAD_DAYS; returns the count"""
+    now = datetime.now(timezone.utc)
+    try:
+        # One process at a time; the lock expires if its holder dies
+        await db.job_locks.update_one(
+            {"_id": "followup_cadence", "locked_until": {"$lt": now}},
+            {"$set": {"locked_until": now + timedelta(seconds=CADENCE_LOCK_S)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return 0
+    
+    try:
+        today = now.strftime("%Y-%m-%d")
+        horizon = (now + timedelta(days=CADENCE_LOOKAHEAD_DAYS)).strftime("%Y-%m-%d")
+        cursor = db.patients.find(
+            {"next_followup_date": {"$lte": horizon}, "status": "düşünüyor"},
+            {"_id": 0, "id": 1, "patient_name": 1, "phone_number": 1, "doctor": 1, "doctor_id": 1,
+             "visit_date": 1, "followup_stage": 1, "next_followup_date": 1}
+        ).sort("next_followup_date", 1).batch_size(CADENCE_BATCH_SIZE)
+        created, batch = 0, []
+        async for patient in cursor:
+            batch.append(patient)
+            if len(batch) >= CADENCE_BATCH_SIZE:
+                created += await materialize_cadence_batch(batch, today, horizon)
+                batch = []
+        if batch:
+            created += await materialize_cadence_batch(batch, today, horizon)
+    finally:
+        await db.job_locks.update_one({"_id": "followup_cadence"}, {"$set": {"locked_until": now}})
+    if created:
+        counts_cache.clear()
+        logger.info(f"Takip programından {created} takip oluşturuldu")
+    return created
+
+
+async def run_followup_cadence_periodically():
+    await app.state.warm_up_task
+    while True:
+        try:
+            await run_followup_cadence()
+        except Exception as e:
+            logger.warning(f"Takip programı çalıştırılamadı: {e}")
+        cadence_wakeup.clear()
+        try:
+            await asyncio.wait_for(cadence_wakeup.wait(), CADENCE_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def migrate_followup_cadence():
+    """One-off: put thinking patients from before the cadence on their next future stage.
+
+    They already had their first follow-up; stages already in the past are
+    skipped, and patients with the whole schedule behind them get none.
+    """
+    if await db.migrations.find_one({"_id": "followup_cadence"}):
+        return
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    cursor = db.patients.find(
+        {"status": "düşünüyor", "is_revisit": {"$ne": True}, "followup_stage": {"$exists": False}},
+        {"_id": 0, "id": 1, "visit_date": 1}
+    )
+    batch = []
+    async for patient in cursor:
+        stage = cadence_next_stage(patient['visit_date'], 1, today)
+        batch.append(UpdateOne({"id": patient['id']}, cadence_update(patient['visit_date'], stage)))
+        if len(batch) >= 1000:
+            await db.patients.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.patients.bulk_write(batch, ordered=False)
+    await db.migrations.insert_one({"_id": "followup_cadence", "completed_at": datetime.now(timezone.utc).isoformat()})
+
+
+@api_router.post("/followups/cadence/run")
+async def trigger_followup_cadence():
+    """Run the follow-up cadence job now"""
+    created = await run_followup_cadence()
+    return {"message": f"{created} takip oluşturuldu", "created": created}
+
+
+# Side effects of patient writes (auto follow-up, reminder message) are
+# persisted as tasks in side_effects and applied by in-process workers, so the
+# request returns after the patient insert. Tasks survive restarts and are
+# retried with exponential backoff; handlers must be safe to re-run.
+SIDE_EFFECT_WORKERS = int(os.environ.get('SIDE_EFFECT_WORKERS', 1))
+SIDE_EFFECT_MAX_ATTEMPTS = int(os.environ.get('SIDE_EFFECT_MAX_ATTEMPTS', 5))
+SIDE_EFFECT_RETRY_S = float(os.environ.get('SIDE_EFFECT_RETRY_S', 2))
+# Idle workers still poll this often for retries and tasks left by other processes
+SIDE_EFFECT_POLL_S = float(os.environ.get('SIDE_EFFECT_POLL_S', 5))
+# A task claimed this long ago and not finished is assumed lost and re-run
+SIDE_EFFECT_LEASE_S = float(os.environ.get('SIDE_EFFECT_LEASE_S', 60))
+SIDE_EFFECT_TTL_S = float(os.environ.get('SIDE_EFFECT_TTL_S', 7 * 86400))
+
+side_effect_wakeup = asyncio.Event()
+
+
+async def enqueue_side_effect(kind: str, patient_id: str, payload: dict):
+    now = datetime.now(timezone.utc)
+    await db.side_effects.insert_one({
+        "_id": str(uuid.uuid4()),
+        "kind": kind,
+        "patient_id": patient_id,
+        "payload": payload,
+        "status": "beklemede",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+
+
+async def upsert_by_id(collection, doc: dict):
+    """Insert doc unless a document with its id already exists (retry-safe insert)"""
+    await collection.update_one({"id": doc['id']}, {"$setOnInsert": doc}, upsert=True)
+
+
+async def apply_auto_followup(payload: dict):
+    # The patient may have been deleted or moved out of "düşünüyor" since the task was queued
+    patient = await db.patients.find_one({"id": payload['followup']['patient_id']}, {"_id": 0, "status": 1})
+    if not patient or patient.get('status') != "düşünüyor":
+        return
+    await upsert_open_followup(payload['followup'])
+    if payload.get('message'):
+        await upsert_by_id(db.whatsapp_messages, payload['message'])
+
+
+async def apply_patient_created(payload: dict):
+    """Registries, stats, first follow-up and reminder for a newly created patient"""
+    patient = await db.patients.find_one({"id": payload['patient_id']}, {"_id": 0, "outbox": 0})
+    if not patient:
+        return
+    await invalidate_month_stats(patient['visit_date'])
+    
+    if patient.get('status') == "düşünüyor" and not patient.get('is_revisit'):
+        followup_date = cadence_date(patient['visit_date'], 0)
+        await render_doctor_names([patient])
+        followup = FollowUp(
+            id=payload['followup_id'],
+            patient_id=patient['id'],
+            patient_name=patient['patient_name'],
+            phone_number=patient.get('phone_number') or "",
+            doctor=patient['doctor'],
+            doctor_id=patient.get('doctor_id'),
+            followup_date=followup_date,
+            patient_status=patient['status'],
+            followup_status="beklemede"
+        ).model_dump()
+        followup['created_at'] = followup['created_at'].isoformat()
+        await upsert_open_followup(followup)
+        if patient.get('phone_number'):
+            templates = await get_message_templates("followup_reminder")
+            message = build_reminder_message(patient, followup_date, templates["text"]).model_dump()
+            message.update(id=payload['message_id'], created_at=message['created_at'].isoformat())
+            await upsert_by_id(db.whatsapp_messages, message)
+    
+    # Last, and only once: the registries are counters, not safe to re-apply
+    claimed = await db.patients.find_one_and_update(
+        {"id": patient['id'], "groups_pending": True}, {"$unset": {"groups_pending": ""}},
+        projection={"_id": 0, "outbox": 0}
+    )
+    if claimed:
+        try:
+            await record_group_membership(claimed)
+        except Exception:
+            await db.patients.update_one({"id": patient['id']}, {"$set": {"groups_pending": True}})
+            raise
+
+
+SIDE_EFFECT_HANDLERS = {
+    "auto_followup": apply_auto_followup,
+    "patient_created": apply_patient_created,
+}
+
+
+async def relay_side_effect_outbox():
+    """Move tasks queued on patient documents into side_effects; returns the count"""
+    relayed = 0
+    async for patient in db.patients.find({"outbox._id": {"$exists": True}}, {"_id": 0, "id": 1, "outbox": 1}):
+        for entry in patient['outbox']:
+            try:
+                await db.side_effects.insert_one({
+                    "_id": entry['_id'],
+                    "kind": entry['kind'],
+                    "patient_id": patient['id'],
+                    "payload": entry['payload'],
+                    "status": "beklemede",
+                    "attempts": 0,
+                    "next_attempt_at": entry['created_at'],
+                    "created_at": entry['created_at'],
+                    "updated_at": datetime.now(timezone.utc),
+                })
+            except DuplicateKeyError:
+                pass  # relayed before, by this or another worker
+        await db.patients.update_one(
+            {"id": patient['id']}, {"$pull": {"outbox": {"_id": {"$in": [e['_id'] for e in patient['outbox']]}}}}
+        )
+        relayed += len(patient['outbox'])
+    return relayed
+
+
+async def claim_side_effect():
+    now = datetime.now(timezone.utc)
+    return await db.side_effects.find_one_and_update(
+        {"$or": [
+            {"status": "beklemede", "next_attempt_at": {"$lte": now}},
+            {"status": "işleniyor", "updated_at": {"$lt": now - timedelta(seconds=SIDE_EFFECT_LEASE_S)}},
+        ]},
+        {"$set": {"status": "işleniyor", "updated_at": now}, "$inc": {"attempts": 1}},
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_side_effect(task: dict):
+    try:
+        await SIDE_EFFECT_HANDLERS[task['kind']](task['payload'])
+    except Exception as e:
+        now = datetime.now(timezone.utc)
+        if task['attempts'] >= SIDE_EFFECT_MAX_ATTEMPTS:
+            logger.error(f"Yan etki {task['_id']} ({task['kind']}) {task['attempts']} denemede başarısız: {e}")
+            update = {"status": "başarısız", "expires_at": now + timedelta(seconds=SIDE_EFFECT_TTL_S)}
+        else:
+            logger.warning(f"Yan etki {task['_id']} ({task['kind']}) başarısız, tekrar denenecek: {e}")
+            delay = SIDE_EFFECT_RETRY_S * 2 ** (task['attempts'] - 1)
+            update = {"status": "beklemede", "next_attempt_at": now + timedelta(seconds=delay)}
+            asyncio.get_running_loop().call_later(delay, side_effect_wakeup.set)
+        await db.side_effects.update_one(
+            {"_id": task['_id']}, {"$set": {**update, "error": str(e), "updated_at": now}}
+        )
+        return
+    
+    now = datetime.now(timezone.utc)
+    await db.side_effects.update_one(
+        {"_id": task['_id']},
+        {"$set": {"status": "tamamlandı", "updated_at": now, "completed_at": now,
+                  "expires_at": now + timedelta(seconds=SIDE_EFFECT_TTL_S)},
+         "$unset": {"error": ""}}
+    )
+
+
+async def run_side_effect_worker():
+    while True:
+        try:
+            task = await claim_side_effect()
+        except Exception as e:
+            logger.warning(f"Yan etki kuyruğu okunamadı: {e}")
+            task = None
+        if task:
+            await run_side_effect(task)
+            continue
+        try:
+            if await relay_side_effect_outbox():
+                continue
+        except Exception as e:
+            logger.warning(f"Yan etki kutusu aktarılamadı: {e}")
+        side_effect_wakeup.clear()
+        try:
+            await asyncio.wait_for(side_effect_wakeup.wait(), SIDE_EFFECT_POLL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+@api_router.get("/patients/{patient_id}/side-effects")
+async def get_patient_side_effects(patient_id: str):
+    """Background tasks queued by writes to this patient; `done` once none is pending"""
+    tasks = await db.side_effects.find(
+        {"patient_id": patient_id},
+        {"payload": 0}
+    ).sort("created_at", 1).to_list(100)
+    # Tasks still in the patient's outbox haven't reached side_effects yet
+    patient = await db.patients.find_one({"id": patient_id}, {"_id": 0, "outbox": 1})
+    relayed = {t['_id'] for t in tasks}
+    tasks = [
+        {**entry, "status": "beklemede", "attempts": 0}
+        for entry in (patient or {}).get('outbox', []) if entry['_id'] not in relayed
+    ] + tasks
+    return {
+        "patient_id": patient_id,
+        "done": all(t['status'] in ("tamamlandı", "başarısız") for t in tasks),
+        "failed": any(t['status'] == "başarısız" for t in tasks),
+        "tasks": [
+            {
+                "id": t['_id'],
+                "kind": t['kind'],
+                "status": t['status'],
+                "attempts": t['attempts'],
+                "error": t.get('error'),
+                "created_at": t['created_at'].isoformat(),
+                "completed_at": t['completed_at'].isoformat() if t.get('completed_at') else None,
+            }
+            for t in tasks
+        ],
+    }
+
+
+# Internal bookkeeping fields left out of patient documents returned to clients
+PATIENT_PROJECTION = {"_id": 0, "outbox": 0, "groups_pending": 0}
+
+
 # Patient Management
 @api_router.post("/patients", response_model=Patient)
+@idempotent("create_patient")
+@concurrency.priority
 async def create_patient(input: PatientCreate):
     # Validate visit_type and status
     if input.visit_type not in VISIT_TYPES:
@@ -332,55 +1819,35 @@ async def create_patient(input: PatientCreate):
     patient_dict = input.model_dump()
     # Set accepted based on status
     patient_dict['accepted'] = (input.status == "kabul etti")
+    patient_dict['doctor_id'] = await resolve_doctor_id(input.doctor)
     patient_obj = Patient(**patient_dict)
     
     # Convert to dict and serialize datetime to ISO string for MongoDB
     doc = patient_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
-    _ = await db.patients.insert_one(doc)
-    
-    # Auto-create follow-up if status is "düşünüyor"
-    if input.status == "düşünüyor" and not input.is_revisit:
-        visit_date = datetime.fromisoformat(input.visit_date)
-        followup_date = (visit_date + timedelta(days=7)).strftime("%Y-%m-%d")
-        
-        followup = FollowUp(
-            patient_id=patient_obj.id,
-            patient_name=input.patient_name,
-            phone_number=input.phone_number or "",
-            doctor=input.doctor,
-            followup_date=followup_date,
-            patient_status=input.status,
-            followup_status="beklemede"
-        )
-        
-        followup_doc = followup.model_dump()
-        followup_doc['created_at'] = followup_doc['created_at'].isoformat()
-        await db.followups.insert_one(followup_doc)
-        
-        # Create WhatsApp reminder message (pending approval)
-        if input.phone_number:
-            message_text = f"Merhaba {input.patient_name}, geçen hafta görüştüğümüz tedavi planı hakkında nazik bir hatırlatma yapmak istedik. Karar verebildiniz mi? İsterseniz tekrar bilgi verebiliriz."
-            
-            whatsapp_msg = WhatsAppMessage(
-                message_type="followup_reminder",
-                recipient_name=input.patient_name,
-                recipient_phone=input.phone_number,
-                message_text=message_text,
-                scheduled_date=followup_date,
-                status="onay_bekliyor",
-                approved=False
-            )
-            
-            msg_doc = whatsapp_msg.model_dump()
-            msg_doc['created_at'] = msg_doc['created_at'].isoformat()
-            await db.whatsapp_messages.insert_one(msg_doc)
+    thinking = input.status == "düşünüyor" and not input.is_revisit
+    if thinking:
+        # Stage 1 is created by the patient_created task; the cadence job creates the later stages
+        doc.update(cadence_state(input.visit_date, 1))
+    
+    # Everything else a new patient needs (group registries, cached stats, the
+    # first follow-up and its reminder) is queued in the same write as the
+    # patient, through the outbox the side-effect worker relays
+    doc['outbox'] = [{"_id": str(uuid.uuid4()), "kind": "patient_created", "created_at": datetime.now(timezone.utc),
+                      "payload": {"patient_id": patient_obj.id, "followup_id": str(uuid.uuid4()),
+                                  "message_id": str(uuid.uuid4())}}]
+    doc['groups_pending'] = True
+    idempotent_write()
+    await db.patients.insert_one(doc)
+    await idempotent_response(patient_obj)
+    side_effect_wakeup.set()
     
     return patient_obj
 
 
 @api_router.put("/patients/{patient_id}")
+@concurrency.priority
 async def update_patient(patient_id: str, input: PatientCreate):
     """Update existing patient"""
     print(f"UPDATE PATIENT: ID={patient_id}, Status={input.status}, Name={input.patient_name}")
@@ -400,37 +1867,30 @@ async def update_patient(patient_id: str, input: PatientCreate):
     # Prepare update data
     update_data = input.model_dump()
     update_data['accepted'] = (input.status == "kabul etti")
+    update_data['doctor_id'] = await resolve_doctor_id(input.doctor)
+    
+    # Follow-up cadence: (re)start it when the patient becomes "düşünüyor",
+    # stop it when they leave that status. The cadence job creates the follow-ups.
+    update = {"$set": update_data}
+    if input.status == "düşünüyor" and not input.is_revisit:
+        if existing_patient.get('status') != "düşünüyor" or 'followup_stage' not in existing_patient:
+            update = cadence_update(input.visit_date, 0, update)
+    elif existing_patient.get('next_followup_date'):
+        update["$unset"] = {"next_followup_date": ""}
     
     # Update patient
-    result = await db.patients.update_one(
-        {"id": patient_id},
-        {"$set": update_data}
-    )
+    result = await db.patients.update_one({"id": patient_id}, update)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Hasta bulunamadı")
+    if not existing_patient.get('groups_pending'):
+        # Otherwise the patient_created task records the patient as it is then
+        await record_group_membership({**existing_patient, **update_data}, existing_patient)
+    await invalidate_month_stats(existing_patient.get('visit_date'), input.visit_date)
     
     # Handle follow-up logic
-    # If status changed to "düşünüyor", create follow-up if doesn't exist
-    if input.status == "düşünüyor" and not input.is_revisit:
-        existing_followup = await db.followups.find_one({"patient_id": patient_id})
-        if not existing_followup:
-            visit_date = datetime.fromisoformat(input.visit_date)
-            followup_date = (visit_date + timedelta(days=7)).strftime("%Y-%m-%d")
-            
-            followup = FollowUp(
-                patient_id=patient_id,
-                patient_name=input.patient_name,
-                phone_number=input.phone_number or "",
-                doctor=input.doctor,
-                followup_date=followup_date,
-                patient_status=input.status,
-                followup_status="beklemede"
-            )
-            
-            followup_doc = followup.model_dump()
-            followup_doc['created_at'] = followup_doc['created_at'].isoformat()
-            await db.followups.insert_one(followup_doc)
+    if update["$set"].get('next_followup_date'):
+        cadence_wakeup.set()
     
     # If status changed from "düşünüyor" to something else, remove follow-up
     if existing_patient.get('status') == 'düşünüyor' and input.status != 'düşünüyor':
@@ -452,6 +1912,9 @@ async def delete_patient(patient_id: str):
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Hasta bulunamadı")
+    if not patient.get('groups_pending'):
+        await record_group_membership({}, patient)
+    await invalidate_month_stats(patient.get('visit_date'))
     
     # Delete related follow-ups
     await db.followups.delete_many({"patient_id": patient_id})
@@ -484,7 +1947,7 @@ async def get_patients(
     
     # Filter by doctor
     if doctor:
-        query["doctor"] = doctor
+        query.update(await doctor_filter(doctor))
     
     # Filter by family group
     if family_group:
@@ -494,7 +1957,8 @@ async def get_patients(
     if profession_group:
         query["profession_group"] = profession_group
     
-    patients = await db.patients.find(query, {"_id": 0}).sort("visit_date", -1).to_list(1000)
+    patients = await db.patients.find(query, PATIENT_PROJECTION).sort("visit_date", -1).to_list(1000)
+    await render_doctor_names(patients)
     
     # Convert ISO string timestamps back to datetime objects and handle missing status field
     for patient in patients:
@@ -521,10 +1985,16 @@ async def get_patients(
 @api_router.get("/patients/daily")
 async def get_daily_patients(date: str):
     """Get all patients for a specific date"""
-    patients = await db.patients.find(
+    return await fetch_daily_patients(db, date)
+
+
+async def fetch_daily_patients(database, date: str):
+    """Day's patients read through the given database handle (primary or analytics)"""
+    patients = await database.patients.find(
         {"visit_date": date},
-        {"_id": 0}
+        PATIENT_PROJECTION
     ).sort("created_at", 1).to_list(1000)
+    await render_doctor_names(patients)
     
     # Convert ISO string timestamps back to datetime objects and handle missing status field
     for patient in patients:
@@ -548,16 +2018,52 @@ async def get_daily_patients(date: str):
     return {"date": date, "patients": patients}
 
 
-@api_router.get("/patients/accepted")
-async def get_accepted_patients(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    month: Optional[int] = None,
-    year: Optional[int] = None
+async def load_daily_picklists():
+    """Picklists the daily screen needs, from the reference cache"""
+    return {
+        "doctors": await get_active_doctor_names(),
+        "visit_types": VISIT_TYPES,
+        "family_groups": await reference_cache.get("family_groups", load_family_groups),
+        "profession_groups": await reference_cache.get("profession_groups", load_profession_groups),
+    }
+
+
+def reference_version(picklists: dict):
+    payload = json.dumps(picklists, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+@api_router.get("/daily-bootstrap")
+async def get_daily_bootstrap(response: Response, date: str, if_none_match: Optional[str] = Header(None)):
+    """Day's patients plus the picklists, versioned so clients can skip unchanged reference data.
+
+    The ETag covers only the picklists: when If-None-Match matches, `reference`
+    is null and the client keeps its copy; patients are always returned.
+    """
+    daily, picklists = await asyncio.gather(fetch_daily_patients(db, date), load_daily_picklists())
+    version = reference_version(picklists)
+    known = {tag.strip().removeprefix("W/").strip('"') for tag in (if_none_match or "").split(",")}
+    response.headers["ETag"] = f'"{version}"'
+    # The body depends on If-None-Match, so browsers must not revalidate it on their own
+    response.headers["Cache-Control"] = "no-store"
+    return {
+        **daily,
+        "reference_version": version,
+        "reference": None if version in known else picklists,
+    }
+
+
+async def fetch_status_bucket(
+    status: str,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    month: Optional[int],
+    year: Optional[int],
+    doctors: List[dict]
 ):
-    """Get all accepted patients"""
+    """Patients with the given status plus visit-type and per-doctor counts"""
     query = {
-        "status": "kabul etti",  # Only patients who accepted
+        "status": status,
         "visit_type": {"$in": ["implant", "kontrol", "muayene"]}  # Only count these three visit types
     }
     
@@ -577,18 +2083,12 @@ async def get_accepted_patients(
             date_filter["$lte"] = end_date
         query["visit_date"] = date_filter
     
-    patients = await db.patients.find(query, {"_id": 0}).sort("visit_date", -1).to_list(1000)
+    patients = await db.patients.find(query, PATIENT_PROJECTION).sort("visit_date", -1).to_list(1000)
+    await render_doctor_names(patients)
     
     for patient in patients:
         if isinstance(patient['created_at'], str):
             patient['created_at'] = datetime.fromisoformat(patient['created_at'])
-        
-        # Handle missing status field for backward compatibility
-        if 'status' not in patient:
-            if patient.get('accepted', False):
-                patient['status'] = 'kabul etti'
-            else:
-                patient['status'] = 'kabul etmedi'
     
     # Calculate statistics
     implant = sum(1 for p in patients if p['visit_type'] == 'implant')
@@ -597,14 +2097,12 @@ async def get_accepted_patients(
     total = implant + kontrol + muayene  # Total is sum of these three categories
     
     # Doctor stats
-    doctor_stats = {}
-    # Get active doctors dynamically
-    active_doctors = await db.doctors.find({"active": True}, {"_id": 0}).to_list(100)
-    doctor_names = [d['name'] for d in active_doctors]
-    
-    for doctor in doctor_names:
-        doc_patients = [p for p in patients if p['doctor'] == doctor]
-        doctor_stats[doctor] = len(doc_patients)
+    ids_by_name = {d['name']: d['id'] for d in doctors}
+    per_doctor = {}
+    for p in patients:
+        doctor_id = p.get('doctor_id') or ids_by_name.get(p.get('doctor'))
+        per_doctor[doctor_id] = per_doctor.get(doctor_id, 0) + 1
+    doctor_stats = {d['name']: per_doctor.get(d['id'], 0) for d in doctors}
     
     return {
         "total": total,
@@ -618,7 +2116,20 @@ async def get_accepted_patients(
     }
 
 
+@api_router.get("/patients/accepted")
+@coalesce("accepted")
+async def get_accepted_patients(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None
+):
+    """Get all accepted patients"""
+    return await fetch_status_bucket("kabul etti", start_date, end_date, month, year, await get_active_doctors())
+
+
 @api_router.get("/patients/not-accepted")
+@coalesce("not_accepted")
 async def get_not_accepted_patients(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -626,69 +2137,11 @@ async def get_not_accepted_patients(
     year: Optional[int] = None
 ):
     """Get all not accepted patients (kabul edilmedi) - excluding 'düşünüyor'"""
-    query = {
-        "status": "kabul etmedi",  # Only patients who explicitly rejected, not thinking
-        "visit_type": {"$in": ["implant", "kontrol", "muayene"]}  # Only count these three visit types
-    }
-    
-    # Date filtering
-    if month and year:
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
-        query["visit_date"] = {"$gte": start_date, "$lt": end_date}
-    elif start_date or end_date:
-        date_filter = {}
-        if start_date:
-            date_filter["$gte"] = start_date
-        if end_date:
-            date_filter["$lte"] = end_date
-        query["visit_date"] = date_filter
-    
-    patients = await db.patients.find(query, {"_id": 0}).sort("visit_date", -1).to_list(1000)
-    
-    for patient in patients:
-        if isinstance(patient['created_at'], str):
-            patient['created_at'] = datetime.fromisoformat(patient['created_at'])
-        
-        # Handle missing status field for backward compatibility
-        if 'status' not in patient:
-            if patient.get('accepted', False):
-                patient['status'] = 'kabul etti'
-            else:
-                patient['status'] = 'kabul etmedi'
-    
-    # Calculate statistics
-    implant = sum(1 for p in patients if p['visit_type'] == 'implant')
-    kontrol = sum(1 for p in patients if p['visit_type'] == 'kontrol')
-    muayene = sum(1 for p in patients if p['visit_type'] == 'muayene')
-    total = implant + kontrol + muayene  # Total is sum of these three categories
-    
-    # Doctor stats
-    doctor_stats = {}
-    # Get active doctors dynamically
-    active_doctors = await db.doctors.find({"active": True}, {"_id": 0}).to_list(100)
-    doctor_names = [d['name'] for d in active_doctors]
-    
-    for doctor in doctor_names:
-        doc_patients = [p for p in patients if p['doctor'] == doctor]
-        doctor_stats[doctor] = len(doc_patients)
-    
-    return {
-        "total": total,
-        "patients": patients,
-        "stats": {
-            "implant": implant,
-            "kontrol": kontrol,
-            "muayene": muayene,
-            "doctor_stats": doctor_stats
-        }
-    }
+    return await fetch_status_bucket("kabul etmedi", start_date, end_date, month, year, await get_active_doctors())
 
 
 @api_router.get("/patients/thinking")
+@coalesce("thinking")
 async def get_thinking_patients(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -696,63 +2149,93 @@ async def get_thinking_patients(
     year: Optional[int] = None
 ):
     """Get all thinking patients (düşünüyor)"""
-    query = {
-        "status": "düşünüyor",  # Only patients who are thinking
-        "visit_type": {"$in": ["implant", "kontrol", "muayene"]}  # Only count these three visit types
+    return await fetch_status_bucket("düşünüyor", start_date, end_date, month, year, await get_active_doctors())
+
+
+DASHBOARD_SECTIONS = ["accepted", "not_accepted", "thinking", "weekly_trend", "overdue"]
+
+
+def apply_field_mask(section: dict, fields: Optional[str]):
+    """Keep only the comma-separated top-level keys in fields (all if not given)"""
+    if not fields:
+        return section
+    keep = {f.strip() for f in fields.split(",")}
+    return {k: v for k, v in section.items() if k in keep}
+
+
+@api_router.get("/dashboard")
+@coalesce("dashboard")
+async def get_dashboard(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    sections: Optional[str] = None,
+    accepted_fields: Optional[str] = None,
+    not_accepted_fields: Optional[str] = None,
+    thinking_fields: Optional[str] = None,
+    weekly_trend_fields: Optional[str] = None,
+    overdue_fields: Optional[str] = None
+):
+    """Everything HomeModules.js needs on mount, computed concurrently in one request.
+
+    The weekly trend uses year/month, defaulting to the month of start_date (or
+    the current month). Each section takes an optional field mask, e.g.
+    accepted_fields=total,stats.
+    """
+    wanted = [s.strip() for s in sections.split(",")] if sections else DASHBOARD_SECTIONS
+    invalid = [s for s in wanted if s not in DASHBOARD_SECTIONS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Geçersiz bölüm: {', '.join(invalid)}")
+
+    if not (year and month):
+        reference = datetime.fromisoformat(start_date) if start_date else datetime.now(timezone.utc)
+        year, month = reference.year, reference.month
+
+    doctors = await get_active_doctors()
+    computations = {
+        "accepted": lambda: fetch_status_bucket("kabul etti", start_date, end_date, None, None, doctors),
+        "not_accepted": lambda: fetch_status_bucket("kabul etmedi", start_date, end_date, None, None, doctors),
+        "thinking": lambda: fetch_status_bucket("düşünüyor", start_date, end_date, None, None, doctors),
+        "weekly_trend": lambda: get_weekly_trend(year, month),
+        "overdue": get_overdue_patients,
     }
-    
-    # Date filtering
-    if month and year:
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
-        query["visit_date"] = {"$gte": start_date, "$lt": end_date}
-    elif start_date or end_date:
-        date_filter = {}
-        if start_date:
-            date_filter["$gte"] = start_date
-        if end_date:
-            date_filter["$lte"] = end_date
-        query["visit_date"] = date_filter
-    
-    # Get all patients with "düşünüyor" status
-    thinking_patients = await db.patients.find(query, {"_id": 0}).sort("visit_date", -1).to_list(1000)
-    
-    for patient in thinking_patients:
-        if isinstance(patient['created_at'], str):
-            patient['created_at'] = datetime.fromisoformat(patient['created_at'])
-    
-    # Calculate statistics
-    implant = sum(1 for p in thinking_patients if p['visit_type'] == 'implant')
-    kontrol = sum(1 for p in thinking_patients if p['visit_type'] == 'kontrol')
-    muayene = sum(1 for p in thinking_patients if p['visit_type'] == 'muayene')
-    total = implant + kontrol + muayene  # Total is sum of these three categories
-    
-    # Doctor stats
-    doctor_stats = {}
-    # Get active doctors dynamically
-    active_doctors = await db.doctors.find({"active": True}, {"_id": 0}).to_list(100)
-    doctor_names = [d['name'] for d in active_doctors]
-    
-    for doctor in doctor_names:
-        doc_patients = [p for p in thinking_patients if p['doctor'] == doctor]
-        doctor_stats[doctor] = len(doc_patients)
-    
-    return {
-        "total": total,
-        "patients": thinking_patients,
-        "stats": {
-            "implant": implant,
-            "kontrol": kontrol,
-            "muayene": muayene,
-            "doctor_stats": doctor_stats
-        }
+    masks = {
+        "accepted": accepted_fields,
+        "not_accepted": not_accepted_fields,
+        "thinking": thinking_fields,
+        "weekly_trend": weekly_trend_fields,
+        "overdue": overdue_fields,
     }
+    results = await asyncio.gather(*(computations[name]() for name in wanted))
+    return {name: apply_field_mask(result, masks[name]) for name, result in zip(wanted, results)}
+
+
+# Patients reminded within this many days are skipped by bulk reminders
+REMINDER_WINDOW_DAYS = int(os.environ.get('REMINDER_WINDOW_DAYS', 7))
+
+
+def reminder_fields(patient: dict, scheduled_date: str):
+    return {"patient_name": patient['patient_name'], "doctor": patient.get('doctor', ""), "date": scheduled_date}
+
+
+def build_reminder_message(patient: dict, scheduled_date: str, render=None, message_text: str = None) -> WhatsAppMessage:
+    """Reminder for a patient; pass the compiled "text" part or an already rendered text"""
+    if message_text is None:
+        message_text = render(reminder_fields(patient, scheduled_date))
+    return WhatsAppMessage(
+        message_type="followup_reminder",
+        recipient_name=patient['patient_name'],
+        recipient_phone=patient['phone_number'],
+        message_text=message_text,
+        scheduled_date=scheduled_date,
+        status="onay_bekliyor",
+        approved=False
+    )
 
 
 @api_router.post("/patients/{patient_id}/send-reminder")
+@idempotent("send_reminder")
 async def send_reminder_to_patient(patient_id: str):
     """Create WhatsApp reminder message for thinking patient"""
     patient = await db.patients.find_one({"id": patient_id}, {"_id": 0})
@@ -763,35 +2246,154 @@ async def send_reminder_to_patient(patient_id: str):
         raise HTTPException(status_code=400, detail="Hasta telefon numarası bulunamadı")
     
     # Create WhatsApp message
-    message_text = f"Merhaba {patient['patient_name']}, geçen hafta görüştüğümüz tedavi ile ilgili nazik bir hatırlatma yapmak istedik. Karar verebildiniz mi? İsterseniz tekrar bilgi verebiliriz."
-    
-    whatsapp_msg = WhatsAppMessage(
-        message_type="followup_reminder",
-        recipient_name=patient['patient_name'],
-        recipient_phone=patient['phone_number'],
-        message_text=message_text,
-        scheduled_date=datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-        status="onay_bekliyor",
-        approved=False
-    )
+    await render_doctor_names([patient])
+    templates = await get_message_templates("followup_reminder")
+    whatsapp_msg = build_reminder_message(patient, datetime.now(timezone.utc).strftime("%Y-%m-%d"), templates["text"])
     
     msg_doc = whatsapp_msg.model_dump()
     msg_doc['created_at'] = msg_doc['created_at'].isoformat()
+    idempotent_write()
     await db.whatsapp_messages.insert_one(msg_doc)
     
     return {"message": "Hatırlatma mesajı oluşturuldu", "whatsapp_message": whatsapp_msg}
 
 
+@api_router.post("/reminders/bulk")
+@idempotent("bulk_reminders")
+async def send_bulk_reminders(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    doctor: Optional[str] = None,
+    window_days: Optional[int] = Query(None, ge=0)
+):
+    """Reminders for every thinking patient with a phone number visited in [from, to].
+
+    Defaults to the last 7 days. Patients whose phone already got a reminder
+    within `window_days` (REMINDER_WINDOW_DAYS) are skipped.
+    """
+    today = datetime.now(timezone.utc).date()
+    date_from = date_from or (today - timedelta(days=7)).isoformat()
+    date_to = date_to or today.isoformat()
+    window_days = REMINDER_WINDOW_DAYS if window_days is None else window_days
+    
+    query = {
+        "status": "düşünüyor",
+        "visit_date": {"$gte": date_from, "$lte": date_to},
+        "phone_number": {"$nin": [None, ""]},
+    }
+    if doctor:
+        query.update(await doctor_filter(doctor))
+    patients = await db.patients.find(
+        query, {"_id": 0, "id": 1, "patient_name": 1, "phone_number": 1, "doctor": 1, "doctor_id": 1}
+    ).sort("visit_date", 1).to_list(None)
+    
+    # One patient per phone number, and none reminded within the window
+    by_phone = {}
+    for patient in patients:
+        by_phone.setdefault(patient['phone_number'], patient)
+    reminded = set()
+    if by_phone and window_days:
+        since = (today - timedelta(days=window_days)).isoformat()
+        recent = await db.whatsapp_messages.find(
+            {"recipient_phone": {"$in": list(by_phone)}, "scheduled_date": {"$gte": since},
+             "message_type": "followup_reminder"},
+            {"_id": 0, "recipient_phone": 1}
+        ).to_list(None)
+        reminded = {m['recipient_phone'] for m in recent}
+    
+    scheduled_date = today.isoformat()
+    eligible = await render_doctor_names([p for phone, p in by_phone.items() if phone not in reminded])
+    templates = await get_message_templates("followup_reminder")
+    texts = message_templates.render_batch(templates, "text", [reminder_fields(p, scheduled_date) for p in eligible])
+    messages = [
+        build_reminder_message(patient, scheduled_date, message_text=text)
+        for patient, text in zip(eligible, texts)
+    ]
+    docs = []
+    for whatsapp_msg in messages:
+        msg_doc = whatsapp_msg.model_dump()
+        msg_doc['created_at'] = msg_doc['created_at'].isoformat()
+        docs.append(msg_doc)
+    result = {
+        "message": f"{len(docs)} hatırlatma mesajı oluşturuldu",
+        "created": len(docs),
+        "skipped": len(patients) - len(docs),
+        "messages": messages,
+    }
+    if docs:
+        idempotent_write()
+        await db.whatsapp_messages.insert_many(docs, ordered=False)
+        await idempotent_response(result)
+        counts_cache.clear()
+    
+    return result
+
+
+@api_router.get("/message-templates")
+async def get_message_template_settings():
+    """Effective template parts per message type, with the defaults and allowed fields"""
+    overrides = await reference_cache.get("message_templates", load_message_templates)
+    return {
+        "clinic": CLINIC_ID,
+        "templates": [
+            {
+                "message_type": message_type,
+                "version": overrides.get(message_type, {}).get('version', 0),
+                "parts": {**defaults, **overrides.get(message_type, {}).get('parts', {})},
+                "defaults": defaults,
+                "fields": {part: sorted(fields) for part, fields in message_templates.TEMPLATE_FIELDS[message_type].items()},
+            }
+            for message_type, defaults in message_templates.DEFAULT_TEMPLATES.items()
+        ],
+    }
+
+
+@api_router.get("/message-templates/{message_type}/versions")
+async def get_message_template_versions(message_type: str):
+    versions = await db.message_templates.find(
+        {"clinic": CLINIC_ID, "message_type": message_type}, {"_id": 0}
+    ).sort("version", -1).to_list(100)
+    return {"message_type": message_type, "versions": versions}
+
+
+@api_router.put("/message-templates/{message_type}")
+async def save_message_template(message_type: str, input: MessageTemplateUpdate):
+    """Store a new version of this clinic's overrides; empty parts restore the defaults"""
+    try:
+        message_templates.compile_templates(message_type, input.parts)
+    except message_templates.TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    latest = await db.message_templates.find_one(
+        {"clinic": CLINIC_ID, "message_type": message_type}, {"version": 1}, sort=[("version", -1)]
+    )
+    version = (latest['version'] if latest else 0) + 1
+    try:
+        await db.message_templates.insert_one({
+            "clinic": CLINIC_ID,
+            "message_type": message_type,
+            "version": version,
+            "parts": input.parts,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Şablon aynı anda güncellendi, lütfen tekrar deneyin")
+    reference_cache.invalidate("message_templates")
+    return {"message": "Şablon kaydedildi", "message_type": message_type, "version": version}
+
+
 @api_router.patch("/patients/{patient_id}/revisit")
 async def mark_as_revisit(patient_id: str, revisit_date: str):
     """Mark patient as revisit"""
-    result = await db.patients.update_one(
+    patient = await db.patients.find_one_and_update(
         {"id": patient_id},
-        {"$set": {"is_revisit": True, "revisit_date": revisit_date}}
+        {"$set": {"is_revisit": True, "revisit_date": revisit_date}},
+        projection={"_id": 0, "visit_date": 1}
     )
     
-    if result.matched_count == 0:
+    if patient is None:
         raise HTTPException(status_code=404, detail="Hasta bulunamadı")
+    await invalidate_month_stats(patient.get('visit_date'))
     
     return {"message": "Hasta tekrar görüşme olarak işaretlendi"}
 
@@ -799,21 +2401,376 @@ async def mark_as_revisit(patient_id: str, revisit_date: str):
 @api_router.get("/family-groups")
 async def get_family_groups():
     """Get all unique family groups"""
-    families = await db.patients.distinct("family_group")
-    families = [f for f in families if f]  # Remove empty strings
-    return {"family_groups": sorted(families)}
+    return {"family_groups": await reference_cache.get("family_groups", load_family_groups)}
+
+
+@api_router.get("/family-groups/{family_group}")
+async def get_family_group_detail(family_group: str):
+    """Family totals from the registry plus its members and visit history"""
+    family = await db.family_groups.find_one({"_id": family_group})
+    if not family:
+        raise HTTPException(status_code=404, detail="Aile grubu bulunamadı")
+    
+    history = await db.patients.find(
+        {"family_group": family_group}, PATIENT_PROJECTION
+    ).sort("visit_date", -1).to_list(1000)
+    await render_doctor_names(history)
+    
+    # One entry per person, newest visit first
+    members = {}
+    for visit in history:
+        key = (visit['patient_name'], visit.get('phone_number') or "")
+        member = members.setdefault(key, {
+            "patient_name": visit['patient_name'],
+            "phone_number": visit.get('phone_number') or "",
+            "last_visit": visit['visit_date'],
+            "status": visit.get('status', 'kabul etti' if visit.get('accepted') else 'kabul etmedi'),
+            "visit_count": 0,
+        })
+        member["visit_count"] += 1
+    
+    total, accepted = family['member_count'], family['accepted_count']
+    return {
+        "family_group": family_group,
+        "member_count": total,
+        "accepted_count": accepted,
+        "acceptance_rate": round(accepted / total * 100, 1) if total > 0 else 0,
+        "first_seen": family.get('first_seen'),
+        "last_seen": family.get('last_seen'),
+        "members": list(members.values()),
+        "history": history,
+    }
 
 
 @api_router.get("/profession-groups")
 async def get_profession_groups():
     """Get all unique profession groups"""
-    professions = await db.patients.distinct("profession_group")
-    professions = [p for p in professions if p]  # Remove empty strings
-    return {"profession_groups": sorted(professions)}
+    return {"profession_groups": await reference_cache.get("profession_groups", load_profession_groups)}
+
+
+# CSV import of legacy patient records. The multipart body is parsed as it
+# arrives (nothing is buffered beyond one chunk and the current batch), rows
+# are validated against PatientCreate, and batches are written with unordered
+# insert_many by a writer task while the upload continues. Progress and row
+# errors are kept on the job in import_jobs.
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+IMPORT_QUEUE_BATCHES = int(os.environ.get('IMPORT_QUEUE_BATCHES', 4))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+IMPORT_TTL_S = float(os.environ.get('IMPORT_TTL_S', 7 * 86400))
+
+# Accepted CSV headers (lower-cased) -> PatientCreate field
+IMPORT_COLUMN_ALIASES = {
+    **{field: field for field in PatientCreate.model_fields},
+    "tarih": "visit_date",
+    "ziyaret tarihi": "visit_date",
+    "hasta adı": "patient_name",
+    "hasta": "patient_name",
+    "ad soyad": "patient_name",
+    "telefon": "phone_number",
+    "doktor": "doctor",
+    "ziyaret tipi": "visit_type",
+    "işlem": "visit_type",
+    "durum": "status",
+    "aile grubu": "family_group",
+    "meslek grubu": "profession_group",
+    "tekrar görüşme": "is_revisit",
+    "tekrar görüşme tarihi": "revisit_date",
+    "notlar": "notes",
+}
+IMPORT_REQUIRED_FIELDS = ["visit_date", "patient_name", "doctor", "visit_type", "status"]
+IMPORT_TRUE_VALUES = {"1", "true", "evet", "e", "x", "yes"}
+
+
+class CsvRecordSplitter:
+    """Splits streamed CSV text into complete records.
+
+    A newline inside a quoted field doesn't end a record, so records that span
+    two upload chunks are held back until their closing line arrives.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.in_quotes = False
+
+    def feed(self, text: str):
+        data = self.pending + text
+        records, start, i = [], 0, len(self.pending)
+        next_quote = data.find('"', i)
+        while True:
+            if self.in_quotes:
+                if next_quote < 0:
+                    break
+                self.in_quotes, i = False, next_quote + 1
+                next_quote = data.find('"', i)
+                continue
+            newline = data.find('\n', i)
+            if 0 <= next_quote and (newline < 0 or next_quote < newline):
+                self.in_quotes, i = True, next_quote + 1
+                next_quote = data.find('"', i)
+                continue
+            if newline < 0:
+                break
+            records.append(data[start:newline + 1])
+            start = i = newline + 1
+        self.pending = data[start:]
+        return records
+
+    def finish(self):
+        rest, self.pending = self.pending, ""
+        return [rest] if rest.strip() else []
+
+
+def import_columns(header: List[str]):
+    """Column index -> PatientCreate field; raises 400 on missing required columns"""
+    columns = {}
+    for index, name in enumerate(header):
+        field = IMPORT_COLUMN_ALIASES.get(name.strip().lower())
+        if field and field not in columns.values():
+            columns[index] = field
+    missing = [f for f in IMPORT_REQUIRED_FIELDS if f not in columns.values()]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"CSV'de eksik sütun: {', '.join(missing)}")
+    return columns
+
+
+def import_row(values: List[str], columns: dict, doctor_ids: dict, import_id: str):
+    """Patient document for a CSV row, or a list of error messages"""
+    data = {field: values[index].strip() for index, field in columns.items() if index < len(values)}
+    data['is_revisit'] = data.get('is_revisit', '').lower() in IMPORT_TRUE_VALUES
+    errors = []
+    try:
+        date.fromisoformat(data.get('visit_date', ''))
+    except ValueError:
+        errors.append("Geçersiz tarih (YYYY-MM-DD bekleniyor)")
+    if data.get('visit_type') not in VISIT_TYPES:
+        errors.append("Geçersiz ziyaret tipi")
+    if data.get('status') not in PATIENT_STATUS:
+        errors.append("Geçersiz hasta durumu")
+    for field in IMPORT_REQUIRED_FIELDS:
+        if not data.get(field):
+            errors.append(f"Boş alan: {field}")
+    # Doctor filters and daily summaries go by doctor_id, so the name must resolve
+    if data.get('doctor') and data['doctor'] not in doctor_ids:
+        errors.append(f"Bilinmeyen doktor: {data['doctor']}")
+    if errors:
+        return None, errors
+    try:
+        patient = Patient(
+            **PatientCreate(**data).model_dump(),
+            accepted=data['status'] == "kabul etti",
+            doctor_id=doctor_ids[data['doctor']],
+        )
+    except ValueError as e:
+        return None, [str(e)]
+    doc = patient.model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    doc['import_id'] = import_id
+    return doc, None
+
+
+async def write_import_batches(job: dict, queue: asyncio.Queue):
+    """Writer side of an import: insert queued batches and record progress"""
+    visit_dates = {}
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            break
+        docs, errors, rows_read = batch
+        inserted = len(docs)
+        if docs:
+            try:
+                await db.patients.insert_many([doc for _, doc in docs], ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get('writeErrors', [])
+                inserted -= len(write_errors)
+                errors += [(docs[err['index']][0], [err.get('errmsg', "Yazma hatası")]) for err in write_errors]
+            for _, doc in docs:
+                visit_dates.setdefault(doc['visit_date'][:7], doc['visit_date'])
+        update = {
+            "$inc": {"inserted": inserted, "failed": len(errors)},
+            "$set": {"filename": job['filename'], "rows_read": rows_read, "updated_at": datetime.now(timezone.utc)},
+        }
+        if errors:
+            update["$push"] = {"errors": {
+                "$each": [{"row": row, "errors": messages} for row, messages in errors],
+                "$slice": IMPORT_MAX_ERRORS,
+            }}
+        await db.import_jobs.update_one({"_id": job['_id']}, update)
+    
+    # Derived data is refreshed once for the whole import
+    if visit_dates:
+        await rebuild_group_registries()
+        await invalidate_month_stats(*visit_dates.values())
+        counts_cache.clear()
+
+
+async def finish_import(job_id: str, writer: asyncio.Task):
+    try:
+        await writer
+    except Exception as e:
+        logger.exception(f"İçe aktarma {job_id} başarısız")
+        await db.import_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "başarısız", "error": str(e), "updated_at": datetime.now(timezone.utc)}}
+        )
+        return
+    now = datetime.now(timezone.utc)
+    await db.import_jobs.update_one(
+        {"_id": job_id}, {"$set": {"status": "tamamlandı", "completed_at": now, "updated_at": now}}
+    )
+
+
+def import_job_status(job: dict):
+    return {
+        "id": job['_id'],
+        "status": job['status'],
+        "filename": job.get('filename'),
+        "rows_read": job.get('rows_read', 0),
+        "inserted": job.get('inserted', 0),
+        "failed": job.get('failed', 0),
+        "errors": job.get('errors', []),
+        "error": job.get('error'),
+        "created_at": job['created_at'].isoformat(),
+        "completed_at": job['completed_at'].isoformat() if job.get('completed_at') else None,
+    }
+
+
+@api_router.post("/imports/patients", status_code=202)
+@concurrency.limit("imports")
+async def import_patients(request: Request):
+    """Import patients from a CSV file uploaded as multipart form field `file`.
+
+    Returns the job once the upload is parsed; remaining batches are written
+    in the background. Poll GET /imports/{id} for progress and row errors.
+    """
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    boundary = options.get(b'boundary')
+    if content_type != b'multipart/form-data' or not boundary:
+        raise HTTPException(status_code=400, detail="multipart/form-data bekleniyor")
+    
+    now = datetime.now(timezone.utc)
+    job = {
+        "_id": str(uuid.uuid4()),
+        "status": "işleniyor",
+        "filename": None,
+        "rows_read": 0,
+        "inserted": 0,
+        "failed": 0,
+        "errors": [],
+        "created_at": now,
+        "updated_at": now,
+        "expires_at": now + timedelta(seconds=IMPORT_TTL_S),
+    }
+    await db.import_jobs.insert_one(job)
+    
+    directory = await get_doctor_directory()
+    doctor_ids = {name: doctor_id for doctor_id, name in directory.items()}
+    
+    # Multipart callbacks only collect the `file` part's bytes; parsing and
+    # validation happen between chunks so batches can be awaited (backpressure)
+    # Header names and values arrive in pieces when they span upload chunks
+    part = {"headers": {}, "field": [], "value": [], "is_file": False, "data": []}
+    
+    def on_part_begin():
+        part.update(headers={}, is_file=False)
+    
+    def on_header_field(data, start, end):
+        part['field'].append(data[start:end])
+    
+    def on_header_value(data, start, end):
+        part['value'].append(data[start:end])
+    
+    def on_header_end():
+        part['headers'][b"".join(part['field']).lower()] = b"".join(part['value'])
+        part.update(field=[], value=[])
+    
+    def on_headers_finished():
+        _, disposition = parse_options_header(part['headers'].get(b'content-disposition', b''))
+        part['is_file'] = disposition.get(b'name') == b'file'
+        if part['is_file'] and disposition.get(b'filename'):
+            job['filename'] = disposition[b'filename'].decode('utf-8', 'replace')
+    
+    def on_part_data(data, start, end):
+        if part['is_file']:
+            part['data'].append(data[start:end])
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    splitter = CsvRecordSplitter()
+    queue = asyncio.Queue(maxsize=IMPORT_QUEUE_BATCHES)
+    writer = asyncio.create_task(write_import_batches(job, queue))
+    state = {"columns": None, "row": 0, "docs": [], "errors": []}
+    
+    async def enqueue(item):
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put, writer}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            # The writer stopped before draining the queue; surface its error
+            put.cancel()
+            writer.result()
+    
+    async def consume(records):
+        for values in csv.reader(records):
+            if state['columns'] is None:
+                state['columns'] = import_columns(values)
+                continue
+            state['row'] += 1
+            if not any(v.strip() for v in values):
+                continue
+            doc, errors = import_row(values, state['columns'], doctor_ids, job['_id'])
+            if doc:
+                state['docs'].append((state['row'], doc))
+            else:
+                state['errors'].append((state['row'], errors))
+            if len(state['docs']) + len(state['errors']) >= IMPORT_BATCH_SIZE:
+                await enqueue((state['docs'], state['errors'], state['row']))
+                state['docs'], state['errors'] = [], []
+    
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if part['data']:
+                text = decoder.decode(b"".join(part['data']))
+                part['data'] = []
+                await consume(splitter.feed(text))
+        parser.finalize()
+        await consume(splitter.feed(decoder.decode(b"", final=True)) + splitter.finish())
+        if state['columns'] is None:
+            raise HTTPException(status_code=400, detail="CSV dosyası boş veya `file` alanı bulunamadı")
+        await enqueue((state['docs'], state['errors'], state['row']))
+        await enqueue(None)
+    except Exception as e:
+        writer.cancel()
+        await db.import_jobs.update_one(
+            {"_id": job['_id']},
+            {"$set": {"status": "başarısız", "error": getattr(e, 'detail', str(e)),
+                      "updated_at": datetime.now(timezone.utc)}}
+        )
+        raise
+    
+    asyncio.create_task(finish_import(job['_id'], writer))
+    job['rows_read'] = state['row']
+    return import_job_status(job)
+
+
+@api_router.get("/imports/{job_id}")
+async def get_import_status(job_id: str):
+    job = await db.import_jobs.find_one({"_id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="İçe aktarma işi bulunamadı")
+    return import_job_status(job)
 
 
 # Follow-up Management
 @api_router.post("/followups", response_model=FollowUp)
+@idempotent("create_followup")
 async def create_followup(input: FollowUpCreate):
     # Get patient info
     patient = await db.patients.find_one({"id": input.patient_id}, {"_id": 0})
@@ -825,6 +2782,7 @@ async def create_followup(input: FollowUpCreate):
         patient_name=patient['patient_name'],
         phone_number=patient.get('phone_number', ''),
         doctor=patient['doctor'],
+        doctor_id=patient.get('doctor_id'),
         followup_date=input.followup_date,
         patient_status=patient.get('status', 'düşünüyor'),
         followup_status=input.status
@@ -833,8 +2791,15 @@ async def create_followup(input: FollowUpCreate):
     doc = followup.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     
-    await db.followups.insert_one(doc)
-    return followup
+    # A patient has at most one open follow-up; point the caller at the existing one
+    idempotent_write()
+    stored = await upsert_open_followup(doc)
+    if stored['id'] != doc['id']:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Bu hasta için zaten açık bir takip var", "followup_id": stored['id']}
+        )
+    return stored
 
 
 @api_router.get("/followups", response_model=List[FollowUp])
@@ -847,10 +2812,10 @@ async def get_followups(
     query = {}
     
     if status:
-        query["status"] = status
+        query["followup_status"] = status
     
     if doctor:
-        query["doctor"] = doctor
+        query.update(await doctor_filter(doctor))
     
     if start_date or end_date:
         date_filter = {}
@@ -860,7 +2825,8 @@ async def get_followups(
             date_filter["$lte"] = end_date
         query["followup_date"] = date_filter
     
-    followups = await db.followups.find(query, {"_id": 0}).sort("followup_date", 1).to_list(1000)
+    followups = await db.followups.find(query, {"_id": 0, "open": 0}).sort("followup_date", 1).to_list(1000)
+    await render_doctor_names(followups)
     
     for followup in followups:
         if isinstance(followup['created_at'], str):
@@ -882,20 +2848,32 @@ async def update_followup_status(followup_id: str, followup_status: str, patient
     update_data = {"followup_status": followup_status}
     if patient_status:
         update_data["patient_status"] = patient_status
+    if followup_status == "tamamlandı":
+        update = {"$set": update_data, "$unset": {"open": ""}}
+    else:
+        update = {"$set": {**update_data, "open": True}}
     
-    await db.followups.update_one(
-        {"id": followup_id},
-        {"$set": update_data}
-    )
+    try:
+        await db.followups.update_one({"id": followup_id}, update)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Bu hasta için zaten açık bir takip var")
     
     # Sync with patient record if status changed
     if patient_status:
         patient_id = followup['patient_id']
         accepted = (patient_status == "kabul etti")
-        await db.patients.update_one(
+        patient_update = {"$set": {"status": patient_status, "accepted": accepted}}
+        if patient_status != "düşünüyor":
+            # Leaving "düşünüyor" ends the follow-up cadence
+            patient_update["$unset"] = {"next_followup_date": ""}
+        patient = await db.patients.find_one_and_update(
             {"id": patient_id},
-            {"$set": {"status": patient_status, "accepted": accepted}}
+            patient_update,
+            projection={"_id": 0, "visit_date": 1, "accepted": 1, **{f: 1 for f in GROUP_REGISTRIES}}
         )
+        if patient:
+            await record_group_membership({**patient, "accepted": accepted}, patient)
+            await invalidate_month_stats(patient.get('visit_date'))
     
     return {"message": "Takip güncellendi ve hasta kaydı senkronize edildi"}
 
@@ -927,6 +2905,40 @@ async def get_whatsapp_messages(
     return messages
 
 
+# Declared before /whatsapp-messages/{message_id} so "bulk" isn't taken as an id
+@api_router.patch("/whatsapp-messages/bulk")
+async def bulk_update_messages(input: WhatsAppBulkUpdate):
+    """Approve or change the status of many messages with one update_many"""
+    query = {}
+    if input.ids is not None:
+        query["id"] = {"$in": input.ids}
+    if input.message_type:
+        query["message_type"] = input.message_type
+    if input.scheduled_date:
+        query["scheduled_date"] = input.scheduled_date
+    if input.current_status:
+        query["status"] = input.current_status
+    if not query:
+        raise HTTPException(status_code=400, detail="Mesaj kimlikleri veya filtre gerekli")
+    
+    if input.approve:
+        update = {"approved": True, "status": "gönderildi"}
+    elif input.status:
+        if input.status not in MESSAGE_STATUS:
+            raise HTTPException(status_code=400, detail="Geçersiz mesaj durumu")
+        update = {"status": input.status}
+    else:
+        raise HTTPException(status_code=400, detail="Onay veya yeni durum belirtilmeli")
+    
+    result = await db.whatsapp_messages.update_many(query, {"$set": update})
+    counts_cache.clear()
+    return {
+        "message": f"{result.modified_count} mesaj güncellendi",
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+    }
+
+
 @api_router.patch("/whatsapp-messages/{message_id}/approve")
 async def approve_and_send_message(message_id: str):
     """Approve message and mark as ready to send"""
@@ -955,97 +2967,86 @@ async def update_message_status(message_id: str, status: str):
 
 
 @api_router.post("/generate-daily-summaries")
+@idempotent("daily_summaries")
+@concurrency.limit("daily_summaries")
 async def generate_daily_summaries(date: str):
     """Generate daily WhatsApp summaries for all doctors"""
-    generated_messages = []
-    
-    # Get doctor phone numbers
-    doctor_info_list = await db.doctor_info.find({}, {"_id": 0}).to_list(100)
-    doctor_phones = {d['doctor_name']: d['phone_number'] for d in doctor_info_list}
-    
-    # Get active doctors dynamically
-    active_doctors = await db.doctors.find({"active": True}, {"_id": 0}).to_list(100)
-    doctor_names = [d['name'] for d in active_doctors]
-    
-    for doctor in doctor_names:
-        # Get patients for this doctor on this date
-        patients = await db.patients.find(
-            {"visit_date": date, "doctor": doctor},
-            {"_id": 0}
-        ).to_list(1000)
-        
-        if not patients:
+    doctors = await get_active_doctors()
+    # Records whose doctor name never resolved to an id are matched by name
+    ids_by_name = {d['name']: d['id'] for d in doctors}
+    
+    # Doctor phones, the day's patients and the follow-up counts for all
+    # doctors at once, then one render pass over every summary
+    doctor_info_list, patients, followup_counts, templates = await asyncio.gather(
+        db.doctor_info.find({}, {"_id": 0}).to_list(100),
+        db.patients.find(
+            {"visit_date": date, **doctors_filter(doctors)},
+            {"_id": 0, "doctor_id": 1, "doctor": 1, "patient_name": 1, "visit_type": 1, "accepted": 1,
+             "is_revisit": 1}
+        ).to_list(None),
+        db.followups.aggregate([
+            {"$match": {"followup_date": {"$gte": date}, **doctors_filter(doctors)}},
+            {"$group": {"_id": {"$ifNull": ["$doctor_id", "$doctor"]}, "count": {"$sum": 1}}},
+        ]).to_list(None),
+        get_message_templates("daily_summary"),
+    )
+    doctor_phones = {d.get('doctor_id') or d['doctor_name']: d['phone_number'] for d in doctor_info_list}
+    new_followups = {}
+    for f in followup_counts:
+        doctor_id = ids_by_name.get(f['_id'], f['_id'])
+        new_followups[doctor_id] = new_followups.get(doctor_id, 0) + f['count']
+    by_doctor = {}
+    for p in patients:
+        by_doctor.setdefault(p.get('doctor_id') or ids_by_name[p['doctor']], []).append(p)
+    
+    summaries, recipients = [], []
+    for active_doctor in doctors:
+        doctor_id, doctor = active_doctor['id'], active_doctor['name']
+        doctor_patients = by_doctor.get(doctor_id)
+        if not doctor_patients:
             continue
-        
-        total_patients = len(patients)
-        accepted = [p for p in patients if p['accepted']]
-        not_accepted = [p for p in patients if not p['accepted']]
-        
-        # Count by visit type
-        implants = sum(1 for p in patients if p['visit_type'] == 'implant')
-        checkups = sum(1 for p in patients if p['visit_type'] == 'kontrol')
-        examinations = sum(1 for p in patients if p['visit_type'] == 'muayene')
-        revisits = sum(1 for p in patients if p.get('is_revisit', False))
-        
-        # Count new follow-ups
-        followups = await db.followups.find(
-            {"doctor": doctor, "followup_date": {"$gte": date}}
-        ).to_list(1000)
-        new_followups = len(followups)
-        
-        # Generate message in Turkish
-        message = f"""Günlük Özet - {date}
-
-Sayın {doctor},
-
-Bugünkü hasta özetiniz:
-
-📊 Toplam Hasta: {total_patients}
-• İmplant: {implants}
-• Kontrol: {checkups}
-• Muayene: {examinations}
-• Tekrar Görüşme: {revisits}
-
-✅ Kabul Edilen: {len(accepted)}
-❌ Düşünen/Ret: {len(not_accepted)}
-
-📅 Yeni Takipler: {new_followups}
-
-"""
-        
-        if accepted:
-            message += "Kabul Edilen Hastalar:\n"
-            for p in accepted:
-                message += f"• {p['patient_name']} - {p['visit_type']}\n"
-        
-        if not_accepted:
-            message += "\nDüşünen/Ret Hastalar:\n"
-            for p in not_accepted:
-                message += f"• {p['patient_name']} - {p['visit_type']}\n"
-        
-        phone = doctor_phones.get(doctor, "")
-        
-        whatsapp_msg = WhatsAppMessage(
+        summaries.append({
+            "date": date,
+            "doctor": doctor,
+            "total_patients": len(doctor_patients),
+            "implants": sum(1 for p in doctor_patients if p['visit_type'] == 'implant'),
+            "checkups": sum(1 for p in doctor_patients if p['visit_type'] == 'kontrol'),
+            "examinations": sum(1 for p in doctor_patients if p['visit_type'] == 'muayene'),
+            "revisits": sum(1 for p in doctor_patients if p.get('is_revisit', False)),
+            "new_followups": new_followups.get(doctor_id, 0),
+            "accepted": [p for p in doctor_patients if p['accepted']],
+            "not_accepted": [p for p in doctor_patients if not p['accepted']],
+        })
+        recipients.append((doctor, doctor_phones.get(doctor_id, doctor_phones.get(doctor, ""))))
+    
+    texts = message_templates.render_daily_summaries(templates, summaries)
+    generated_messages = [
+        WhatsAppMessage(
             message_type="daily_summary",
             recipient_name=doctor,
             recipient_phone=phone,
-            message_text=message,
+            message_text=text,
             scheduled_date=date,
             status="onay_bekliyor",
             approved=False
         )
-        
+        for (doctor, phone), text in zip(recipients, texts)
+    ]
+    docs = []
+    for whatsapp_msg in generated_messages:
         msg_doc = whatsapp_msg.model_dump()
         msg_doc['created_at'] = msg_doc['created_at'].isoformat()
-        await db.whatsapp_messages.insert_one(msg_doc)
-        
-        generated_messages.append(whatsapp_msg)
+        docs.append(msg_doc)
+    if docs:
+        idempotent_write()
+        await db.whatsapp_messages.insert_many(docs)
     
     return {"message": f"{len(generated_messages)} günlük özet oluşturuldu", "summaries": generated_messages}
 
 
 # Statistics
 @api_router.get("/statistics/weekly-trend")
+@coalesce("weekly_trend")
 async def get_weekly_trend(year: int, month: int):
     """Analyze weekly patient trends and detect low periods"""
     
@@ -1056,7 +3057,7 @@ async def get_weekly_trend(year: int, month: int):
     else:
         next_month_date = f"{year}-{month + 1:02d}-01"
     
-    patients = await db.patients.find(
+    patients = await analytics_db.patients.find(
         {
             "visit_date": {
                 "$gte": start_date,
@@ -1112,340 +3113,674 @@ async def get_weekly_trend(year: int, month: int):
     }
 
 
+def is_closed_month(year: int, month: int):
+    today = datetime.now(timezone.utc)
+    return (year, month) < (today.year, today.month)
+
+
+async def read_month_stats_cache(keys: List[str]):
+    """Cached stats for closed months: {key: stats dict or None} and the cache docs seen"""
+    found, seen_docs = {}, {}
+    remaining = []
+    for key in keys:
+        cached = stats_cache.peek(key)
+        if cached is not None:
+            found[key] = cached
+        else:
+            remaining.append(key)
+    if remaining:
+        async for doc in db.monthly_stats_cache.find({"_id": {"$in": remaining}}):
+            seen_docs[doc["_id"]] = doc
+            if doc.get("stats") and doc.get("schema") == cache_snapshot_schema():
+                stats_cache.put(doc["_id"], doc["stats"])
+                found[doc["_id"]] = doc["stats"]
+    return {key: found.get(key) for key in keys}, seen_docs
+
+
+async def write_month_stats_cache(key: str, stats: dict, seen_doc: Optional[dict]):
+    """Persist computed stats unless the month was invalidated since it was read"""
+    if seen_doc and time.time() - seen_doc.get("invalidated_at", 0) < analytics_read_preference.max_staleness:
+        # A secondary may not have the invalidating write yet; serve but don't store
+        return
+    entry = {"stats": stats, "schema": cache_snapshot_schema(), "computed_at": time.time()}
+    if seen_doc is None:
+        try:
+            await db.monthly_stats_cache.insert_one({"_id": key, "generation": 0, **entry})
+        except DuplicateKeyError:
+            return
+    else:
+        result = await db.monthly_stats_cache.update_one(
+            {"_id": key, "generation": seen_doc.get("generation", 0)}, {"$set": entry}
+        )
+        if result.matched_count == 0:
+            return
+    stats_cache.put(key, stats)
+
+
 @api_router.get("/statistics/monthly", response_model=MonthlyStats)
+@coalesce("monthly_stats")
+@concurrency.limit("monthly_stats")
 async def get_monthly_statistics(year: int, month: int):
+    """Statistics for a specific month; closed months are served from the stats cache"""
+    if not is_closed_month(year, month):
+        return await compute_monthly_statistics(year, month)
+
+    key = f"{year}-{month:02d}"
+    cached, seen = await read_month_stats_cache([key])
+    if cached[key] is not None:
+        return MonthlyStats(**cached[key])
+    stats = await compute_monthly_statistics(year, month)
+    await write_month_stats_cache(key, stats.model_dump(), seen.get(key))
+    return stats
+
+
+async def compute_monthly_statistics(year: int, month: int):
     """Calculate statistics for a specific month"""
+    return (await compute_statistics_range(year, month, 1))[0]
+
+
+async def compute_statistics_range(year: int, month: int, months: int):
+    """MonthlyStats for consecutive months in a single pass over the patients"""
+    import analytics
+
+    start_date, end_date = analytics.month_range(year, month, months)
+    frame = await analytics.load_patient_frame(analytics_db.patients, start_date, end_date, VISIT_TYPES)
+    doctors = await get_active_doctors()
+    return [MonthlyStats(**stats) for stats in analytics.monthly_stats(frame, year, month, months, doctors)]
+
+
+@api_router.get("/statistics/yearly", response_model=List[MonthlyStats])
+@coalesce("yearly_stats")
+@concurrency.limit("yearly_stats")
+async def get_yearly_statistics(year: int):
+    """Statistics for all twelve months of a year; uncached months are computed in one pass"""
+    keys = {month: f"{year}-{month:02d}" for month in range(1, 13) if is_closed_month(year, month)}
+    cached, seen = await read_month_stats_cache(list(keys.values()))
+    results = {month: MonthlyStats(**cached[key]) for month, key in keys.items() if cached[key] is not None}
+
+    missing = [month for month in range(1, 13) if month not in results]
+    if missing:
+        first, last = missing[0], missing[-1]
+        computed = await compute_statistics_range(year, first, last - first + 1)
+        for stats in computed:
+            if stats.month in results:
+                continue
+            results[stats.month] = stats
+            if stats.month in keys:
+                await write_month_stats_cache(keys[stats.month], stats.model_dump(), seen.get(keys[stats.month]))
+    return [results[month] for month in range(1, 13)]
+
+
+# Cube dimensions -> aggregation expression over a patient document
+CUBE_DIMENSIONS = {
+    "doctor": "$doctor_id",  # see cube_doctor_key; rendered to the current name
+    "visit_type": "$visit_type",
+    "status": "$status",
+    "family_group": {"$ifNull": ["$family_group", ""]},
+    "profession_group": {"$ifNull": ["$profession_group", ""]},
+    "is_revisit": {"$ifNull": ["$is_revisit", False]},
+    "month": {"$substrCP": ["$visit_date", 0, 7]},
+    "visit_date": "$visit_date",
+}
+CUBE_MEASURES = ["count", "accepted", "acceptance_rate", "revisits"]
+CUBE_OTHER = "diğer"
+
+
+def cube_doctor_key(directory: dict):
+    """Doctor grouping key: doctor_id, or the id of the doctor named on rows without one"""
+    by_name = {"$switch": {
+        "branches": [{"case": {"$eq": ["$doctor", name]}, "then": doctor_id} for doctor_id, name in directory.items()],
+        "default": "$doctor",
+    }} if directory else "$doctor"
+    return {"$ifNull": ["$doctor_id", by_name]}
+
+
+def build_cube_pipeline(dims: List[str], date_from: Optional[str], date_to: Optional[str], top: Optional[int],
+                        directory: dict):
+    match = {"visit_type": {"$in": VISIT_TYPES}}
+    if date_from or date_to:
+        match["visit_date"] = {}
+        if date_from:
+            match["visit_date"]["$gte"] = date_from
+        if date_to:
+            match["visit_date"]["$lte"] = date_to
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {dim: cube_doctor_key(directory) if dim == "doctor" else CUBE_DIMENSIONS[dim] for dim in dims},
+            "count": {"$sum": 1},
+            "accepted": {"$sum": {"$cond": [{"$ifNull": ["$accepted", False]}, 1, 0]}},
+            "revisits": {"$sum": {"$cond": [{"$ifNull": ["$is_revisit", False]}, 1, 0]}},
+        }},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+    if top:
+        # Keep the top N cells and fold the rest into one "other" cell
+        pipeline.append({"$facet": {
+            "top": [{"$limit": top}],
+            "other": [
+                {"$skip": top},
+                {"$group": {
+                    "_id": {dim: CUBE_OTHER for dim in dims},
+                    "count": {"$sum": "$count"},
+                    "accepted": {"$sum": "$accepted"},
+                    "revisits": {"$sum": "$revisits"},
+                }},
+            ],
+        }})
+        pipeline.append({"$project": {"cells": {"$concatArrays": ["$top", "$other"]}}})
+        pipeline.append({"$unwind": "$cells"})
+        pipeline.append({"$replaceRoot": {"newRoot": "$cells"}})
+    return pipeline
+
+
+@api_router.get("/statistics/cube")
+@coalesce("stats_cube")
+@concurrency.limit("stats_cube")
+async def get_statistics_cube(
+    dims: str,
+    measures: str = "count,accepted,acceptance_rate",
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    top: Optional[int] = Query(None, ge=1)
+):
+    """Group patients by any combination of dimensions; returns only non-empty cells"""
+    dim_list = [d.strip() for d in dims.split(",") if d.strip()]
+    measure_list = [m.strip() for m in measures.split(",") if m.strip()]
+    invalid = [d for d in dim_list if d not in CUBE_DIMENSIONS] + [m for m in measure_list if m not in CUBE_MEASURES]
+    if not dim_list or invalid:
+        raise HTTPException(status_code=400, detail=f"Geçersiz boyut veya ölçü: {', '.join(invalid) or dims}")
+
+    directory = await get_doctor_directory()
+
+    async def load():
+        pipeline = build_cube_pipeline(dim_list, date_from, date_to, top, directory)
+        return await analytics_db.patients.aggregate(pipeline).to_list(None)
+
+    key = f"{','.join(dim_list)}{f':top{top}' if top else ''}|{date_from or ''}|{date_to or ''}"
+    groups = await cube_cache.get(key, load)
+
+    cells = []
+    for group in groups:
+        values = {
+            "count": group["count"],
+            "accepted": group["accepted"],
+            "revisits": group["revisits"],
+            "acceptance_rate": round(group["accepted"] / group["count"] * 100, 1) if group["count"] else 0,
+        }
+        labels = {**group["_id"]}
+        if "doctor" in labels:
+            labels["doctor"] = directory.get(labels["doctor"], labels["doctor"])
+        cells.append([labels.get(d) for d in dim_list] + [values[m] for m in measure_list])
+    return {
+        "dims": dim_list,
+        "measures": measure_list,
+        "from": date_from,
+        "to": date_to,
+        "columns": dim_list + measure_list,
+        "cells": cells,
+    }
+
+
+MONTH_NAMES = ['', 'Ocak', 'Şubat', 'Mart', 'Nisan', 'Mayıs', 'Haziran',
+               'Temmuz', 'Ağustos', 'Eylül', 'Ekim', 'Kasım', 'Aralık']
+REPORT_CSV_FIELDS = ["visit_date", "patient_name", "phone_number", "doctor", "visit_type", "status",
+                     "family_group", "profession_group", "is_revisit", "revisit_date", "notes"]
+
+
+async def report_progress_noop(fraction: float):
+    pass
+
+
+# Each report kind is split into gathering its data (hashed to detect whether an
+# archived copy is still current) and rendering it (skipped when one is)
+async def gather_monthly_report(params: dict, progress):
+    return (await get_monthly_statistics(params['year'], params['month'])).model_dump()
+
+
+async def render_monthly_report(params: dict, data: dict, progress):
+    from pdf_reports import create_monthly_stats_pdf
     
-    # Create date range for the month
-    start_date = f"{year}-{month:02d}-01"
-    
-    # Calculate last day of month
-    if month == 12:
-        next_month_date = f"{year + 1}-01-01"
-    else:
-        next_month_date = f"{year}-{month + 1:02d}-01"
-    
-    # Get all patients for the month (only these three visit types)
-    patients = await db.patients.find(
-        {
-            "visit_date": {
-                "$gte": start_date,
-                "$lt": next_month_date
-            },
-            "visit_type": {"$in": ["implant", "kontrol", "muayene"]}
-        },
-        {"_id": 0}
-    ).to_list(10000)
-    
-    # Calculate clinic-wide statistics
-    implant_count = sum(1 for p in patients if p['visit_type'] == 'implant')
-    checkup_count = sum(1 for p in patients if p['visit_type'] == 'kontrol')
-    examination_count = sum(1 for p in patients if p['visit_type'] == 'muayene')
-    total_patients = implant_count + checkup_count + examination_count  # Total is sum of these three categories
-    revisit_count = sum(1 for p in patients if p.get('is_revisit', False))
-    
-    # Calculate per-doctor statistics
-    doctor_stats_dict = {}
-    # Get active doctors dynamically
-    active_doctors = await db.doctors.find({"active": True}, {"_id": 0}).to_list(100)
-    doctor_names = [d['name'] for d in active_doctors]
-    
-    for doctor in doctor_names:
-        doctor_patients = [p for p in patients if p['doctor'] == doctor]
-        total = len(doctor_patients)
-        accepted = sum(1 for p in doctor_patients if p['accepted'])
-        acceptance_rate = (accepted / total * 100) if total > 0 else 0
-        
-        doctor_stats_dict[doctor] = DoctorStats(
-            doctor=doctor,
-            total_examinations=total,
-            accepted_count=accepted,
-            acceptance_rate=round(acceptance_rate, 1)
-        )
+    year, month = params['year'], params['month']
+    pdf_buffer = await asyncio.to_thread(create_monthly_stats_pdf, MonthlyStats(**data), MONTH_NAMES[month])
+    return f"aylik_istatistik_{year}_{month:02d}.pdf", "application/pdf", pdf_buffer.getvalue()
+
+
+async def gather_daily_report(params: dict, progress):
+    daily_data = await fetch_daily_patients(analytics_db, params['date'])
+    return json.loads(json.dumps(daily_data['patients'], default=str))
+
+
+async def render_daily_report(params: dict, patients: list, progress):
+    from pdf_reports import create_daily_report_pdf
     
-    doctor_stats_list = list(doctor_stats_dict.values())
+    date = params['date']
+    pdf_buffer = await asyncio.to_thread(create_daily_report_pdf, date, patients)
+    return f"gunluk_rapor_{date}.pdf", "application/pdf", pdf_buffer.getvalue()
+
+
+async def gather_yearly_report(params: dict, progress):
+    """Stats for every month of the year up to the current one"""
+    year = params['year']
+    today = datetime.now(timezone.utc)
+    return [s.model_dump() for s in await get_yearly_statistics(year) if (year, s.month) <= (today.year, today.month)]
+
+
+async def render_yearly_report(params: dict, yearly: list, progress):
+    """Zip of the monthly PDFs"""
+    import zipfile
+    from pdf_reports import create_monthly_stats_pdf
     
-    # Calculate family statistics
-    family_groups = {}
-    for p in patients:
-        if p.get('family_group'):
-            fg = p['family_group']
-            if fg not in family_groups:
-                family_groups[fg] = {'total': 0, 'accepted': 0}
-            family_groups[fg]['total'] += 1
-            if p['accepted']:
-                family_groups[fg]['accepted'] += 1
-    
-    family_stats_list = []
-    for fg, data in family_groups.items():
-        rate = (data['accepted'] / data['total'] * 100) if data['total'] > 0 else 0
-        family_stats_list.append(FamilyStats(
-            family_group=fg,
-            patient_count=data['total'],
-            accepted_count=data['accepted'],
-            acceptance_rate=round(rate, 1)
-        ))
-    
-    # Calculate profession statistics
-    profession_groups = {}
-    for p in patients:
-        if p.get('profession_group'):
-            pg = p['profession_group']
-            if pg not in profession_groups:
-                profession_groups[pg] = {'total': 0, 'accepted': 0}
-            profession_groups[pg]['total'] += 1
-            if p['accepted']:
-                profession_groups[pg]['accepted'] += 1
-    
-    profession_stats_list = []
-    for pg, data in profession_groups.items():
-        rate = (data['accepted'] / data['total'] * 100) if data['total'] > 0 else 0
-        profession_stats_list.append(ProfessionStats(
-            profession_group=pg,
-            patient_count=data['total'],
-            accepted_count=data['accepted'],
-            acceptance_rate=round(rate, 1)
-        ))
-    
-    return MonthlyStats(
-        total_patients=total_patients,
-        implant_count=implant_count,
-        checkup_count=checkup_count,
-        examination_count=examination_count,
-        revisit_count=revisit_count,
-        doctor_stats=doctor_stats_list,
-        family_stats=family_stats_list,
-        profession_stats=profession_stats_list,
-        total_families=len(family_groups),
-        month=month,
-        year=year
+    year = params['year']
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for i, data in enumerate(yearly, 1):
+            stats = MonthlyStats(**data)
+            pdf_buffer = await asyncio.to_thread(create_monthly_stats_pdf, stats, MONTH_NAMES[stats.month])
+            bundle.writestr(f"aylik_istatistik_{year}_{stats.month:02d}.pdf", pdf_buffer.getvalue())
+            await progress(i / len(yearly))
+    return f"yillik_rapor_{year}.zip", "application/zip", buffer.getvalue()
+
+
+async def gather_csv_report(params: dict, progress, batch_size: int = 1000):
+    """Patients visiting between start_date and end_date (inclusive)"""
+    query = {"visit_date": {"$gte": params['start_date'], "$lte": params['end_date']}}
+    total = await analytics_db.patients.count_documents(query)
+    cursor = analytics_db.patients.find(
+        query, {"_id": 0, "doctor_id": 1, **{f: 1 for f in REPORT_CSV_FIELDS}}
+    ).sort([("visit_date", 1), ("patient_name", 1)]).batch_size(batch_size)
+    rows, batch = [], []
+    async for patient in cursor:
+        batch.append(patient)
+        if len(batch) >= batch_size:
+            rows.extend(await render_doctor_names(batch))
+            batch = []
+            await progress(len(rows) / total)
+    rows.extend(await render_doctor_names(batch))
+    return [{f: row.get(f) for f in REPORT_CSV_FIELDS} for row in rows]
+
+
+async def render_csv_report(params: dict, rows: list, progress):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=REPORT_CSV_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    filename = f"hastalar_{params['start_date']}_{params['end_date']}.csv"
+    # BOM so Excel opens the Turkish characters correctly
+    return filename, "text/csv", buffer.getvalue().encode("utf-8-sig")
+
+
+# Report kinds -> (required parameters, gather, render)
+REPORT_KINDS = {
+    "monthly": (["year", "month"], gather_monthly_report, render_monthly_report),
+    "daily": (["date"], gather_daily_report, render_daily_report),
+    "yearly": (["year"], gather_yearly_report, render_yearly_report),
+    "csv": (["start_date", "end_date"], gather_csv_report, render_csv_report),
+}
+
+# Report jobs run in a bounded background worker pool, so exports no longer
+# hold a request open (and hit the proxy timeout) while ReportLab renders
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+REPORT_QUEUE_SIZE = int(os.environ.get('REPORT_QUEUE_SIZE', 50))
+REPORT_TTL_S = float(os.environ.get('REPORT_TTL_S', 86400))
+# Queued or running jobs not updated for this long are treated as lost
+REPORT_STALE_S = float(os.environ.get('REPORT_STALE_S', 600))
+# Archived reports of closed months/years are kept until this many seconds
+# (0 = forever); everything else expires after REPORT_TTL_S
+REPORT_ARCHIVE_TTL_S = float(os.environ.get('REPORT_ARCHIVE_TTL_S', 0))
+REPORT_PRUNE_INTERVAL_S = float(os.environ.get('REPORT_PRUNE_INTERVAL_S', 3600))
+REPORT_STREAM_CHUNK_BYTES = 255 * 1024  # GridFS default chunk size
+
+
+class ReportRequest(BaseModel):
+    kind: str  # "monthly", "daily", "yearly", "csv"
+    year: Optional[int] = None
+    month: Optional[int] = None
+    date: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+
+def is_closed_report_period(kind: str, params: dict):
+    """Whether the report covers only past periods, so its data no longer changes"""
+    today = datetime.now(timezone.utc)
+    if kind == "monthly":
+        return is_closed_month(params['year'], params['month'])
+    if kind == "yearly":
+        return params['year'] < today.year
+    return (params.get('date') or params.get('end_date')) < today.strftime("%Y-%m-%d")
+
+
+def report_period(kind: str, params: dict):
+    if kind == "monthly":
+        return f"{params['year']}-{params['month']:02d}"
+    if kind == "yearly":
+        return str(params['year'])
+    if kind == "daily":
+        return params['date']
+    return f"{params['start_date']}_{params['end_date']}"
+
+
+def report_expiry(kind: str, params: dict, now: datetime):
+    if kind in ("monthly", "yearly") and is_closed_report_period(kind, params):
+        return now + timedelta(seconds=REPORT_ARCHIVE_TTL_S) if REPORT_ARCHIVE_TTL_S else None
+    return now + timedelta(seconds=REPORT_TTL_S)
+
+
+async def produce_report(kind: str, params: dict, progress=report_progress_noop):
+    """Archived GridFS file for the report, rendered only if no copy matches its current data"""
+    _, gather, render = REPORT_KINDS[kind]
+    data = await gather(params, lambda fraction: progress(fraction / 2))
+    data_hash = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    period = report_period(kind, params)
+    now = datetime.now(timezone.utc)
+    
+    archived = await db["reports.files"].find_one_and_update(
+        {"metadata.kind": kind, "metadata.period": period, "metadata.data_hash": data_hash},
+        {"$set": {"metadata.expires_at": report_expiry(kind, params, now)}},
+        projection={"filename": 1, "length": 1, "metadata": 1}
+    )
+    if archived:
+        return archived
+    
+    filename, media_type, content = await render(params, data, lambda fraction: progress(0.5 + fraction / 2))
+    metadata = {
+        "kind": kind,
+        "period": period,
+        "params": params,
+        "data_hash": data_hash,
+        "media_type": media_type,
+        "created_at": now,
+        "expires_at": report_expiry(kind, params, now),
+    }
+    file_id = await reports_fs.upload_from_stream(filename, content, metadata=metadata)
+    # Earlier versions of the same period are superseded; let them expire
+    await db["reports.files"].update_many(
+        {"metadata.kind": kind, "metadata.period": period, "_id": {"$ne": file_id}},
+        {"$set": {"metadata.expires_at": now + timedelta(seconds=REPORT_TTL_S)}}
+    )
+    return {"_id": file_id, "filename": filename, "length": len(content), "metadata": metadata}
+
+
+async def prune_report_archive():
+    """Delete archived reports past their expiry (files and chunks)"""
+    expired = await db["reports.files"].find(
+        {"metadata.expires_at": {"$ne": None, "$lt": datetime.now(timezone.utc)}}, {"_id": 1}
+    ).to_list(None)
+    for file in expired:
+        try:
+            await reports_fs.delete(file['_id'])
+        except NoFile:
+            pass
+    return len(expired)
+
+
+async def prune_report_archive_periodically():
+    while True:
+        try:
+            pruned = await prune_report_archive()
+            if pruned:
+                logger.info(f"{pruned} süresi dolmuş rapor arşivden silindi")
+        except Exception as e:
+            logger.warning(f"Rapor arşivi temizlenemedi: {e}")
+        await asyncio.sleep(REPORT_PRUNE_INTERVAL_S)
+
+
+def parse_byte_range(range_header: Optional[str], size: int):
+    """(start, end) of a single `bytes=` range, or None to send the whole file"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1  # suffix range: last N bytes
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end:
+        raise HTTPException(status_code=416, detail="Geçersiz aralık", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def stream_report_file(file_id, range_header: Optional[str] = None):
+    """Stream an archived report from GridFS, honouring a single HTTP byte range"""
+    try:
+        grid_out = await reports_fs.open_download_stream(file_id)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Rapor dosyası bulunamadı")
+    size = grid_out.length
+    byte_range = parse_byte_range(range_header, size)
+    start, end = byte_range or (0, size - 1)
+    grid_out.seek(start)
+    
+    async def body():
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(REPORT_STREAM_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    
+    metadata = grid_out.metadata or {}
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f"attachment; filename={grid_out.filename}",
+        "ETag": f'"{metadata.get("data_hash", "")[:16]}"',
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        body(),
+        status_code=206 if byte_range else 200,
+        media_type=metadata.get("media_type", "application/octet-stream"),
+        headers=headers
     )
 
 
-# PDF Export Functions
-def create_turkish_paragraph(text, style):
-    """Create paragraph with Turkish characters support"""
-    return Paragraph(text, style)
+def report_job_status(job: dict):
+    return {
+        "id": job['_id'],
+        "kind": job['kind'],
+        "params": job['params'],
+        "status": job['status'],
+        "progress": job.get('progress', 0),
+        "error": job.get('error'),
+        "filename": job.get('filename'),
+        "created_at": job['created_at'].isoformat(),
+        "expires_at": job['expires_at'].isoformat(),
+    }
 
 
-def create_monthly_stats_pdf(stats: MonthlyStats, month_name: str):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=30,
-        alignment=TA_CENTER
+async def run_report_job(job_id: str):
+    now = datetime.now(timezone.utc)
+    job = await db.report_jobs.find_one_and_update(
+        {"_id": job_id, "status": "beklemede"},
+        {"$set": {"status": "hazırlanıyor", "started_at": now, "updated_at": now}}
     )
+    if not job:
+        return
     
-    title = create_turkish_paragraph(f"Aylık İstatistik Raporu<br/>{month_name} {stats.year}", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Summary statistics
-    summary_data = [
-        ['Metrik', 'Sayı'],
-        ['Toplam Hasta', str(stats.total_patients)],
-        ['İmplant', str(stats.implant_count)],
-        ['Kontrol', str(stats.checkup_count)],
-        ['Muayene', str(stats.examination_count)],
-        ['Tekrar Görüşme', str(stats.revisit_count)],
-        ['Aile Sayısı', str(stats.total_families)]
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.5*inch))
-    
-    # Doctor performance
-    elements.append(create_turkish_paragraph("Doktor Performansı", styles['Heading2']))
-    elements.append(Spacer(1, 0.2*inch))
-    
-    doctor_data = [['Doktor', 'Muayene', 'Kabul', 'Oran']]
-    for ds in stats.doctor_stats:
-        doctor_data.append([
-            ds.doctor,
-            str(ds.total_examinations),
-            str(ds.accepted_count),
-            f"{ds.acceptance_rate}%"
-        ])
-    
-    doctor_table = Table(doctor_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
-    doctor_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(doctor_table)
-    
-    # Family statistics if available
-    if stats.family_stats:
-        elements.append(Spacer(1, 0.5*inch))
-        elements.append(create_turkish_paragraph("Aile İstatistikleri", styles['Heading2']))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        family_data = [['Aile Grubu', 'Hasta Sayısı', 'Kabul', 'Oran']]
-        for fs in stats.family_stats:
-            family_data.append([
-                fs.family_group,
-                str(fs.patient_count),
-                str(fs.accepted_count),
-                f"{fs.acceptance_rate}%"
-            ])
-        
-        family_table = Table(family_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
-        family_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f59e0b')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.Color(1, 0.95, 0.8)),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(family_table)
+    async def progress(fraction: float):
+        await db.report_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"progress": round(min(fraction, 1.0), 2), "updated_at": datetime.now(timezone.utc)}}
+        )
     
-    # Profession statistics if available
-    if stats.profession_stats:
-        elements.append(Spacer(1, 0.5*inch))
-        elements.append(create_turkish_paragraph("Meslek İstatistikleri", styles['Heading2']))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        profession_data = [['Meslek Grubu', 'Hasta Sayısı', 'Kabul', 'Oran']]
-        for ps in stats.profession_stats:
-            profession_data.append([
-                ps.profession_group,
-                str(ps.patient_count),
-                str(ps.accepted_count),
-                f"{ps.acceptance_rate}%"
-            ])
-        
-        profession_table = Table(profession_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1*inch])
-        profession_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b5cf6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.Color(0.9, 0.85, 1)),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(profession_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-
-def create_daily_report_pdf(date: str, patients: list):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=30,
-        alignment=TA_CENTER
+    try:
+        report = await produce_report(job['kind'], job['params'], progress)
+    except Exception as e:
+        logger.exception(f"Rapor {job_id} oluşturulamadı")
+        await db.report_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "başarısız", "error": str(e), "active": False,
+                      "updated_at": datetime.now(timezone.utc)}}
+        )
+        return
+    
+    await db.report_jobs.update_one(
+        {"_id": job_id},
+        {"$set": {
+            "status": "tamamlandı",
+            "progress": 1.0,
+            "file_id": report['_id'],
+            "filename": report['filename'],
+            "size": report['length'],
+            # Reports on open periods go stale; later requests start a new job
+            "active": is_closed_report_period(job['kind'], job['params']),
+            "updated_at": datetime.now(timezone.utc),
+        }}
     )
-    
-    title = create_turkish_paragraph(f"Günlük Hasta Raporu<br/>{date}", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Patient list
-    if not patients:
-        elements.append(create_turkish_paragraph("Bu tarih için hasta bulunamadı.", styles['Normal']))
-    else:
-        patient_data = [['Hasta Adı', 'Doktor', 'Ziyaret Tipi', 'Durum']]
-        for p in patients:
-            status = 'Kabul Edildi' if p['accepted'] else 'Kabul Edilmedi'
-            patient_data.append([
-                p['patient_name'],
-                p['doctor'],
-                p['visit_type'],
-                status
-            ])
-        
-        patient_table = Table(patient_data, colWidths=[2*inch, 2*inch, 1.5*inch, 1.5*inch])
-        patient_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(patient_table)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
 
 
-@api_router.get("/export/monthly-stats-pdf")
-async def export_monthly_stats_pdf(year: int, month: int):
-    stats = await get_monthly_statistics(year, month)
-    
-    month_names = ['', 'Ocak', 'Şubat', 'Mart', 'Nisan', 'Mayıs', 'Haziran',
-                   'Temmuz', 'Ağustos', 'Eylül', 'Ekim', 'Kasım', 'Aralık']
-    month_name = month_names[month]
-    
-    pdf_buffer = create_monthly_stats_pdf(stats, month_name)
+async def run_report_worker(queue: asyncio.Queue):
+    # The pool itself bounds report work; route limits don't apply inside jobs
+    concurrency.exempt.set(True)
+    while True:
+        job_id = await queue.get()
+        try:
+            await concurrency.yield_to_priority()
+            await run_report_job(job_id)
+        except Exception as e:
+            logger.warning(f"Rapor işi {job_id} çalıştırılamadı: {e}")
+        finally:
+            queue.task_done()
+
+
+@api_router.post("/reports", status_code=202)
+async def create_report(input: ReportRequest):
+    """Queue a report job; identical requests share the same job"""
+    if input.kind not in REPORT_KINDS:
+        raise HTTPException(status_code=400, detail="Geçersiz rapor türü")
+    required = REPORT_KINDS[input.kind][0]
+    params = {field: getattr(input, field) for field in required}
+    missing = [field for field, value in params.items() if value is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Eksik rapor parametresi: {', '.join(missing)}")
+    if input.kind == "monthly" and not 1 <= input.month <= 12:
+        raise HTTPException(status_code=400, detail="Geçersiz ay")
+    
+    dedupe_key = f"{input.kind}:{json.dumps(params, sort_keys=True)}"
+    now = datetime.now(timezone.utc)
+    live = {
+        "dedupe_key": dedupe_key,
+        "active": True,
+        "expires_at": {"$gt": now},
+        "$or": [{"status": "tamamlandı"}, {"updated_at": {"$gt": now - timedelta(seconds=REPORT_STALE_S)}}],
+    }
+    existing = await db.report_jobs.find_one(live)
+    if existing:
+        return report_job_status(existing)
     
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=aylik_istatistik_{year}_{month:02d}.pdf"}
+    # Retire expired or lost jobs so the partial unique index admits a new one
+    await db.report_jobs.update_many(
+        {"dedupe_key": dedupe_key, "active": True}, {"$set": {"active": False}}
     )
+    job = {
+        "_id": str(uuid.uuid4()),
+        "kind": input.kind,
+        "params": params,
+        "dedupe_key": dedupe_key,
+        "active": True,
+        "status": "beklemede",
+        "progress": 0.0,
+        # BSON dates (not ISO strings) so the TTL index can expire them
+        "created_at": now,
+        "updated_at": now,
+        "expires_at": now + timedelta(seconds=REPORT_TTL_S),
+    }
+    try:
+        await db.report_jobs.insert_one(job)
+    except DuplicateKeyError:
+        # A concurrent identical request created the job first
+        existing = await db.report_jobs.find_one({"dedupe_key": dedupe_key, "active": True})
+        if existing:
+            return report_job_status(existing)
+        raise HTTPException(status_code=409, detail="Rapor işi oluşturulamadı, lütfen tekrar deneyin")
+    
+    try:
+        app.state.report_queue.put_nowait(job['_id'])
+    except asyncio.QueueFull:
+        await db.report_jobs.delete_one({"_id": job['_id']})
+        raise HTTPException(status_code=503, detail="Rapor kuyruğu dolu, lütfen daha sonra tekrar deneyin")
+    return report_job_status(job)
+
+
+@api_router.get("/reports/archive")
+async def get_report_archive(
+    kind: Optional[str] = None,
+    period_from: Optional[str] = Query(None, alias="from"),
+    period_to: Optional[str] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Archived reports, newest period first; `from`/`to` bound the period string"""
+    query = {}
+    if kind:
+        query["metadata.kind"] = kind
+    if period_from or period_to:
+        query["metadata.period"] = {}
+        if period_from:
+            query["metadata.period"]["$gte"] = period_from
+        if period_to:
+            query["metadata.period"]["$lte"] = period_to
+    files = await db["reports.files"].find(
+        query, {"filename": 1, "length": 1, "metadata": 1}
+    ).sort([("metadata.period", -1), ("metadata.created_at", -1)]).to_list(limit)
+    return {
+        "reports": [
+            {
+                "id": str(f['_id']),
+                "kind": f['metadata']['kind'],
+                "period": f['metadata']['period'],
+                "filename": f['filename'],
+                "size": f['length'],
+                "data_hash": f['metadata']['data_hash'],
+                "created_at": f['metadata']['created_at'].isoformat(),
+                "expires_at": f['metadata']['expires_at'].isoformat() if f['metadata'].get('expires_at') else None,
+            }
+            for f in files
+        ]
+    }
+
+
+@api_router.get("/reports/archive/{file_id}")
+async def download_archived_report(file_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Stream an archived report; supports HTTP range requests"""
+    try:
+        object_id = ObjectId(file_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Rapor dosyası bulunamadı")
+    return await stream_report_file(object_id, range_header)
+
+
+@api_router.get("/reports/{report_id}")
+async def get_report(report_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Job status while pending (202), the finished file once done"""
+    job = await db.report_jobs.find_one({"_id": report_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Rapor bulunamadı")
+    if job['status'] == "başarısız":
+        raise HTTPException(status_code=500, detail=f"Rapor oluşturulamadı: {job.get('error')}")
+    if job['status'] != "tamamlandı":
+        return JSONResponse(status_code=202, content=report_job_status(job))
+    return await stream_report_file(job['file_id'], range_header)
+
+
+@api_router.get("/export/monthly-stats-pdf")
+@concurrency.limit("exports")
+async def export_monthly_stats_pdf(year: int, month: int, range_header: Optional[str] = Header(None, alias="Range")):
+    report = await produce_report("monthly", {"year": year, "month": month})
+    return await stream_report_file(report['_id'], range_header)
 
 
 @api_router.get("/export/daily-report-pdf")
-async def export_daily_report_pdf(date: str):
-    daily_data = await get_daily_patients(date)
-    patients = daily_data['patients']
-    
-    pdf_buffer = create_daily_report_pdf(date, patients)
-    
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=gunluk_rapor_{date}.pdf"}
-    )
+@concurrency.limit("exports")
+async def export_daily_report_pdf(date: str, range_header: Optional[str] = Header(None, alias="Range")):
+    report = await produce_report("daily", {"date": date})
+    return await stream_report_file(report['_id'], range_header)
 
 
 # Include the router in the main app
@@ -1457,6 +3792,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Disposition", "Idempotent-Replayed"],
 )
 
 # Configure logging
@@ -0,0 +1,142 @@
+"""Import-time and startup-phase profile of the backend.
+
+Usage:
+    python startup_profile.py [--top 15] [--ttfb] [--json report.json]
+
+Reports
+  * the slowest top-level imports when loading server.py (python -X importtime),
+  * whether heavy optional modules (ReportLab, pandas) were imported eagerly,
+  * the background warm-up phases (doctor seeding, index checks, reference
+    caches) as recorded in server.startup_phases,
+  * with --ttfb, the time from spawning uvicorn to the first byte of GET /api/.
+
+Needs MONGO_URL / DB_NAME like the server itself (environment or backend/.env).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).parent
+HEAVY_MODULES = ["reportlab", "pandas", "numpy"]
+
+PHASES_SCRIPT = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import server
+import_s = time.perf_counter() - started
+
+async def main():
+    started = time.perf_counter()
+    await server.app.router.startup()
+    startup_s = time.perf_counter() - started
+    await server.app.state.warm_up_task
+    await server.app.router.shutdown()
+    return startup_s
+
+startup_s = asyncio.run(main())
+print(json.dumps({
+    "import_s": round(import_s, 4),
+    "startup_handlers_s": round(startup_s, 4),
+    "warm_up_phases_s": server.startup_phases,
+    "heavy_modules_loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def import_profile(top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 0 and name.strip() == "server":
+            total_us = int(cumulative_us)
+        elif depth == 1:
+            # Modules imported directly by server.py
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "slowest": [{"module": n, "cumulative_ms": round(c / 1000, 1), "self_ms": round(s / 1000, 1)}
+                    for n, s, c in rows[:top]],
+    }
+
+
+def phase_profile():
+    result = subprocess.run(
+        [sys.executable, "-c", PHASES_SCRIPT % HEAVY_MODULES],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def time_to_first_byte(port):
+    import requests
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT_DIR, env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - started < 60:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/api/", timeout=1, stream=True).status_code == 200:
+                    return round(time.perf_counter() - started, 3)
+            except requests.RequestException:
+                time.sleep(0.02)
+        return None
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile backend import time and startup phases")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to list")
+    parser.add_argument("--ttfb", action="store_true", help="Also measure cold-start time to first byte")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = {"imports": import_profile(args.top), "startup": phase_profile()}
+    if args.ttfb:
+        report["ttfb_s"] = time_to_first_byte(args.port)
+
+    print(f"Import of server.py: {report['imports']['total_ms']} ms")
+    for row in report["imports"]["slowest"]:
+        print(f"  {row['module']:<40}{row['cumulative_ms']:>10} ms")
+    startup = report["startup"]
+    if "error" in startup:
+        print(f"\nStartup phases unavailable: {startup['error']}")
+    else:
+        print(f"\nStartup handlers: {startup['startup_handlers_s'] * 1000:.1f} ms (before accepting connections)")
+        print("Background warm-up:")
+        for phase, seconds in startup["warm_up_phases_s"].items():
+            print(f"  {phase:<40}{seconds * 1000:>10.1f} ms")
+        eager = startup["heavy_modules_loaded"]
+        print(f"\nHeavy modules imported at startup: {', '.join(eager) if eager else 'none'}")
+    if args.ttfb:
+        print(f"\nCold start to first byte: {report['ttfb_s']} s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
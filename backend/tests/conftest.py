@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'esdent_test')
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database behind server.db and server.analytics_db"""
+    database = AsyncMongoMockClient()['esdent_test']
+    monkeypatch.setattr(server, 'db', database)
+    monkeypatch.setattr(server, 'analytics_db', database)
+    for cache in (server.reference_cache, server.stats_cache, server.cube_cache, server.counts_cache):
+        cache.clear()
+    return database
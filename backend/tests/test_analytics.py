@@ -0,0 +1,40 @@
+import asyncio
+
+import analytics
+
+
+def test_missing_status_is_derived_from_accepted(db):
+    async def main():
+        await db.patients.insert_many([
+            {"visit_date": "2026-01-05", "visit_type": "muayene", "accepted": True},
+            {"visit_date": "2026-01-06", "visit_type": "muayene", "accepted": False},
+            {"visit_date": "2026-01-07", "visit_type": "implant"},
+            {"visit_date": "2026-01-08", "visit_type": "kontrol", "status": "düşünüyor", "accepted": False},
+        ])
+        return await analytics.load_patient_frame(db.patients, "2026-01-01", "2026-02-01", analytics.VISIT_TYPE_FIELDS)
+
+    frame = asyncio.run(main())
+    stats = analytics.monthly_stats(frame, 2026, 1, 1, [])[0]
+    assert stats["status_counts"] == {"düşünüyor": 1, "kabul etmedi": 2, "kabul etti": 1}
+    assert stats["total_patients"] == 4
+
+
+def test_doctor_stats_include_patients_without_doctor_id(db):
+    async def main():
+        await db.patients.insert_many([
+            {"visit_date": "2026-01-05", "visit_type": "muayene", "doctor": "DR TEST", "doctor_id": "d1",
+             "status": "kabul etti", "accepted": True},
+            {"visit_date": "2026-01-06", "visit_type": "muayene", "doctor": "DR TEST", "doctor_id": None,
+             "status": "kabul etti", "accepted": True},
+            {"visit_date": "2026-01-07", "visit_type": "implant", "doctor": "DR TEST",
+             "status": "düşünüyor", "accepted": False},
+            {"visit_date": "2026-01-07", "visit_type": "implant", "doctor": "DR OTHER", "doctor_id": None,
+             "status": "düşünüyor", "accepted": False},
+        ])
+        return await analytics.load_patient_frame(db.patients, "2026-01-01", "2026-02-01", analytics.VISIT_TYPE_FIELDS)
+
+    frame = asyncio.run(main())
+    stats = analytics.monthly_stats(frame, 2026, 1, 1, [{"id": "d1", "name": "DR TEST"}])[0]
+    assert stats["doctor_stats"] == [
+        {"doctor": "DR TEST", "total_examinations": 3, "accepted_count": 2, "acceptance_rate": 66.7}
+    ]
@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_rejections_raise_fresh_exceptions():
+    limiter = server.ConcurrencyLimiter({"slow": (1, 0, 0.01)}, priority_yield_s=0)
+
+    @limiter.limit("slow")
+    async def slow():
+        await asyncio.sleep(0.05)
+
+    async def main():
+        running = asyncio.create_task(slow())
+        await asyncio.sleep(0)
+        rejections = []
+        for _ in range(5):
+            with pytest.raises(HTTPException) as busy:
+                await slow()
+            rejections.append(busy.value)
+        await running
+        return rejections
+
+    rejections = asyncio.run(main())
+    assert len({id(e) for e in rejections}) == 5
+    assert all(e.status_code == 503 and e.headers == {"Retry-After": "1"} for e in rejections)
+    assert limiter.stats["slow"]["rejected"] == 5
@@ -0,0 +1,30 @@
+import asyncio
+
+import server
+
+
+def patient(patient_id, **fields):
+    return {"id": patient_id, "patient_name": patient_id, "phone_number": "5550000000", "visit_date": "2026-01-05",
+            "visit_type": "muayene", "status": "kabul etti", "accepted": True, "is_revisit": False,
+            "created_at": "2026-01-05T09:00:00+00:00", **fields}
+
+
+def test_unresolved_doctor_names_still_match(db):
+    async def main():
+        await db.doctors.insert_one({"id": "d1", "name": "DR TEST", "active": True})
+        await db.doctor_info.insert_one({"doctor_id": "d1", "doctor_name": "DR TEST", "phone_number": "5551112233"})
+        await db.patients.insert_many([
+            patient("by-id", doctor="DR TEST", doctor_id="d1"),
+            patient("by-name", doctor="DR TEST", doctor_id=None),
+            patient("legacy", doctor="DR TEST"),
+            patient("other", doctor="DR OTHER", doctor_id=None),
+        ])
+        listed = await server.get_patients(doctor="DR TEST")
+        summaries = await server.generate_daily_summaries("2026-01-05")
+        messages = await db.whatsapp_messages.find({}, {"_id": 0}).to_list(None)
+        return listed, summaries, messages
+
+    listed, summaries, messages = asyncio.run(main())
+    assert sorted(p["id"] for p in listed) == ["by-id", "by-name", "legacy"]
+    assert [m["recipient_name"] for m in messages] == ["DR TEST"]
+    assert "Toplam Hasta: 3" in messages[0]["message_text"]
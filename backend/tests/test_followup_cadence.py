@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+
+def days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def thinking_patient(patient_id, visit_date, **fields):
+    return {"id": patient_id, "patient_name": patient_id, "phone_number": "5550000000", "doctor": "DR TEST",
+            "visit_date": visit_date, "visit_type": "muayene", "status": "düşünüyor", "accepted": False,
+            **fields}
+
+
+def test_migration_skips_past_stages(db):
+    async def main():
+        await db.patients.insert_many([
+            thinking_patient("finished", days_ago(40)),
+            thinking_patient("midway", days_ago(20)),
+        ])
+        await server.migrate_followup_cadence()
+        finished = await db.patients.find_one({"id": "finished"})
+        midway = await db.patients.find_one({"id": "midway"})
+        created = await server.run_followup_cadence()
+        return finished, midway, created
+
+    finished, midway, created = asyncio.run(main())
+    assert finished["followup_stage"] == len(server.FOLLOWUP_CADENCE_DAYS)
+    assert "next_followup_date" not in finished
+    assert midway["followup_stage"] == 2
+    assert midway["next_followup_date"] == server.cadence_date(days_ago(20), 2)
+    assert created == 0
+
+
+def test_materializer_skips_stages_that_went_past(db):
+    async def main():
+        # Stage 0 is three days past; stage 1 is four days out, beyond the lookahead
+        later = days_ago(10)
+        # Stage 0 is five days past; stage 1 is two days out
+        soon = days_ago(12)
+        await db.patients.insert_many([
+            thinking_patient("later", later, **server.cadence_state(later, 0)),
+            thinking_patient("soon", soon, **server.cadence_state(soon, 0)),
+        ])
+        created = await server.run_followup_cadence()
+        followups = await db.followups.find({}, {"_id": 0}).to_list(None)
+        patients = {p["id"]: p for p in await db.patients.find({}, {"_id": 0}).to_list(None)}
+        return created, followups, patients
+
+    created, followups, patients = asyncio.run(main())
+    assert created == 1
+    assert [(f["patient_id"], f["stage"], f["followup_date"]) for f in followups] == [
+        ("soon", 2, server.cadence_date(days_ago(12), 1))
+    ]
+    assert patients["later"]["followup_stage"] == 1
+    assert patients["later"]["next_followup_date"] == server.cadence_date(days_ago(10), 1)
+    assert patients["soon"]["followup_stage"] == 2
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def followup_request(followup_date, **fields):
+    return server.FollowUpCreate(patient_id="p1", followup_date=followup_date, reason="karar", **fields)
+
+
+def test_second_open_followup_is_rejected(db):
+    async def main():
+        await db.patients.insert_one({"id": "p1", "patient_name": "Ayşe", "phone_number": "5550000000",
+                                      "doctor": "DR TEST", "status": "düşünüyor"})
+        first = await server.create_followup(followup_request("2020-10-17"))
+        with pytest.raises(HTTPException) as conflict:
+            await server.create_followup(followup_request("2020-11-01"))
+        # A completed follow-up is history, not a second open one
+        done = await server.create_followup(followup_request("2020-09-01", status="tamamlandı"))
+        stored = await db.followups.find({}, {"_id": 0}).sort("followup_date", 1).to_list(None)
+        overdue = await server.get_overdue_patients()
+        return first, conflict.value, done, stored, overdue
+
+    first, conflict, done, stored, overdue = asyncio.run(main())
+    assert first["followup_date"] == "2020-10-17"
+    assert conflict.status_code == 409
+    assert conflict.detail["followup_id"] == first["id"]
+    assert [f["id"] for f in stored] == [done["id"], first["id"]]
+    assert stored[1]["followup_date"] == "2020-10-17"
+    assert [f["id"] for f in overdue["overdue_patients"]] == [first["id"]]
+    assert "open" not in overdue["overdue_patients"][0]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+def new_patient(**fields):
+    return server.PatientCreate(**{
+        "visit_date": "2026-01-05", "patient_name": "Ayşe", "phone_number": "5550000000", "doctor": "DR TEST",
+        "visit_type": "implant", "status": "düşünüyor", **fields})
+
+
+class FailingWakeup:
+    def set(self):
+        raise RuntimeError("wakeup failed")
+
+
+def test_retry_replays_the_stored_response(db):
+    async def main():
+        first = await server.create_patient(new_patient(), idempotency_key="k1")
+        replay = await server.create_patient(new_patient(), idempotency_key="k1")
+        return first, replay, await db.patients.count_documents({})
+
+    first, replay, count = asyncio.run(main())
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert server.json.loads(replay.body)["id"] == first.id
+    assert count == 1
+
+
+def test_failure_after_the_insert_keeps_the_key(db, monkeypatch):
+    monkeypatch.setattr(server, "side_effect_wakeup", FailingWakeup())
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await server.create_patient(new_patient(), idempotency_key="k1")
+        replay = await server.create_patient(new_patient(), idempotency_key="k1")
+        return replay, await db.patients.find({}, {"_id": 0, "id": 1}).to_list(None)
+
+    replay, patients = asyncio.run(main())
+    assert replay.status_code == 200
+    assert [p["id"] for p in patients] == [server.json.loads(replay.body)["id"]]
+
+
+def test_failed_write_is_replayed_not_redone(db, monkeypatch):
+    collection_type = type(db.patients)
+    original = collection_type.insert_one
+
+    async def insert_one(collection, doc, *args, **kwargs):
+        if collection.name == "patients":
+            raise RuntimeError("write failed")
+        return await original(collection, doc, *args, **kwargs)
+
+    async def main():
+        with monkeypatch.context() as m:
+            m.setattr(collection_type, "insert_one", insert_one)
+            with pytest.raises(RuntimeError):
+                await server.create_patient(new_patient(), idempotency_key="k1")
+        replay = await server.create_patient(new_patient(), idempotency_key="k1")
+        return replay, await db.patients.count_documents({})
+
+    replay, count = asyncio.run(main())
+    assert replay.status_code == 500
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert count == 0
+
+
+def test_failure_before_any_write_releases_the_key(db, monkeypatch):
+    def cadence_state(*args):
+        raise RuntimeError("cadence failed")
+
+    async def main():
+        with monkeypatch.context() as m:
+            m.setattr(server, "cadence_state", cadence_state)
+            with pytest.raises(RuntimeError):
+                await server.create_patient(new_patient(), idempotency_key="k1")
+        retried = await server.create_patient(new_patient(), idempotency_key="k1")
+        return retried, await db.patients.count_documents({})
+
+    retried, count = asyncio.run(main())
+    assert isinstance(retried, server.Patient)
+    assert count == 1
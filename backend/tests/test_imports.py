@@ -0,0 +1,75 @@
+import asyncio
+
+from starlette.requests import Request
+
+import server
+
+
+BOUNDARY = "esdentboundary"
+CSV_TEXT = (
+    "﻿Tarih,Hasta Adı,Doktor,Ziyaret Tipi,Durum,Notlar\r\n"
+    "2026-01-05,Ayşe Yılmaz,DR TEST,implant,kabul etti,\"çok satırlı\r\nnot, \"\"alıntı\"\"\"\r\n"
+    "2026-01-05,Mehmet Kaya,DR X,muayene,düşünüyor,\r\n"
+    "2026-02-30,Ali Demir,DR TEST,kontrol,kabul etti,\r\n"
+    "2026-01-06,Zeynep Ak,DR TEST,kontrol,düşünüyor,\r\n"
+)
+
+
+def import_request(body: bytes, chunk_size: int = 7):
+    """Request streaming `body` in small chunks, so records and the BOM span chunk boundaries"""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/imports/patients",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }
+    return Request(scope, receive)
+
+
+def multipart_body(text: str):
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="hastalar.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+        f"{text}\r\n--{BOUNDARY}--\r\n"
+    ).encode("utf-8")
+
+
+def test_import_row_rejects_unknown_doctor():
+    columns = server.import_columns(["visit_date", "patient_name", "doctor", "visit_type", "status"])
+    doc, errors = server.import_row(
+        ["2026-01-05", "Mehmet Kaya", "DR X", "muayene", "düşünüyor"], columns, {"DR TEST": "d1"}, "job")
+    assert doc is None
+    assert errors == ["Bilinmeyen doktor: DR X"]
+
+
+def test_csv_import_validates_rows(db):
+    async def main():
+        await db.doctors.insert_one({"id": "d1", "name": "DR TEST"})
+        started = await server.import_patients(import_request(multipart_body(CSV_TEXT)))
+        for _ in range(100):
+            job = await server.get_import_status(started["id"])
+            if job["status"] != "işleniyor":
+                break
+            await asyncio.sleep(0.01)
+        patients = await db.patients.find({}, {"_id": 0}).sort("patient_name", 1).to_list(None)
+        return job, patients
+
+    job, patients = asyncio.run(main())
+    assert job["status"] == "tamamlandı"
+    assert job["filename"] == "hastalar.csv"
+    assert (job["rows_read"], job["inserted"], job["failed"]) == (4, 2, 2)
+    assert [(e["row"], e["errors"]) for e in job["errors"]] == [
+        (2, ["Bilinmeyen doktor: DR X"]),
+        (3, ["Geçersiz tarih (YYYY-MM-DD bekleniyor)"]),
+    ]
+    assert [p["patient_name"] for p in patients] == ["Ayşe Yılmaz", "Zeynep Ak"]
+    assert patients[0]["notes"] == 'çok satırlı\r\nnot, "alıntı"'
+    assert {p["doctor_id"] for p in patients} == {"d1"}
+    assert all(p["import_id"] == job["id"] for p in patients)
@@ -0,0 +1,33 @@
+import pytest
+
+import message_templates
+from message_templates import TemplateError, compile_templates
+
+
+@pytest.mark.parametrize("text", [
+    "Merhaba {patient_name.__class__}",
+    "Merhaba {patient_name[0]}",
+    "Merhaba {doctor:>999999999}",
+    "Merhaba {doctor!r}",
+    "Merhaba {doctor:{date}}",
+    "Merhaba {}",
+    "Merhaba {0}",
+    "Merhaba {unknown}",
+    "Merhaba {patient_name",
+])
+def test_unsafe_or_unknown_fields_are_rejected(text):
+    with pytest.raises(TemplateError):
+        compile_templates("followup_reminder", {"text": text})
+
+
+def test_unknown_parts_and_types_are_rejected():
+    with pytest.raises(TemplateError):
+        compile_templates("followup_reminder", {"footer": "{doctor}"})
+    with pytest.raises(TemplateError):
+        compile_templates("birthday", None)
+
+
+def test_override_renders_bare_fields():
+    templates = compile_templates("followup_reminder", {"text": "{patient_name}, {doctor} {date} bekliyor."})
+    rows = [{"patient_name": "Ayşe", "doctor": "DR TEST", "date": "2026-01-08"}]
+    assert message_templates.render_batch(templates, "text", rows) == ["Ayşe, DR TEST 2026-01-08 bekliyor."]
@@ -0,0 +1,118 @@
+import asyncio
+
+import server
+
+
+def auto_followup_payload(patient_id):
+    return {
+        "followup": {"id": f"f-{patient_id}", "patient_id": patient_id, "patient_name": patient_id,
+                     "phone_number": "5550000000", "doctor": "DR TEST", "followup_date": "2026-01-08",
+                     "patient_status": "düşünüyor", "followup_status": "beklemede"},
+        "message": {"id": f"m-{patient_id}", "recipient_name": patient_id, "recipient_phone": "5550000000",
+                    "message_type": "followup_reminder", "status": "onay_bekliyor"},
+    }
+
+
+async def claim_and_run():
+    task = await server.claim_side_effect()
+    await server.run_side_effect(task)
+    return await server.db.side_effects.find_one({"_id": task["_id"]})
+
+
+def test_failed_task_is_retried(db, monkeypatch):
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError("geçici hata")
+
+    monkeypatch.setitem(server.SIDE_EFFECT_HANDLERS, "flaky", flaky)
+    monkeypatch.setattr(server, "SIDE_EFFECT_RETRY_S", 0.01)
+
+    async def main():
+        await server.enqueue_side_effect("flaky", "p1", {"n": 1})
+        failed = await claim_and_run()
+        too_early = await server.claim_side_effect()
+        await asyncio.sleep(0.02)
+        return failed, too_early, await claim_and_run()
+
+    failed, too_early, retried = asyncio.run(main())
+    assert failed["status"] == "beklemede"
+    assert failed["error"] == "geçici hata"
+    assert too_early is None
+    assert retried["status"] == "tamamlandı"
+    assert retried["attempts"] == 2
+    assert "error" not in retried
+    assert len(calls) == 2
+
+
+def test_auto_followup_skips_patients_no_longer_thinking(db):
+    async def main():
+        await db.patients.insert_many([
+            {"id": "accepted", "patient_name": "accepted", "status": "kabul etti"},
+            {"id": "thinking", "patient_name": "thinking", "status": "düşünüyor"},
+        ])
+        # "deleted" has no patient document any more
+        for patient_id in ("accepted", "deleted", "thinking"):
+            await server.enqueue_side_effect("auto_followup", patient_id, auto_followup_payload(patient_id))
+        tasks = [await claim_and_run() for _ in range(3)]
+        followups = await db.followups.find({}, {"_id": 0}).to_list(None)
+        messages = await db.whatsapp_messages.find({}, {"_id": 0}).to_list(None)
+        return tasks, followups, messages
+
+    tasks, followups, messages = asyncio.run(main())
+    assert all(t["status"] == "tamamlandı" for t in tasks)
+    assert [f["patient_id"] for f in followups] == ["thinking"]
+    assert [m["recipient_name"] for m in messages] == ["thinking"]
+
+
+def new_patient(**fields):
+    return server.PatientCreate(**{
+        "visit_date": "2026-01-05", "patient_name": "Ayşe", "phone_number": "5550000000", "doctor": "DR TEST",
+        "visit_type": "implant", "status": "düşünüyor", "family_group": "Yılmaz", **fields})
+
+
+def test_create_patient_queues_its_work_in_the_same_write(db):
+    async def main():
+        patient = await server.create_patient(new_patient())
+        stored = await db.patients.find_one({"id": patient.id})
+        before = (await db.followups.count_documents({}), await db.family_groups.count_documents({}))
+        pending = await server.get_patient_side_effects(patient.id)
+
+        assert await server.relay_side_effect_outbox() == 1
+        task = await claim_and_run()
+        # A retry of the same task must not count the patient twice
+        await server.apply_patient_created(task["payload"])
+        followups = await db.followups.find({}, {"_id": 0}).to_list(None)
+        messages = await db.whatsapp_messages.find({}, {"_id": 0}).to_list(None)
+        family = await db.family_groups.find_one({"_id": "Yılmaz"})
+        after = await db.patients.find_one({"id": patient.id})
+        return stored, before, pending, task, followups, messages, family, after
+
+    stored, before, pending, task, followups, messages, family, after = asyncio.run(main())
+    assert [e["kind"] for e in stored["outbox"]] == ["patient_created"]
+    assert stored["groups_pending"] is True
+    assert before == (0, 0)
+    assert not pending["done"]
+    assert task["status"] == "tamamlandı"
+    assert [(f["id"], f["followup_date"]) for f in followups] == [(task["payload"]["followup_id"], "2026-01-12")]
+    assert [m["id"] for m in messages] == [task["payload"]["message_id"]]
+    assert family["member_count"] == 1
+    assert after["outbox"] == []
+    assert "groups_pending" not in after
+
+
+def test_patient_deleted_before_its_task_runs(db):
+    async def main():
+        patient = await server.create_patient(new_patient())
+        await server.relay_side_effect_outbox()
+        await server.delete_patient(patient.id)
+        task = await claim_and_run()
+        return task, await db.followups.count_documents({}), await db.family_groups.find({}).to_list(None)
+
+    task, followups, families = asyncio.run(main())
+    assert task["status"] == "tamamlandı"
+    assert followups == 0
+    # The patient was never counted, so deleting it must not count it out
+    assert families == []
@@ -0,0 +1,19 @@
+import asyncio
+
+import server
+
+
+def test_doctor_cells_merge_rows_with_and_without_doctor_id(db):
+    async def main():
+        await db.doctors.insert_one({"id": "d1", "name": "DR TEST", "active": True})
+        await db.patients.insert_many([
+            {"visit_date": "2026-01-05", "visit_type": "muayene", "doctor": "DR TEST", "doctor_id": "d1", "accepted": True},
+            {"visit_date": "2026-01-05", "visit_type": "muayene", "doctor": "DR TEST", "doctor_id": "d1", "accepted": False},
+            {"visit_date": "2026-01-06", "visit_type": "implant", "doctor": "DR TEST", "accepted": True},
+            {"visit_date": "2026-01-06", "visit_type": "implant", "doctor": "DR OTHER", "doctor_id": None},
+        ])
+        return await server.get_statistics_cube(
+            dims="doctor", measures="count,accepted", date_from=None, date_to=None, top=None)
+
+    cube = asyncio.run(main())
+    assert cube["cells"] == [["DR TEST", 3, 2], ["DR OTHER", 1, 0]]
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
@@ -11,6 +11,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogFooter } from '
 import { Textarea } from '@/components/ui/textarea';
 import { Calendar, CheckCircle, XCircle, Download, RefreshCw, Edit, Trash2, Clock } from 'lucide-react';
 import { toast } from 'sonner';
+import { downloadReport } from '@/lib/reports';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -44,19 +45,30 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
     notes: ''
   });
 
+  // Version of the picklists we hold; the server omits them while it matches
+  const referenceVersion = useRef(null);
+
   useEffect(() => {
-    fetchDailyPatients();
-    fetchFamilyGroups();
-    fetchProfessionGroups();
+    fetchBootstrap();
   }, [selectedDate, refreshTrigger]);
 
-  const fetchDailyPatients = async () => {
+  const fetchBootstrap = async () => {
     setLoading(true);
     try {
-      const response = await axios.get(`${API}/patients/daily`, {
-        params: { date: selectedDate }
+      const headers = referenceVersion.current ? { 'If-None-Match': `"${referenceVersion.current}"` } : {};
+      const response = await axios.get(`${API}/daily-bootstrap`, {
+        params: { date: selectedDate },
+        headers
       });
       setPatients(response.data.patients);
+      const reference = response.data.reference;
+      if (reference) {
+        setDoctors(reference.doctors);
+        setVisitTypes(reference.visit_types);
+        setFamilyGroups(reference.family_groups);
+        setProfessionGroups(reference.profession_groups);
+        referenceVersion.current = response.data.reference_version;
+      }
     } catch (error) {
       console.error('Günlük hastalar yüklenirken hata:', error);
       toast.error('Hastalar yüklenemedi');
@@ -65,12 +77,18 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
     }
   };
 
-  const fetchFamilyGroups = async () => {
+  const fetchDailyPatients = async () => {
+    setLoading(true);
     try {
-      const response = await axios.get(`${API}/family-groups`);
-      setFamilyGroups(response.data.family_groups);
+      const response = await axios.get(`${API}/patients/daily`, {
+        params: { date: selectedDate }
+      });
+      setPatients(response.data.patients);
     } catch (error) {
-      console.error('Aile grupları yüklenirken hata:', error);
+      console.error('Günlük hastalar yüklenirken hata:', error);
+      toast.error('Hastalar yüklenemedi');
+    } finally {
+      setLoading(false);
     }
   };
 
@@ -93,15 +111,6 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
   };
 
 
-  const fetchProfessionGroups = async () => {
-    try {
-      const response = await axios.get(`${API}/profession-groups`);
-      setProfessionGroups(response.data.profession_groups);
-    } catch (error) {
-      console.error('Meslek grupları yüklenirken hata:', error);
-    }
-  };
-
   const handleRevisit = async (patientId, patientName) => {
     const revisitDate = new Date();
     revisitDate.setDate(revisitDate.getDate() + 7);
@@ -206,7 +215,7 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
     try {
       await axios.put(`${API}/patients/${editingPatient.id}`, formData);
       toast.success('Hasta bilgileri güncellendi!');
-      fetchDailyPatients();
+      fetchBootstrap();
       closeEditDialog();
       
       // Notify parent to refresh dashboard
@@ -233,7 +242,7 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
     try {
       await axios.delete(`${API}/patients/${patient.id}`);
       toast.success('Hasta silindi');
-      fetchDailyPatients();
+      fetchBootstrap();
       
       // Notify parent to refresh dashboard
       if (onPatientUpdated) {
@@ -253,18 +262,7 @@ export default function DailyView({ refreshTrigger, onPatientUpdated }) {
 
   const downloadPDF = async () => {
     try {
-      const response = await axios.get(`${API}/export/daily-report-pdf`, {
-        params: { date: selectedDate },
-        responseType: 'blob'
-      });
-      
-      const url = window.URL.createObjectURL(new Blob([response.data]));
-      const link = document.createElement('a');
-      link.href = url;
-      link.setAttribute('download', `gunluk_rapor_${selectedDate}.pdf`);
-      document.body.appendChild(link);
-      link.click();
-      link.remove();
+      await downloadReport(API, { kind: 'daily', date: selectedDate });
       
       toast.success('PDF başarıyla indirildi!');
     } catch (error) {
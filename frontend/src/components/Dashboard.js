@@ -1,4 +1,5 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
+import axios from 'axios';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Card, CardContent } from '@/components/ui/card';
 import PatientForm from './PatientForm';
@@ -8,10 +9,39 @@ import FollowUpManager from './FollowUpManager';
 import WhatsAppMessages from './WhatsAppMessages';
 import DoctorSettings from './DoctorSettings';
 import HomeModules from './HomeModules';
+import PatientImport from './PatientImport';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const COUNTS_POLL_MS = 30000;
+
+function CountBadge({ count, testId }) {
+  if (!count) return null;
+  return (
+    <span className="ml-2 rounded-full bg-red-500 px-2 py-0.5 text-xs font-bold text-white" data-testid={testId}>
+      {count}
+    </span>
+  );
+}
 
 export default function Dashboard() {
   const [activeTab, setActiveTab] = useState('home');
   const [refreshTrigger, setRefreshTrigger] = useState(0);
+  const [counts, setCounts] = useState({});
+
+  useEffect(() => {
+    const fetchCounts = async () => {
+      try {
+        const response = await axios.get(`${API}/counts`);
+        setCounts(response.data);
+      } catch (error) {
+        console.error('Sayaçlar yüklenirken hata:', error);
+      }
+    };
+    fetchCounts();
+    const timer = setInterval(fetchCounts, COUNTS_POLL_MS);
+    return () => clearInterval(timer);
+  }, [refreshTrigger]);
 
   const handlePatientAdded = () => {
     setRefreshTrigger(prev => prev + 1);
@@ -41,12 +71,12 @@ export default function Dashboard() {
           <CardContent className="p-6">
             <Tabs value={activeTab} onValueChange={setActiveTab} className="w-full">
               <TabsList className="grid w-full grid-cols-7 mb-8 bg-blue-100" data-testid="tabs-list">
-                <TabsTrigger value="home" data-testid="tab-home" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Ana Sayfa</TabsTrigger>
+                <TabsTrigger value="home" data-testid="tab-home" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Ana Sayfa<CountBadge count={counts.thinking_patients} testId="badge-thinking" /></TabsTrigger>
                 <TabsTrigger value="add" data-testid="tab-add-patient" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Hasta Ekle</TabsTrigger>
-                <TabsTrigger value="daily" data-testid="tab-daily-view" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Günlük Görünüm</TabsTrigger>
+                <TabsTrigger value="daily" data-testid="tab-daily-view" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Günlük Görünüm<CountBadge count={counts.todays_visits} testId="badge-daily" /></TabsTrigger>
                 <TabsTrigger value="statistics" data-testid="tab-statistics" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">İstatistikler</TabsTrigger>
-                <TabsTrigger value="followups" data-testid="tab-followups" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Takipler</TabsTrigger>
-                <TabsTrigger value="whatsapp" data-testid="tab-whatsapp" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">WhatsApp</TabsTrigger>
+                <TabsTrigger value="followups" data-testid="tab-followups" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Takipler<CountBadge count={counts.overdue_followups} testId="badge-overdue" /></TabsTrigger>
+                <TabsTrigger value="whatsapp" data-testid="tab-whatsapp" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">WhatsApp<CountBadge count={counts.pending_messages} testId="badge-pending-messages" /></TabsTrigger>
                 <TabsTrigger value="settings" data-testid="tab-settings" className="data-[state=active]:bg-blue-600 data-[state=active]:text-white">Ayarlar</TabsTrigger>
               </TabsList>
 
@@ -75,7 +105,10 @@ export default function Dashboard() {
               </TabsContent>
 
               <TabsContent value="settings" data-testid="tab-content-settings">
-                <DoctorSettings />
+                <div className="space-y-6">
+                  <DoctorSettings />
+                  <PatientImport onImported={handlePatientAdded} />
+                </div>
               </TabsContent>
             </Tabs>
           </CardContent>
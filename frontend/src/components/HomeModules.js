@@ -7,6 +7,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@
 import { Badge } from '@/components/ui/badge';
 import { CheckCircle, XCircle, Clock, Send, AlertCircle } from 'lucide-react';
 import { toast } from 'sonner';
+import { postIdempotent } from '@/lib/idempotency';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -28,11 +29,7 @@ export default function HomeModules({ refreshTrigger }) {
 
   useEffect(() => {
     console.log('HomeModules: useEffect triggered, refreshTrigger:', refreshTrigger);
-    fetchCounts();
-    fetchOverdueCount();
-    if (viewMode === 'month') {
-      checkWeeklyTrend();
-    }
+    fetchDashboard();
   }, [refreshTrigger, selectedDate, viewMode]);
 
   const getDateRange = () => {
@@ -57,50 +54,43 @@ export default function HomeModules({ refreshTrigger }) {
     return { startDate, endDate };
   };
 
-  const fetchCounts = async () => {
+  const fetchDashboard = async () => {
     try {
       const { startDate, endDate } = getDateRange();
-      
-      const [accepted, notAccepted, thinking] = await Promise.all([
-        axios.get(`${API}/patients/accepted`, { params: { start_date: startDate, end_date: endDate } }),
-        axios.get(`${API}/patients/not-accepted`, { params: { start_date: startDate, end_date: endDate } }),
-        axios.get(`${API}/patients/thinking`, { params: { start_date: startDate, end_date: endDate } })
-      ]);
-      
-      setAcceptedCount(accepted.data.total);
-      setNotAcceptedCount(notAccepted.data.total);
-      setThinkingCount(thinking.data.total);
-    } catch (error) {
-      console.error('Sayılar yüklenirken hata:', error);
-    }
-  };
-
-  const checkWeeklyTrend = async () => {
-    try {
       const date = new Date(selectedDate);
-      const year = date.getFullYear();
-      const month = date.getMonth() + 1;
+      const sections = ['accepted', 'not_accepted', 'thinking', 'overdue'];
+      if (viewMode === 'month') {
+        sections.push('weekly_trend');
+      }
       
-      const response = await axios.get(`${API}/statistics/weekly-trend`, {
-        params: { year, month }
+      // One round trip for all counters; only totals are needed here
+      const response = await axios.get(`${API}/dashboard`, {
+        params: {
+          start_date: startDate,
+          end_date: endDate,
+          year: date.getFullYear(),
+          month: date.getMonth() + 1,
+          sections: sections.join(','),
+          accepted_fields: 'total',
+          not_accepted_fields: 'total',
+          thinking_fields: 'total',
+          overdue_fields: 'total'
+        }
       });
+      const data = response.data;
+      
+      setAcceptedCount(data.accepted.total);
+      setNotAcceptedCount(data.not_accepted.total);
+      setThinkingCount(data.thinking.total);
+      setOverdueCount(data.overdue.total);
       
-      if (response.data.warning) {
-        setWeeklyWarning(response.data);
+      if (data.weekly_trend && data.weekly_trend.warning) {
+        setWeeklyWarning(data.weekly_trend);
       } else {
         setWeeklyWarning(null);
       }
     } catch (error) {
-      console.error('Haftalık trend kontrol hatası:', error);
-    }
-  };
-
-  const fetchOverdueCount = async () => {
-    try {
-      const response = await axios.get(`${API}/patients/overdue`);
-      setOverdueCount(response.data.total);
-    } catch (error) {
-      console.error('Gecikmiş hastalar kontrol hatası:', error);
+      console.error('Sayılar yüklenirken hata:', error);
     }
   };
 
@@ -169,7 +159,7 @@ export default function HomeModules({ refreshTrigger }) {
 
   const sendReminder = async (patientId, patientName) => {
     try {
-      await axios.post(`${API}/patients/${patientId}/send-reminder`);
+      await postIdempotent(`${API}/patients/${patientId}/send-reminder`, null);
       toast.success(`${patientName} için hatırlatma mesajı oluşturuldu. WhatsApp sekmesinden onaylayabilirsiniz.`);
     } catch (error) {
       console.error('Hatırlatma gönderilirken hata:', error);
@@ -177,6 +167,20 @@ export default function HomeModules({ refreshTrigger }) {
     }
   };
 
+  const sendBulkReminders = async () => {
+    const { startDate, endDate } = getDateRange();
+    try {
+      const response = await postIdempotent(`${API}/reminders/bulk`, null, {
+        params: { from: startDate, to: endDate }
+      });
+      const { created, skipped } = response.data;
+      toast.success(`${created} hatırlatma mesajı oluşturuldu${skipped ? `, ${skipped} hasta atlandı` : ''}. WhatsApp sekmesinden onaylayabilirsiniz.`);
+    } catch (error) {
+      console.error('Toplu hatırlatma gönderilirken hata:', error);
+      toast.error('Hatırlatmalar gönderilemedi');
+    }
+  };
+
   const closeDialog = () => {
     setSelectedModule(null);
     setModuleData(null);
@@ -388,6 +392,17 @@ export default function HomeModules({ refreshTrigger }) {
         <DialogContent className="max-w-6xl max-h-[80vh] overflow-y-auto">
           <DialogHeader>
             <DialogTitle className="text-2xl font-bold text-blue-700">{getModuleTitle()}</DialogTitle>
+            {selectedModule === 'thinking' && moduleData && moduleData.total > 0 && (
+              <Button
+                size="sm"
+                onClick={sendBulkReminders}
+                className="w-fit bg-purple-600 hover:bg-purple-700"
+                data-testid="send-bulk-reminders"
+              >
+                <Send className="w-4 h-4 mr-1" />
+                Tümüne Hatırlatma Gönder
+              </Button>
+            )}
           </DialogHeader>
           
           {loading ? (
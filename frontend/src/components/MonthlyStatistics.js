@@ -8,6 +8,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { BarChart3, PieChart as PieChartIcon, TrendingUp, Download, Users, Briefcase } from 'lucide-react';
 import { toast } from 'sonner';
+import { downloadReport } from '@/lib/reports';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -45,21 +46,7 @@ export default function MonthlyStatistics({ refreshTrigger }) {
 
   const downloadPDF = async () => {
     try {
-      const response = await axios.get(`${API}/export/monthly-stats-pdf`, {
-        params: {
-          year: selectedYear,
-          month: selectedMonth
-        },
-        responseType: 'blob'
-      });
-      
-      const url = window.URL.createObjectURL(new Blob([response.data]));
-      const link = document.createElement('a');
-      link.href = url;
-      link.setAttribute('download', `aylik_istatistik_${selectedYear}_${selectedMonth}.pdf`);
-      document.body.appendChild(link);
-      link.click();
-      link.remove();
+      await downloadReport(API, { kind: 'monthly', year: selectedYear, month: selectedMonth });
       
       toast.success('PDF başarıyla indirildi!');
     } catch (error) {
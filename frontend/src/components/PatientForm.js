@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -8,6 +8,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { toast } from 'sonner';
 import { UserPlus, CheckCircle, XCircle, Clock } from 'lucide-react';
+import { newIdempotencyKey, postIdempotent } from '@/lib/idempotency';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -32,6 +33,8 @@ export default function PatientForm({ onPatientAdded }) {
   const [doctors, setDoctors] = useState([]);
   const [visitTypes, setVisitTypes] = useState([]);
   const [loading, setLoading] = useState(false);
+  // Reused when the same submission is retried after a network error.
+  const submissionKey = useRef(null);
 
   useEffect(() => {
     fetchDoctors();
@@ -84,8 +87,12 @@ export default function PatientForm({ onPatientAdded }) {
     }
 
     setLoading(true);
+    if (!submissionKey.current) {
+      submissionKey.current = newIdempotencyKey();
+    }
     try {
-      await axios.post(`${API}/patients`, formData);
+      await postIdempotent(`${API}/patients`, formData, { key: submissionKey.current });
+      submissionKey.current = null;
       toast.success('Hasta başarıyla eklendi!');
       
       if (formData.status === 'düşünüyor' && formData.phone_number && !formData.is_revisit) {
@@ -112,6 +119,9 @@ export default function PatientForm({ onPatientAdded }) {
         onPatientAdded();
       }
     } catch (error) {
+      if (error.response) {
+        submissionKey.current = null;
+      }
       console.error('Hasta eklenirken hata:', error);
       toast.error('Hasta eklenemedi');
     } finally {
@@ -0,0 +1,126 @@
+import { useState, useEffect, useRef } from 'react';
+import axios from 'axios';
+import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
+import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
+import { Progress } from '@/components/ui/progress';
+import { Upload } from 'lucide-react';
+import { toast } from 'sonner';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const POLL_MS = 1000;
+
+export default function PatientImport({ onImported }) {
+  const [file, setFile] = useState(null);
+  const [uploadProgress, setUploadProgress] = useState(0);
+  const [job, setJob] = useState(null);
+  const [importing, setImporting] = useState(false);
+  const pollTimer = useRef(null);
+
+  useEffect(() => () => clearTimeout(pollTimer.current), []);
+
+  const pollJob = async (jobId) => {
+    try {
+      const response = await axios.get(`${API}/imports/${jobId}`);
+      setJob(response.data);
+      if (response.data.status === 'işleniyor') {
+        pollTimer.current = setTimeout(() => pollJob(jobId), POLL_MS);
+        return;
+      }
+      setImporting(false);
+      if (response.data.status === 'tamamlandı') {
+        toast.success(`${response.data.inserted} hasta içe aktarıldı`);
+        if (onImported) {
+          onImported();
+        }
+      } else {
+        toast.error('İçe aktarma başarısız oldu');
+      }
+    } catch (error) {
+      console.error('İçe aktarma durumu alınamadı:', error);
+      setImporting(false);
+    }
+  };
+
+  const startImport = async () => {
+    if (!file) {
+      toast.error('Lütfen bir CSV dosyası seçin');
+      return;
+    }
+    const form = new FormData();
+    form.append('file', file);
+    setImporting(true);
+    setJob(null);
+    setUploadProgress(0);
+    try {
+      const response = await axios.post(`${API}/imports/patients`, form, {
+        onUploadProgress: (event) => {
+          if (event.total) {
+            setUploadProgress(Math.round((event.loaded / event.total) * 100));
+          }
+        }
+      });
+      setJob(response.data);
+      pollJob(response.data.id);
+    } catch (error) {
+      console.error('CSV yüklenirken hata:', error);
+      toast.error(error.response?.data?.detail || 'CSV yüklenemedi');
+      setImporting(false);
+    }
+  };
+
+  const processed = job ? job.inserted + job.failed : 0;
+
+  return (
+    <Card data-testid="patient-import">
+      <CardHeader>
+        <CardTitle className="flex items-center gap-2 text-blue-700">
+          <Upload className="w-5 h-5" />
+          Hasta Kayıtlarını İçe Aktar (CSV)
+        </CardTitle>
+      </CardHeader>
+      <CardContent className="space-y-4">
+        <p className="text-sm text-gray-600">
+          Sütunlar: Tarih, Hasta Adı, Telefon, Doktor, Ziyaret Tipi, Durum, Aile Grubu, Meslek Grubu, Notlar.
+          Tarihler YYYY-MM-DD biçiminde olmalıdır.
+        </p>
+        <div className="flex items-center gap-4">
+          <Input
+            type="file"
+            accept=".csv,text/csv"
+            onChange={(e) => setFile(e.target.files[0] || null)}
+            disabled={importing}
+          />
+          <Button onClick={startImport} disabled={importing || !file} className="bg-blue-600 hover:bg-blue-700">
+            {importing ? 'Aktarılıyor...' : 'İçe Aktar'}
+          </Button>
+        </div>
+
+        {importing && !job && (
+          <div className="space-y-1">
+            <p className="text-sm text-gray-600">Yükleniyor: %{uploadProgress}</p>
+            <Progress value={uploadProgress} />
+          </div>
+        )}
+
+        {job && (
+          <div className="space-y-2">
+            <Progress value={job.rows_read ? (processed / job.rows_read) * 100 : 0} />
+            <p className="text-sm text-gray-700">
+              Okunan satır: {job.rows_read} · Eklenen: {job.inserted} · Hatalı: {job.failed}
+            </p>
+            {job.error && <p className="text-sm text-red-600">{job.error}</p>}
+            {job.errors.length > 0 && (
+              <div className="max-h-48 overflow-y-auto rounded border border-red-200 bg-red-50 p-2 text-sm">
+                {job.errors.map((e) => (
+                  <p key={e.row}>Satır {e.row}: {e.errors.join(', ')}</p>
+                ))}
+              </div>
+            )}
+          </div>
+        )}
+      </CardContent>
+    </Card>
+  );
+}
@@ -6,6 +6,7 @@ import { Input } from '@/components/ui/input';
 import { Badge } from '@/components/ui/badge';
 import { MessageSquare, Copy, Send } from 'lucide-react';
 import { toast } from 'sonner';
+import { postIdempotent } from '@/lib/idempotency';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -38,7 +39,7 @@ export default function WhatsAppMessages({ refreshTrigger }) {
   const generateDailySummary = async () => {
     setGeneratingDailySummary(true);
     try {
-      await axios.post(`${API}/generate-daily-summaries`, null, {
+      await postIdempotent(`${API}/generate-daily-summaries`, null, {
         params: { date: selectedDate }
       });
       toast.success('Günlük özetler başarıyla oluşturuldu!');
@@ -67,6 +68,18 @@ export default function WhatsAppMessages({ refreshTrigger }) {
     }
   };
 
+  const approveAll = async () => {
+    const ids = pendingMessages.map(m => m.id);
+    try {
+      const response = await axios.patch(`${API}/whatsapp-messages/bulk`, { ids, approve: true });
+      toast.success(`${response.data.modified} mesaj onaylandı ve gönderildi olarak işaretlendi`);
+      fetchMessages();
+    } catch (error) {
+      console.error('Mesajlar onaylanırken hata:', error);
+      toast.error('Mesajlar onaylanamadı');
+    }
+  };
+
   const getMessageTypeBadge = (type) => {
     if (type === 'followup_reminder') {
       return <Badge className="bg-purple-600">Takip Hatırlatması</Badge>;
@@ -128,7 +141,19 @@ export default function WhatsAppMessages({ refreshTrigger }) {
       {/* Pending Messages */}
       <Card>
         <CardHeader>
-          <CardTitle className="text-orange-700">Onay Bekleyen Mesajlar ({pendingMessages.length})</CardTitle>
+          <div className="flex items-center justify-between">
+            <CardTitle className="text-orange-700">Onay Bekleyen Mesajlar ({pendingMessages.length})</CardTitle>
+            {pendingMessages.length > 1 && (
+              <Button
+                onClick={approveAll}
+                className="bg-green-600 hover:bg-green-700"
+                data-testid="approve-all-messages"
+              >
+                <Send className="w-4 h-4 mr-2" />
+                Tümünü Onayla
+              </Button>
+            )}
+          </div>
         </CardHeader>
         <CardContent className="space-y-4">
           {loading ? (
@@ -0,0 +1,29 @@
+import axios from 'axios';
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+export function newIdempotencyKey() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(16)}-${Math.random().toString(16).slice(2)}`;
+}
+
+// POST with an Idempotency-Key header. Requests that never got a response
+// (timeouts, dropped connections) are retried with the same key, so the
+// server runs the side effects at most once and replays the stored result.
+export async function postIdempotent(url, data, { key = newIdempotencyKey(), retries = 2, ...config } = {}) {
+  const headers = { ...(config.headers || {}), 'Idempotency-Key': key };
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await axios.post(url, data, { ...config, headers });
+    } catch (error) {
+      // 409: the first attempt is still running on the server.
+      const retryable = !error.response || error.response.status === 409;
+      if (!retryable || attempt >= retries) {
+        throw error;
+      }
+      await sleep(500 * 2 ** attempt);
+    }
+  }
+}
@@ -0,0 +1,28 @@
+import axios from 'axios';
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queue a report job on the backend, poll until it is ready and save the file.
+// The server answers 202 while the job is pending and the file once it is done.
+export async function downloadReport(api, request, { interval = 1000, timeout = 300000 } = {}) {
+  const { data: job } = await axios.post(`${api}/reports`, request);
+  const started = Date.now();
+
+  while (Date.now() - started < timeout) {
+    const response = await axios.get(`${api}/reports/${job.id}`, { responseType: 'blob' });
+    if (response.status === 200) {
+      const filename = (response.headers['content-disposition'] || '').split('filename=')[1] || job.id;
+      const url = window.URL.createObjectURL(new Blob([response.data]));
+      const link = document.createElement('a');
+      link.href = url;
+      link.setAttribute('download', filename);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+      return;
+    }
+    await sleep(interval);
+  }
+  throw new Error('Rapor zaman aşımına uğradı');
+}